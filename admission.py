@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "20"))  # agent runs at once
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))  # runs allowed to wait for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))  # max seconds waiting for a slot
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures to open
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # seconds open before a trial call
+
+SHED_QUEUE_FULL = "queue_full"
+SHED_TIMEOUT = "queue_timeout"
+SHED_CIRCUIT_OPEN = "circuit_open"
+
+
+class Overloaded(Exception):
+    """Work was refused instead of queued; `reason` says why"""
+
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class CircuitOpen(Overloaded):
+    def __init__(self, name: str):
+        super().__init__(SHED_CIRCUIT_OPEN, f"{name} circuit is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens
+    and calls fail immediately with CircuitOpen. After BREAKER_RESET_TIMEOUT
+    one trial call is let through (half-open); its success closes the
+    breaker, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def check(self) -> bool:
+        """Raise CircuitOpen unless a call may go through now; True if this call is the half-open trial"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._trial_running):
+            raise CircuitOpen(self.name)
+        if state == self.HALF_OPEN:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.failures >= self.failure_threshold:
+            logger.info(f"Circuit {self.name} closed")
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self._trial_running = False
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold:
+                self.times_opened += 1
+                logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def guard(self, is_failure=lambda e: True):
+        """Check the breaker, then record how the wrapped call went"""
+        trial = self.check()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled or closed early: no verdict, but free the trial slot if this was the trial
+            if trial:
+                self._trial_running = False
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "times_opened": self.times_opened}
+
+
+class AdmissionController:
+    """
+    Bounds how much agent work runs and waits at once.
+
+    At most `max_concurrent` runs hold a slot. Up to `max_queue` more may
+    wait, each for at most `queue_timeout` seconds; beyond that, work is
+    refused straight away with Overloaded so callers can answer with
+    something cheap instead of hanging.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        # Metrics
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = {SHED_QUEUE_FULL: 0, SHED_TIMEOUT: 0, SHED_CIRCUIT_OPEN: 0}
+        self._waits = deque(maxlen=1000)
+
+    def record_shed(self, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one slot for the duration of the block, or raise Overloaded"""
+        if self._slots.locked():
+            if self.queued >= self.max_queue:
+                self.record_shed(SHED_QUEUE_FULL)
+                raise Overloaded(SHED_QUEUE_FULL)
+
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            with span("agent.admission"):
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.record_shed(SHED_TIMEOUT)
+            raise Overloaded(SHED_TIMEOUT)
+        finally:
+            self.queued -= 1
+
+        self._waits.append(time.monotonic() - started)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "avg_wait_ms": round(sum(self._waits) / len(self._waits) * 1000, 1) if self._waits else 0.0,
+        }
@@ -1,18 +1,72 @@
 import asyncio
+import logging
 import os
 import json
-from typing import Optional
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from mcp import ClientSession
-from mcp.client.sse import sse_client
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessage
 from dotenv import load_dotenv
 
+from admission import SHED_CIRCUIT_OPEN, AdmissionController, CircuitBreaker, CircuitOpen, Overloaded
+from cassette import recorder
+from mcp_endpoints import MCPEndpoints
+from mcp_pool import MCP_POOL_SIZE, is_transport_error
+from tool_cache import ToolResultCache, user_of
+from tool_catalog import ToolCatalog
+from tracing import record_tokens, span, trace, user_tag
+from transaction_store import TransactionStore
+from user_turns import mark_turn_committed
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-BANK_MCP_URL = "https://disha-bank-mcp.onrender.com/sse"
+BANK_MCP_URL = os.getenv("BANK_MCP_URL", "https://disha-bank-mcp.onrender.com/sse")
+# Comma-separated bank MCP servers, e.g. a local one plus the hosted one
+BANK_MCP_URLS = [url.strip() for url in os.getenv("BANK_MCP_URLS", BANK_MCP_URL).split(",") if url.strip()]
+LLM_MODEL = os.getenv("DISHA_LLM_MODEL", "gpt-4o")
+CHEAP_LLM_MODEL = os.getenv("DISHA_CHEAP_LLM_MODEL", "gpt-4o-mini")  # for simple, routed queries
+LLM_TIMEOUT = float(os.getenv("DISHA_LLM_TIMEOUT", "45"))  # seconds per completion
+LLM_MAX_RETRIES = int(os.getenv("DISHA_LLM_MAX_RETRIES", "1"))
+MAX_AGENT_STEPS = int(os.getenv("DISHA_MAX_STEPS", "4"))  # LLM calls with tools per message
+PREFETCH_ACCOUNT = os.getenv("DISHA_PREFETCH_ACCOUNT", "1") == "1"
+TOOL_TIMEOUT = float(os.getenv("DISHA_TOOL_TIMEOUT", "20"))  # seconds per MCP tool call
+TOOL_CONCURRENCY = int(os.getenv("DISHA_TOOL_CONCURRENCY", "4"))  # parallel tool calls per turn
+
+# Tools that only read bank data; anything else (transfers etc.) changes state
+READ_ONLY_TOOL_PREFIXES = ("get_", "analyze_", "list_", "check_")
+
+# LLM errors that mean the provider is struggling (as opposed to a bad request)
+LLM_OUTAGE_ERRORS = (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# A state-changing call that timed out may still have gone through on the bank's side
+WRITE_TIMEOUT_MESSAGE = ("Outcome unknown: {name} did not answer within {timeout:.0f}s and may have gone through. "
+                         "Do not retry it; check the transaction history before retrying, and tell the user.")
+
+BUSY_MESSAGE = "🙏 Abhi bahut saare log baat kar rahe hain. Ek minute mein phir try karo!"
+
+# Answered from the local transaction store instead of the bank server
+SPENDING_SUMMARY_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_spending_summary",
+        "description": "Exact spending totals for the user over the last N days: total spent and earned, "
+                       "top merchants, categories, gambling spend and average daily spend.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "phone": {"type": "string", "description": "User's phone number"},
+                "days": {"type": "integer", "description": "Period in days (default 7)"}
+            },
+            "required": ["phone"]
+        }
+    }
+}
 
 # System prompt for Disha
 DISHA_SYSTEM_PROMPT = """
@@ -39,7 +93,7 @@ COMMUNICATION STYLE:
 FINANCIAL RULES:
 1. ALWAYS call 'get_account_details' first to check current balance
 2. Use 'get_recent_transactions' to analyze spending before giving advice
-3. Use 'analyze_spending_pattern' for detailed insights
+3. Use 'get_spending_summary' for totals (its numbers are exact, don't recompute them) and 'analyze_spending_pattern' for detailed insights
 4. Reference specific merchants/amounts: "Sharma Tea Stall pe ₹450 gaye is week"
 5. Encourage emergency fund: minimum ₹5000 should always be there
 
@@ -58,12 +112,390 @@ You: "Is hafte ₹890 kharch hue. Sharma Tea Stall pe ₹120 aur Dream11 pe ₹2
 """
 
 
-class DishaAgent:
+def is_read_only_tool(name: str) -> bool:
+    return name.startswith(READ_ONLY_TOOL_PREFIXES)
+
+
+def tool_result_text(mcp_result) -> str:
+    """Extract the text content of an MCP tool result"""
+    result_text = ""
+    for content in mcp_result.content:
+        if content.type == 'text':
+            result_text += content.text
+    return result_text
+
+
+class StreamedReply:
+    """Assembles an assistant message from streamed completion chunks"""
+    
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.bank_url = BANK_MCP_URL
+        self.content = ""
+        self.tool_calls = {}
+    
+    def add(self, delta) -> Optional[str]:
+        """Merge one chunk delta; returns its text content, if any"""
+        for tc in delta.tool_calls or []:
+            call = self.tool_calls.setdefault(tc.index, {
+                "id": "",
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function and tc.function.name:
+                call["function"]["name"] += tc.function.name
+            if tc.function and tc.function.arguments:
+                call["function"]["arguments"] += tc.function.arguments
+        
+        if delta.content:
+            self.content += delta.content
+        return delta.content
+    
+    @property
+    def message(self) -> ChatCompletionMessage:
+        return ChatCompletionMessage.model_validate({
+            "role": "assistant",
+            "content": self.content or None,
+            "tool_calls": [self.tool_calls[i] for i in sorted(self.tool_calls)] or None
+        })
+
+
+class DishaAgent:
+    def __init__(self, bank_urls: Optional[list] = None, pool_size: int = MCP_POOL_SIZE,
+                 max_steps: int = MAX_AGENT_STEPS, prefetch_account: bool = PREFETCH_ACCOUNT):
+        # Async client so a slow completion never blocks the bot's event loop
+        self.client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES
+        )
+        self.model = LLM_MODEL
+        self.cheap_model = CHEAP_LLM_MODEL
+        self.bank_urls = bank_urls or BANK_MCP_URLS
+        self.max_steps = max(1, max_steps)
+        self.prefetch_account = prefetch_account
+        
+        # Long-lived MCP sessions to every bank endpoint, shared by every caller of this agent
+        self.pool = MCPEndpoints(self.bank_urls, size=pool_size, message_handler=self._on_mcp_message)
+        
+        # Bank tool list and its OpenAI specs, fetched once and reused
+        self.tool_catalog = ToolCatalog(self.pool)
+        
+        # Recent read-only tool results, shared by chats and proactive checks
+        self.tool_cache = ToolResultCache()
+        
+        # Incrementally synced transactions with local spending analytics
+        self.transaction_store = TransactionStore(self)
+        
+        # Load shedding: bounded agent concurrency and a breaker per upstream
+        self.admission = AdmissionController()
+        self.llm_breaker = CircuitBreaker("llm")
+        self.bank_breaker = CircuitBreaker("bank")
+    
+    async def start(self):
+        """Open the MCP endpoints' session pools and warm the tool catalog (otherwise done lazily on first use)"""
+        await self.pool.start()
+        await self.tool_catalog.refresh()
+    
+    async def _on_mcp_message(self, message):
+        await self.tool_catalog.handle_mcp_message(message)
+    
+    async def close(self):
+        """Close all pooled MCP sessions and the OpenAI HTTP client"""
+        await self.pool.close()
+        await self.client.close()
+    
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, use_cache: bool = True) -> str:
+        """
+        Call a bank MCP tool on a pooled session and return its text result.
+        
+        Read-only tools are served from the result cache when possible. A
+        successful state-changing call (e.g. a transfer) invalidates everything
+        cached for that user.
+        """
+        arguments = arguments or {}
+        
+        if is_read_only_tool(name):
+            if not use_cache:
+                return (await self._call_tool_uncached(name, arguments))[0]
+            return await self.tool_cache.get_or_fetch(
+                name, arguments,
+                lambda: self._call_tool_uncached(name, arguments)
+            )
+        
+        result_text, is_error = await self._call_tool_uncached(name, arguments)
+        if not is_error:
+            self.tool_cache.invalidate_user(user_of(arguments))
+            self.transaction_store.mark_stale(user_of(arguments))
+        return result_text
+    
+    async def _call_tool_uncached(self, name: str, arguments: dict):
+        # Only outages count against the bank; a tool rejecting its arguments doesn't
+        async with self.bank_breaker.guard(is_transport_error):
+            with span("mcp.call_tool", tool=name) as s:
+                mcp_result = await self.pool.call_tool(name, arguments, idempotent=is_read_only_tool(name))
+        result_text, is_error = tool_result_text(mcp_result), bool(mcp_result.isError)
+        recorder.mcp(name, arguments, result_text, is_error, time.perf_counter() - s.started)
+        return result_text, is_error
+    
+    async def spending_summary(self, arguments: dict) -> str:
+        """Result of the local get_spending_summary tool, as JSON text"""
+        phone = user_of(arguments)
+        ledger = await self.transaction_store.ledger(phone) if phone else None
+        if ledger is None:
+            return "Error: transactions unavailable, use get_recent_transactions instead"
+        return json.dumps(ledger.summary(days=int(arguments.get("days") or 7)))
+    
+    async def complete(self, messages: list, tools: Optional[list] = None, timeout: float = LLM_TIMEOUT,
+                       model: Optional[str] = None):
+        """
+        Run one chat completion and return the assistant message.
+        
+        The whole call (including client retries) is bounded by `timeout`;
+        cancelling the calling task aborts the HTTP request.
+        """
+        kwargs = {"model": model or self.model, "messages": messages}
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = "auto"
+        
+        async with self.llm_breaker.guard(lambda e: isinstance(e, LLM_OUTAGE_ERRORS)):
+            with span("llm.completion", model=kwargs["model"], messages=len(messages)) as s:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(**kwargs),
+                    timeout
+                )
+                record_tokens(s, kwargs["model"], response.usage)
+        recorder.llm(messages, kwargs["model"], response.choices[0].message, response.usage,
+                     time.perf_counter() - s.started)
+        return response.choices[0].message
+    
+    async def stream_completion(self, messages: list, tools: Optional[list] = None,
+                                reply: Optional[StreamedReply] = None, timeout: float = LLM_TIMEOUT,
+                                model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a completion, yielding content deltas as they arrive.
+        
+        Pass a StreamedReply to also collect the full assistant message,
+        including any tool calls the model made.
+        """
+        # include_usage adds a final chunk with the token counts
+        kwargs = {"model": model or self.model, "messages": messages, "stream": True,
+                  "stream_options": {"include_usage": True}}
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = "auto"
+        
+        reply = reply or StreamedReply()
+        usage = None
+        async with self.llm_breaker.guard(lambda e: isinstance(e, LLM_OUTAGE_ERRORS)):
+            with span("llm.stream", model=kwargs["model"], messages=len(messages)) as s:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(**kwargs),
+                    timeout
+                )
+                try:
+                    async for chunk in stream:
+                        if chunk.choices:
+                            if "first_chunk_ms" not in s.tags:
+                                s.tag(first_chunk_ms=round((time.perf_counter() - s.started) * 1000, 1))
+                            text = reply.add(chunk.choices[0].delta)
+                            if text:
+                                yield text
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                            record_tokens(s, kwargs["model"], usage)
+                finally:
+                    await stream.close()
+        
+        if recorder.enabled:
+            first_chunk = s.tags.get("first_chunk_ms")
+            recorder.llm(messages, kwargs["model"], reply.message, usage, time.perf_counter() - s.started,
+                         stream=True, first_chunk=first_chunk / 1000 if first_chunk is not None else None)
+    
+    async def _execute_tool_call(self, tool_call, semaphore: asyncio.Semaphore, write_lock: asyncio.Lock) -> dict:
+        func_name = tool_call.function.name
+        call_id = tool_call.id
+        
+        try:
+            func_args = json.loads(tool_call.function.arguments or "{}")
+            
+            async with semaphore:
+                with span("agent.tool", tool=func_name):
+                    if func_name == SPENDING_SUMMARY_TOOL["function"]["name"]:
+                        result_text = await asyncio.wait_for(self.spending_summary(func_args), TOOL_TIMEOUT)
+                    elif is_read_only_tool(func_name):
+                        result_text = await asyncio.wait_for(self.call_tool(func_name, func_args), TOOL_TIMEOUT)
+                    else:
+                        # State-changing tools run one at a time, in the order the model asked for them,
+                        # and a turn that has made one is never restarted
+                        mark_turn_committed()
+                        async with write_lock:
+                            try:
+                                result_text = await asyncio.wait_for(self.call_tool(func_name, func_args), TOOL_TIMEOUT)
+                            except asyncio.TimeoutError:
+                                self.bank_breaker.record_failure()
+                                result_text = WRITE_TIMEOUT_MESSAGE.format(name=func_name, timeout=TOOL_TIMEOUT)
+                        
+        except asyncio.TimeoutError:
+            # The call was cancelled, so the breaker didn't see it; count it here
+            self.bank_breaker.record_failure()
+            result_text = f"Error: {func_name} timed out after {TOOL_TIMEOUT:.0f}s"
+        except Exception as e:
+            result_text = f"Error: {str(e)}"
+        
+        return {
+            "role": "tool",
+            "tool_call_id": call_id,
+            "content": result_text
+        }
+    
+    async def _execute_tool_calls(self, tool_calls: list) -> list:
+        """
+        Execute the tool calls of one LLM turn concurrently.
+        
+        At most TOOL_CONCURRENCY calls run at once and each is bounded by
+        TOOL_TIMEOUT. The returned tool messages keep the order of `tool_calls`.
+        """
+        semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+        write_lock = asyncio.Lock()
+        return await asyncio.gather(
+            *(self._execute_tool_call(tool_call, semaphore, write_lock) for tool_call in tool_calls)
+        )
+    
+    def _build_messages(self, user_phone: str, user_message: str, conversation_history: Optional[list]) -> list:
+        # Build conversation context. The system prompt is byte-identical for every
+        # user and always first, so the provider's prompt cache can reuse it.
+        messages = [{"role": "system", "content": DISHA_SYSTEM_PROMPT}]
         
-    async def process_message(self, user_phone: str, user_message: str, conversation_history: Optional[list] = None) -> str:
+        # Add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        # Add current user message
+        messages.append({
+            "role": "user", 
+            "content": f"User Phone: {user_phone}. Query: {user_message}"
+        })
+        return messages
+    
+    async def _prefetch_account_details(self, user_phone: str) -> list:
+        """
+        Fetch account details ahead of the first completion and return them as
+        a get_account_details tool call plus its result, as if the model had
+        already made that call. Returns [] if the details can't be fetched.
+        """
+        catalog = await self.tool_catalog.get()
+        args = catalog.phone_arguments("get_account_details", user_phone)
+        if args is None:
+            return []
+        
+        try:
+            with span("agent.prefetch", tool="get_account_details"):
+                details = await asyncio.wait_for(self.call_tool("get_account_details", args), TOOL_TIMEOUT)
+        except Exception:
+            # The model will call the tool itself if it needs it
+            return []
+        
+        return [
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "prefetch_account_details",
+                    "type": "function",
+                    "function": {"name": "get_account_details", "arguments": json.dumps(args)}
+                }]
+            },
+            {
+                "role": "tool",
+                "tool_call_id": "prefetch_account_details",
+                "content": details
+            }
+        ]
+    
+    async def _prepare_messages(self, user_phone: str, user_message: str, conversation_history: Optional[list]) -> list:
+        prefetch = None
+        if self.prefetch_account:
+            # Speculatively fetch account details while the prompt is built
+            prefetch = asyncio.create_task(self._prefetch_account_details(user_phone))
+        
+        messages = self._build_messages(user_phone, user_message, conversation_history)
+        
+        if prefetch:
+            # Injected after the user message so the model can usually answer in one completion
+            messages.extend(await prefetch)
+        return messages
+    
+    async def _agent_loop(self, messages: list, stream: bool = False, model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Let the model call tools for up to `max_steps` completions, yielding
+        the text of its answer. If it is still calling tools after the last
+        step, one more completion without tools forces a final answer.
+        """
+        # Cached bank tools, already in OpenAI format, plus the local spending summary
+        catalog = await self.tool_catalog.get()
+        openai_tools = catalog.openai_tools
+        if "get_recent_transactions" in catalog.names:
+            openai_tools = openai_tools + [SPENDING_SUMMARY_TOOL]
+        
+        for _ in range(self.max_steps):
+            if stream:
+                reply = StreamedReply()
+                async for delta in self.stream_completion(messages, tools=openai_tools, reply=reply, model=model):
+                    yield delta
+                assistant_msg = reply.message
+            else:
+                assistant_msg = await self.complete(messages, tools=openai_tools, model=model)
+                if not assistant_msg.tool_calls and assistant_msg.content:
+                    yield assistant_msg.content
+            
+            messages.append(assistant_msg)
+            
+            if not assistant_msg.tool_calls:
+                return
+            
+            # Execute all requested tools concurrently, results in tool_call order
+            messages.extend(await self._execute_tool_calls(assistant_msg.tool_calls))
+        
+        # Step budget used up - answer with the data gathered so far
+        if stream:
+            async for delta in self.stream_completion(messages, model=model):
+                yield delta
+        else:
+            final_msg = await self.complete(messages, model=model)
+            yield final_msg.content or ""
+        
+    def _admit(self):
+        """Admission slot for one agent run; sheds at once if the LLM circuit is open"""
+        if self.llm_breaker.is_open:
+            raise CircuitOpen(self.llm_breaker.name)
+        return self.admission.slot()
+    
+    async def _shed_reply(self, error: Overloaded, fallback: Optional[Callable[[], Awaitable[Optional[str]]]]) -> str:
+        """Something cheap to say when a run was refused: the fallback's answer, else BUSY_MESSAGE"""
+        if isinstance(error, CircuitOpen):
+            self.admission.record_shed(SHED_CIRCUIT_OPEN)
+        logger.warning(f"Shedding agent run: {error}")
+        if fallback:
+            try:
+                text = await fallback()
+                if text:
+                    return text
+            except Exception as e:
+                logger.warning(f"Shed fallback failed: {e}")
+        return BUSY_MESSAGE
+    
+    def load_stats(self) -> dict:
+        return {
+            **self.admission.stats(),
+            "breakers": {b.name: b.stats() for b in (self.llm_breaker, self.bank_breaker)},
+            "bank": self.pool.stats(),
+        }
+    
+    async def process_message(self, user_phone: str, user_message: str, conversation_history: Optional[list] = None,
+                              model: Optional[str] = None,
+                              fallback: Optional[Callable[[], Awaitable[Optional[str]]]] = None) -> str:
         """
         Process a single message and return Disha's response.
         
@@ -71,98 +503,50 @@ class DishaAgent:
             user_phone: User's phone number (account identifier)
             user_message: The user's query
             conversation_history: Optional list of previous messages for context
+            model: Optional model override (e.g. a cheaper tier for simple queries)
+            fallback: Optional cheap answer (e.g. from cached data) used if the run is shed
             
         Returns:
             Disha's response as a string
         """
         try:
-            async with sse_client(self.bank_url) as streams:
-                async with ClientSession(streams[0], streams[1]) as session:
-                    await session.initialize()
-                    
-                    # Fetch MCP tools from bank
-                    mcp_tools_list = await session.list_tools()
-                    
-                    # Convert to OpenAI format
-                    openai_tools = []
-                    for tool in mcp_tools_list.tools:
-                        openai_tools.append({
-                            "type": "function",
-                            "function": {
-                                "name": tool.name,
-                                "description": tool.description,
-                                "parameters": tool.inputSchema
-                            }
-                        })
-                    
-                    # Build conversation context
-                    messages = [{"role": "system", "content": DISHA_SYSTEM_PROMPT}]
-                    
-                    # Add conversation history if provided
-                    if conversation_history:
-                        messages.extend(conversation_history)
-                    
-                    # Add current user message
-                    messages.append({
-                        "role": "user", 
-                        "content": f"User Phone: {user_phone}. Query: {user_message}"
-                    })
+            # Root of a trace when called directly, a stage of the caller's trace otherwise
+            with trace("agent.message", user=user_tag(user_phone), model=model or self.model):
+                async with self._admit():
+                    messages = await self._prepare_messages(user_phone, user_message, conversation_history)
                     
-                    # First API call - get intent and tool calls
-                    response = self.client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=messages,
-                        tools=openai_tools,
-                        tool_choice="auto"
-                    )
-                    
-                    assistant_msg = response.choices[0].message
-                    messages.append(assistant_msg)
-                    
-                    # Handle tool calls if any
-                    if assistant_msg.tool_calls:
-                        for tool_call in assistant_msg.tool_calls:
-                            func_name = tool_call.function.name
-                            func_args = json.loads(tool_call.function.arguments)
-                            call_id = tool_call.id
-                            
-                            try:
-                                # Execute tool via MCP
-                                mcp_result = await session.call_tool(func_name, func_args)
-                                
-                                # Extract text content
-                                result_text = ""
-                                for content in mcp_result.content:
-                                    if content.type == 'text':
-                                        result_text += content.text
-                                
-                                # Add tool result to conversation
-                                messages.append({
-                                    "role": "tool",
-                                    "tool_call_id": call_id,
-                                    "content": result_text
-                                })
-                                
-                            except Exception as e:
-                                messages.append({
-                                    "role": "tool",
-                                    "tool_call_id": call_id,
-                                    "content": f"Error: {str(e)}"
-                                })
-                        
-                        # Second API call - generate final response
-                        final_response = self.client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=messages
-                        )
-                        return final_response.choices[0].message.content
-                    
-                    else:
-                        # No tool calls, return direct response
-                        return assistant_msg.content
-                        
+                    parts = [text async for text in self._agent_loop(messages, model=model)]
+                    return "".join(parts)
+            
+        except Overloaded as e:
+            return await self._shed_reply(e, fallback)
+        except asyncio.TimeoutError:
+            return "Sorry, jawab dene mein bahut time lag raha hai. Thodi der baad try karo! 🙏"
         except Exception as e:
             return f"Sorry, kuch technical problem hai: {str(e)}"
+    
+    async def stream_message(self, user_phone: str, user_message: str, conversation_history: Optional[list] = None,
+                             model: Optional[str] = None,
+                             fallback: Optional[Callable[[], Awaitable[Optional[str]]]] = None) -> AsyncIterator[str]:
+        """
+        Like process_message, but yields the response in pieces as the model
+        streams it.
+        """
+        try:
+            # A generator can't own the trace context, so this is a stage of the caller's trace
+            with span("agent.message", model=model or self.model):
+                async with self._admit():
+                    messages = await self._prepare_messages(user_phone, user_message, conversation_history)
+                    
+                    async for delta in self._agent_loop(messages, stream=True, model=model):
+                        yield delta
+                
+        except Overloaded as e:
+            yield await self._shed_reply(e, fallback)
+        except asyncio.TimeoutError:
+            yield "Sorry, jawab dene mein bahut time lag raha hai. Thodi der baad try karo! 🙏"
+        except Exception as e:
+            yield f"Sorry, kuch technical problem hai: {str(e)}"
 
 
 # CLI interface for testing
@@ -174,20 +558,24 @@ async def run_terminal_chat():
     print("🤖 Disha Terminal Chat (Type 'quit' to exit)")
     print("-" * 50)
     
+    await agent.start()
     conversation_history = []
     
-    while True:
-        user_input = input("\n👤 You: ")
-        if user_input.lower() in ['quit', 'exit']:
-            break
-        
-        print("💭 Thinking...")
-        response = await agent.process_message(user_phone, user_input, conversation_history)
-        print(f"\n💬 Disha: {response}")
-        
-        # Store conversation (optional for context)
-        conversation_history.append({"role": "user", "content": user_input})
-        conversation_history.append({"role": "assistant", "content": response})
+    try:
+        while True:
+            user_input = input("\n👤 You: ")
+            if user_input.lower() in ['quit', 'exit']:
+                break
+            
+            print("💭 Thinking...")
+            response = await agent.process_message(user_phone, user_input, conversation_history)
+            print(f"\n💬 Disha: {response}")
+            
+            # Store conversation (optional for context)
+            conversation_history.append({"role": "user", "content": user_input})
+            conversation_history.append({"role": "assistant", "content": response})
+    finally:
+        await agent.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+IST = timezone(timedelta(hours=5, minutes=30))  # users' calendar for "today" and "this week"
+
+# Merchants we treat as gambling / fantasy betting
+GAMBLING_KEYWORDS = ("dream11", "my11circle", "mpl", "rummy", "winzo", "betting", "casino", "lottery")
+
+BALANCE_KEYS = ("balance", "currentbalance", "mainbalance", "availablebalance", "accountbalance")
+SAVINGS_KEYS = ("savingspocket", "savings", "savingsbalance", "savingspocketbalance")
+EMERGENCY_KEYS = ("emergencyfund", "emergency", "emergencyfundbalance", "emergencypocket")
+
+DEBIT_TYPES = ("debit", "dr", "expense", "withdrawal", "payment", "spend")
+CREDIT_TYPES = ("credit", "cr", "income", "deposit", "refund")
+
+
+def parse_tool_json(text: str) -> Any:
+    """Parse a bank tool result as JSON; None if it isn't JSON"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(key).lower())
+
+
+def _to_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = value.replace("₹", "").replace(",", "").strip()
+        try:
+            return float(cleaned)
+        except ValueError:
+            return None
+    return None
+
+
+def find_number(data: Any, keys: Iterable[str]) -> Optional[float]:
+    """
+    Depth-first search of nested dicts/lists for the first numeric value whose
+    key (case and punctuation ignored) is one of `keys`.
+    """
+    keys = set(keys)
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if _normalize_key(key) in keys:
+                number = _to_number(value)
+                if number is not None:
+                    return number
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                number = find_number(value, keys)
+                if number is not None:
+                    return number
+    elif isinstance(data, list):
+        for item in data:
+            number = find_number(item, keys)
+            if number is not None:
+                return number
+    return None
+
+
+def _pocket_balance(data: Any, word: str) -> Optional[float]:
+    """Balance of a pocket given as a list entry like {"name": "Savings", "balance": 1500}"""
+    if isinstance(data, dict):
+        for value in data.values():
+            found = _pocket_balance(value, word)
+            if found is not None:
+                return found
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                label = str(item.get("name") or item.get("type") or item.get("pocket") or "").lower()
+                if word in label:
+                    amount = find_number(item, ("balance", "amount", "current", "saved"))
+                    if amount is not None:
+                        return amount
+            found = _pocket_balance(item, word)
+            if found is not None:
+                return found
+    return None
+
+
+def extract_account(data: Any) -> Optional[dict]:
+    """
+    Pull balance, savings pocket and emergency fund out of a
+    get_account_details result. None if no balance can be found.
+    """
+    balance = find_number(data, BALANCE_KEYS)
+    if balance is None:
+        return None
+
+    savings = find_number(data, SAVINGS_KEYS)
+    if savings is None:
+        savings = _pocket_balance(data, "saving")
+
+    emergency_fund = find_number(data, EMERGENCY_KEYS)
+    if emergency_fund is None:
+        emergency_fund = _pocket_balance(data, "emergency")
+
+    return {
+        "balance": balance,
+        "savings": savings,
+        "emergency_fund": emergency_fund,
+    }
+
+
+def parse_date(value) -> Optional[datetime]:
+    """Parse an ISO date/timestamp into an aware UTC datetime"""
+    if isinstance(value, (int, float)):
+        # Epoch seconds or milliseconds
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _first(item: dict, *keys):
+    lowered = {_normalize_key(k): v for k, v in item.items()}
+    for key in keys:
+        if lowered.get(key) not in (None, ""):
+            return lowered[key]
+    return None
+
+
+def _find_transaction_list(data: Any) -> list:
+    if isinstance(data, list):
+        if data and all(isinstance(item, dict) for item in data) and any("amount" in map(_normalize_key, item) for item in data):
+            return data
+        for item in data:
+            found = _find_transaction_list(item)
+            if found:
+                return found
+    elif isinstance(data, dict):
+        for key in ("transactions", "recenttransactions", "data", "items", "results"):
+            for k, value in data.items():
+                if _normalize_key(k) == key:
+                    found = _find_transaction_list(value)
+                    if found:
+                        return found
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                found = _find_transaction_list(value)
+                if found:
+                    return found
+    return []
+
+
+def normalize_transaction(item: dict) -> Optional[dict]:
+    """Map one raw transaction to {id, amount, is_debit, merchant, category, date}"""
+    amount = _to_number(_first(item, "amount", "value", "amt"))
+    if amount is None:
+        return None
+
+    txn_type = str(_first(item, "type", "transactiontype", "direction", "kind") or "").lower()
+    if txn_type in CREDIT_TYPES:
+        is_debit = False
+    elif txn_type in DEBIT_TYPES:
+        is_debit = True
+    else:
+        is_debit = amount < 0
+
+    merchant = _first(item, "merchant", "merchantname", "payee", "to", "from", "description", "name", "narration")
+    category = _first(item, "category", "merchantcategory")
+
+    return {
+        "id": str(_first(item, "id", "_id", "transactionid", "txnid", "reference") or ""),
+        "amount": abs(amount),
+        "is_debit": is_debit,
+        "merchant": str(merchant or "Unknown"),
+        "category": str(category or "").lower(),
+        "date": parse_date(_first(item, "date", "timestamp", "createdat", "transactiondate", "time")),
+    }
+
+
+def extract_transactions(data: Any) -> list:
+    """Normalized transactions from a get_recent_transactions result"""
+    transactions = []
+    for item in _find_transaction_list(data):
+        txn = normalize_transaction(item)
+        if txn is not None:
+            transactions.append(txn)
+    return transactions
+
+
+def extract_bills(data: Any) -> list:
+    """Normalized bills {name, amount, due_date} from a bills tool result"""
+    items = []
+
+    def collect(node):
+        if isinstance(node, dict):
+            keys = {_normalize_key(k) for k in node}
+            if keys & {"duedate", "due", "dueon", "nextduedate"}:
+                items.append(node)
+                return
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(data)
+
+    bills = []
+    for item in items:
+        bills.append({
+            "name": str(_first(item, "name", "billname", "title", "payee", "merchant", "description") or "Bill"),
+            "amount": _to_number(_first(item, "amount", "value", "amountdue")),
+            "due_date": parse_date(_first(item, "duedate", "due", "dueon", "nextduedate")),
+        })
+    return bills
+
+
+def is_gambling(txn: dict) -> bool:
+    text = f"{txn['merchant']} {txn['category']}".lower()
+    return "gambling" in text or any(word in text for word in GAMBLING_KEYWORDS)
+
+
+def format_inr(amount: float) -> str:
+    """₹ amount with Indian digit grouping, e.g. ₹1,50,000"""
+    negative = amount < 0
+    digits = str(int(round(abs(amount))))
+    if len(digits) > 3:
+        head, tail = digits[:-3], digits[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        if head:
+            groups.insert(0, head)
+        digits = ",".join(groups) + "," + tail
+    return f"{'-' if negative else ''}₹{digits}"
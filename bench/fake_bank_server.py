@@ -0,0 +1,135 @@
+"""
+Local stand-in for the bank MCP server, for benchmarks.
+
+Serves the same tool names over SSE with deterministic per-phone data and
+a configurable delay per call:
+
+    python -m bench.fake_bank_server --port 3901 --latency 0.08 --jitter 0.5
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from mcp.server.fastmcp import FastMCP
+
+MERCHANTS = [
+    ("Sharma Tea Stall", "food", 20, 60),
+    ("Kirana Store", "groceries", 80, 400),
+    ("Indian Oil Petrol Pump", "fuel", 100, 300),
+    ("Dream11", "gambling", 50, 300),
+    ("Jio Recharge", "bills", 199, 299),
+    ("Medical Store", "health", 60, 250),
+]
+BILLS = [("Electricity Bill", 850, 4), ("School Fees", 1200, 9), ("Rent", 4000, 15)]
+
+
+class FakeBank:
+    def __init__(self, latency: float, jitter: float, days: int = 45):
+        self.latency = latency
+        self.jitter = jitter
+        self.days = days
+        self.accounts = {}
+
+    async def delay(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def account(self, phone: str) -> dict:
+        """Same data for the same phone on every run"""
+        if phone not in self.accounts:
+            rng = random.Random(phone)
+            now = datetime.now(timezone.utc)
+            transactions = []
+            for day in range(self.days):
+                date = now - timedelta(days=day, hours=rng.randint(0, 10))
+                transactions.append({
+                    "id": f"{phone}-c{day}", "type": "credit", "amount": rng.randint(500, 1000),
+                    "merchant": "Ride Earnings", "category": "income", "date": date.isoformat(),
+                })
+                for n in range(rng.randint(1, 4)):
+                    name, category, low, high = rng.choice(MERCHANTS)
+                    transactions.append({
+                        "id": f"{phone}-d{day}-{n}", "type": "debit", "amount": rng.randint(low, high),
+                        "merchant": name, "category": category,
+                        "date": (date - timedelta(minutes=30 * (n + 1))).isoformat(),
+                    })
+            self.accounts[phone] = {
+                "name": "Raju", "phone": phone,
+                "balance": rng.randint(300, 9000),
+                "savingsPocket": rng.randint(0, 3000),
+                "emergencyFund": rng.randint(0, 6000),
+                "transactions": transactions,
+                "bills": [
+                    {"name": name, "amount": amount, "dueDate": (now + timedelta(days=days)).date().isoformat()}
+                    for name, amount, days in BILLS
+                ],
+            }
+        return self.accounts[phone]
+
+
+def build_server(bank: FakeBank, host: str, port: int) -> FastMCP:
+    server = FastMCP("fake-disha-bank", host=host, port=port, log_level="WARNING")
+
+    @server.tool()
+    async def get_account_details(phone: str) -> str:
+        """Account balance, savings pocket and emergency fund for a phone number"""
+        await bank.delay()
+        account = bank.account(phone)
+        return json.dumps({key: account[key] for key in ("name", "phone", "balance", "savingsPocket", "emergencyFund")})
+
+    @server.tool()
+    async def get_recent_transactions(phone: str, since: str = "", limit: int = 200) -> str:
+        """Recent transactions, newest first; `since` is an ISO date"""
+        await bank.delay()
+        transactions = bank.account(phone)["transactions"]
+        if since:
+            transactions = [t for t in transactions if t["date"][:10] >= since]
+        return json.dumps({"transactions": transactions[:limit]})
+
+    @server.tool()
+    async def get_upcoming_bills(phone: str) -> str:
+        """Bills due soon"""
+        await bank.delay()
+        return json.dumps({"bills": bank.account(phone)["bills"]})
+
+    @server.tool()
+    async def analyze_spending_pattern(phone: str, days: int = 30) -> str:
+        """Spending per category over the last `days` days"""
+        await bank.delay()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        totals = {}
+        for t in bank.account(phone)["transactions"]:
+            if t["type"] == "debit" and t["date"] >= cutoff:
+                totals[t["category"]] = totals.get(t["category"], 0) + t["amount"]
+        return json.dumps({"days": days, "by_category": totals})
+
+    @server.tool()
+    async def transfer_to_pocket(phone: str, amount: float, pocket: str = "savings") -> str:
+        """Move money from the main balance into the savings or emergency pocket"""
+        await bank.delay()
+        account = bank.account(phone)
+        if amount <= 0 or amount > account["balance"]:
+            return json.dumps({"success": False, "error": "Insufficient balance"})
+        key = "emergencyFund" if "emergency" in pocket.lower() else "savingsPocket"
+        account["balance"] -= amount
+        account[key] += amount
+        return json.dumps({"success": True, "balance": account["balance"], key: account[key]})
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3901)
+    parser.add_argument("--latency", type=float, default=0.08, help="mean seconds per tool call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="+/- fraction of the latency")
+    args = parser.parse_args()
+
+    build_server(FakeBank(args.latency, args.jitter), args.host, args.port).run(transport="sse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+OpenAI-compatible chat completions stub, for benchmarks.
+
+Answers /v1/chat/completions (plain and streamed) with a fixed script
+that looks like what the real model does for Disha: ask for the tools a
+query needs in the first round, then answer in Hinglish. Delays are
+configurable so the agent loop sees realistic timing:
+
+    python -m bench.fake_llm --port 3902 --latency 0.4 --token-delay 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from aiohttp import web
+
+ANSWER = ("Aapka balance dekh liya. Is hafte chai aur Dream11 pe kaafi kharch hua hai, "
+          "Dream11 band karke ₹200 savings mein daalo. Emergency fund dheere dheere badhao! 💪")
+SUMMARY = "User ne balance aur weekly spending pucha; Dream11 kam karne ki salah di."
+
+
+def _phone(messages: list) -> str:
+    for message in messages:
+        content = message.get("content") or ""
+        if message.get("role") == "user" and "User Phone:" in content:
+            return content.split("User Phone:", 1)[1].split(".", 1)[0].strip()
+    return "9876543210"
+
+
+def _query(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return (message.get("content") or "").lower()
+    return ""
+
+
+def script(messages: list, tools: list) -> dict:
+    """Next assistant turn: {"content": str} or {"tool_calls": [(name, arguments)]}"""
+    tool_names = {t["function"]["name"] for t in tools or []}
+    rounds = sum(
+        1 for m in messages
+        if m.get("role") == "assistant" and m.get("tool_calls")
+        and m["tool_calls"][0].get("id") != "prefetch_account_details"
+    )
+    if not tools:
+        if messages and "running summary" in (messages[0].get("content") or ""):
+            return {"content": SUMMARY}
+        return {"content": ANSWER}
+    if rounds:
+        return {"content": ANSWER}
+
+    phone = _phone(messages)
+    query = _query(messages)
+    has_account = any(m.get("tool_call_id") == "prefetch_account_details" for m in messages)
+    calls = []
+    if any(word in query for word in ("save", "daal", "transfer", "pocket")) and "transfer_to_pocket" in tool_names:
+        calls.append(("transfer_to_pocket", {"phone": phone, "amount": 200, "pocket": "savings"}))
+    if any(word in query for word in ("kharch", "spend", "dream11", "gaya", "advice", "savings")):
+        if "get_spending_summary" in tool_names:
+            calls.append(("get_spending_summary", {"phone": phone, "days": 7}))
+        else:
+            calls.append(("get_recent_transactions", {"phone": phone}))
+        calls.append(("analyze_spending_pattern", {"phone": phone, "days": 30}))
+    if not has_account:
+        calls.insert(0, ("get_account_details", {"phone": phone}))
+
+    calls = [call for call in calls if call[0] in tool_names]
+    return {"tool_calls": calls} if calls else {"content": ANSWER}
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class FakeLLM:
+    def __init__(self, latency: float, token_delay: float, jitter: float = 0.3):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.jitter = jitter
+        self.requests = 0
+
+    async def _wait_first_token(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        messages = body.get("messages", [])
+        turn = script(messages, body.get("tools"))
+        usage = {
+            "prompt_tokens": sum(_tokens(json.dumps(m, default=str)) for m in messages),
+            "completion_tokens": _tokens(turn.get("content") or json.dumps(turn.get("tool_calls"))),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body.get("model")}
+        tool_calls = [
+            {"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+             "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for name, arguments in turn.get("tool_calls") or []
+        ]
+
+        await self._wait_first_token()
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": turn.get("content")}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            await asyncio.sleep(self.token_delay * usage["completion_tokens"] / 4)
+            return web.json_response({
+                **base, "object": "chat.completion", "usage": usage,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(choices, **extra):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": choices, **extra}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if tool_calls:
+            await send([{"index": 0, "delta": {
+                "role": "assistant",
+                "tool_calls": [{**call, "index": i} for i, call in enumerate(tool_calls)],
+            }, "finish_reason": None}])
+        else:
+            words = turn["content"].split(" ")
+            for i in range(0, len(words), 3):
+                piece = " ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "")
+                await send([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                await asyncio.sleep(self.token_delay)
+        await send([{"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_calls else "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send([], usage=usage)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+def build_app(llm: FakeLLM) -> web.Application:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", llm.handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3902)
+    parser.add_argument("--latency", type=float, default=0.4, help="mean seconds to the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    web.run_app(build_app(FakeLLM(args.latency, args.token_delay)), host=args.host, port=args.port,
+                access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Simulated Telegram side, for benchmarks.
+
+Just enough of Update / Message / Bot for the bots' handlers and the
+proactive monitor, with a configurable delay per Bot API call. Each
+incoming message records when the user first saw reply text, so the
+benchmark can report perceived latency as well as turn latency.
+"""
+import asyncio
+import itertools
+import time
+from typing import Optional
+
+_message_ids = itertools.count(1)
+
+
+class FakeTelegram:
+    """Bot API stand-in shared by every fake chat; counts and delays calls"""
+
+    def __init__(self, api_latency: float = 0.05):
+        self.api_latency = api_latency
+        self.calls = 0
+        self.alerts_sent = 0
+
+    async def call(self):
+        self.calls += 1
+        if self.api_latency > 0:
+            await asyncio.sleep(self.api_latency)
+
+
+class FakeSentMessage:
+    def __init__(self, telegram: FakeTelegram, incoming: "FakeMessage", text: str):
+        self.telegram = telegram
+        self.incoming = incoming
+        self.message_id = next(_message_ids)
+        self.text = text
+
+    async def edit_text(self, text: str, **kwargs):
+        await self.telegram.call()
+        self.text = text
+        self.incoming.saw_text(text)
+        return self
+
+
+class FakeChat:
+    def __init__(self, telegram: FakeTelegram, chat_id: int):
+        self.telegram = telegram
+        self.id = chat_id
+        self.type = "private"
+
+    async def send_action(self, action: str, **kwargs):
+        await self.telegram.call()
+
+
+class FakeUser:
+    def __init__(self, user_id: int, first_name: str = "Raju"):
+        self.id = user_id
+        self.first_name = first_name
+        self.is_bot = False
+
+
+class FakeMessage:
+    """An incoming user message; replies to it are recorded"""
+
+    PLACEHOLDERS = ("💭",)
+
+    def __init__(self, telegram: FakeTelegram, chat_id: int, text: str):
+        self.telegram = telegram
+        self.text = text
+        self.chat = FakeChat(telegram, chat_id)
+        self.chat_id = chat_id
+        self.from_user = FakeUser(chat_id)
+        self.message_id = next(_message_ids)
+        self.received = time.perf_counter()
+        self.first_text_at: Optional[float] = None
+        self.replies = []
+
+    def saw_text(self, text: str):
+        if self.first_text_at is None and text.strip() and not text.startswith(self.PLACEHOLDERS):
+            self.first_text_at = time.perf_counter()
+
+    async def reply_text(self, text: str, **kwargs) -> FakeSentMessage:
+        await self.telegram.call()
+        sent = FakeSentMessage(self.telegram, self, text)
+        self.replies.append(sent)
+        self.saw_text(text)
+        return sent
+
+
+class FakeUpdate:
+    def __init__(self, message: FakeMessage):
+        self.message = message
+        self.effective_user = message.from_user
+        self.effective_chat = message.chat
+
+
+class FakeContext:
+    """Handler context; `user_data` lives as long as the simulated user"""
+
+    def __init__(self, user_data: dict):
+        self.user_data = user_data
+        self.bot_data = {}
+        self.error = None
+
+
+class FakeBot:
+    """Bot used by the proactive monitor to send alerts"""
+
+    def __init__(self, telegram: FakeTelegram):
+        self.telegram = telegram
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await self.telegram.call()
+        self.telegram.alerts_sent += 1
+
+
+class FakeApplication:
+    def __init__(self, telegram: FakeTelegram):
+        self.bot = FakeBot(telegram)
+        self.bot_data = {}
@@ -0,0 +1,286 @@
+"""
+Replay a recorded cassette (see cassette.py) against the current code.
+
+Record in production, with phone numbers pseudonymised:
+
+    CASSETTE_RECORD=traffic.jsonl.gz python proactive_agent.py
+
+Then replay the recorded user messages and proactive checks through this
+build's router, agent loop and checks. Bank calls and completions are
+answered from the cassette with their recorded latency:
+
+    python -m bench.replay traffic.jsonl.gz                  # original timing
+    python -m bench.replay traffic.jsonl.gz --speed 10       # arrivals 10x faster
+    python -m bench.replay traffic.jsonl.gz --speed 0 --latency-scale 0.5 --json
+
+Requests the cassette has no exact answer for (e.g. the new build calls a
+different tool) get the closest recorded one and are counted as misses.
+Conversation history is not recorded, so turns are replayed without it.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict, deque
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FALLBACK_ANSWER = "Theek hai! 🙏"
+
+
+def _canonical(arguments: dict) -> str:
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"))
+
+
+class _Cycle:
+    """Recorded responses for one key, handed out in order and then reused"""
+
+    def __init__(self):
+        self._items = deque()
+
+    def add(self, item):
+        self._items.append(item)
+
+    def next(self):
+        item = self._items.popleft()
+        self._items.append(item)
+        return item
+
+    def __bool__(self):
+        return bool(self._items)
+
+
+class ReplayPool:
+    """Stands in for MCPEndpoints, answering from the cassette's mcp events"""
+
+    def __init__(self, events: list, latency_scale: float = 1.0):
+        from mcp import types
+
+        self.types = types
+        self.url = "replay"
+        self.server_version = "replay"
+        self.latency_scale = latency_scale
+        self._tools = next((e["tools"] for e in events if e["kind"] == "tools"), [])
+        self._exact = defaultdict(_Cycle)    # (tool, args) -> events
+        self._by_tool = defaultdict(_Cycle)  # tool -> events
+        for event in events:
+            if event["kind"] == "mcp":
+                self._exact[(event["tool"], _canonical(event["args"]))].add(event)
+                self._by_tool[event["tool"]].add(event)
+
+        # Metrics
+        self.calls = 0
+        self.misses = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def list_tools(self):
+        return self.types.ListToolsResult(tools=[self.types.Tool.model_validate(t) for t in self._tools])
+
+    async def call_tool(self, name: str, arguments: dict = None, idempotent: bool = False):
+        self.calls += 1
+        exact = self._exact.get((name, _canonical(arguments)))
+        if exact:
+            event = exact.next()
+        else:
+            self.misses += 1
+            event = self._by_tool[name].next() if self._by_tool.get(name) else None
+
+        if event is None:
+            text, is_error, seconds = f"Error: {name} not in cassette", True, 0.0
+        else:
+            text, is_error, seconds = event["result"], event["error"], event["ms"] / 1000
+        await asyncio.sleep(seconds * self.latency_scale)
+        return self.types.CallToolResult(content=[self.types.TextContent(type="text", text=text)], isError=is_error)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "misses": self.misses}
+
+
+class _ReplayStream:
+    """Async iterator of completion chunks, like the SDK's AsyncStream"""
+
+    def __init__(self, event: dict, model: str, latency_scale: float):
+        self.event = event
+        self.model = model
+        self.latency_scale = latency_scale
+
+    def _chunk(self, choices, usage=None):
+        from openai.types.chat import ChatCompletionChunk
+
+        return ChatCompletionChunk.model_validate({
+            "id": "replay", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": self.model, "choices": choices, "usage": usage,
+        })
+
+    async def __aiter__(self):
+        event = self.event
+        total = event["ms"] / 1000 * self.latency_scale
+        first = event.get("first_ms", event["ms"]) / 1000 * self.latency_scale
+        await asyncio.sleep(first)
+
+        if event["tool_calls"]:
+            yield self._chunk([{"index": 0, "finish_reason": None, "delta": {"role": "assistant", "tool_calls": [
+                {"index": i, "id": f"replay_{i}", "type": "function",
+                 "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for i, call in enumerate(event["tool_calls"])
+            ]}}])
+        else:
+            content = event["content"] or ""
+            pieces = [content[i:i + 40] for i in range(0, len(content), 40)] or [""]
+            for piece in pieces:
+                yield self._chunk([{"index": 0, "finish_reason": None, "delta": {"content": piece}}])
+                await asyncio.sleep(max(0.0, total - first) / len(pieces))
+        if event.get("usage"):
+            yield self._chunk([], usage={**event["usage"], "total_tokens": sum(event["usage"].values())})
+
+    async def close(self):
+        pass
+
+
+class ReplayLLM:
+    """Stands in for AsyncOpenAI, answering from the cassette's llm events"""
+
+    def __init__(self, events: list, latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self._exact = defaultdict(_Cycle)   # signature -> events
+        self._final = defaultdict(_Cycle)   # query part of the signature -> text answers
+        for event in events:
+            if event["kind"] == "llm":
+                self._exact[event["sig"]].add(event)
+                if event["content"] and not event["tool_calls"]:
+                    self._final[event["sig"].split(":")[0]].add(event)
+
+        # The SDK's client.chat.completions.create
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = self
+
+        # Metrics
+        self.calls = 0
+        self.misses = 0
+
+    def _lookup(self, messages: list, tools) -> dict:
+        from cassette import request_signature
+
+        signature = request_signature(messages)
+        exact = self._exact.get(signature)
+        if exact:
+            event = exact.next()
+            if tools or not event["tool_calls"]:
+                return event
+
+        self.misses += 1
+        final = self._final.get(signature.split(":")[0])
+        if final:
+            return final.next()
+        return {"content": FALLBACK_ANSWER, "tool_calls": None, "usage": None, "ms": 500.0}
+
+    async def create(self, model: str, messages: list, tools=None, stream: bool = False, **kwargs):
+        from openai.types.chat import ChatCompletion
+
+        self.calls += 1
+        event = self._lookup(messages, tools)
+        if stream:
+            return _ReplayStream(event, model, self.latency_scale)
+
+        await asyncio.sleep(event["ms"] / 1000 * self.latency_scale)
+        message = {"role": "assistant", "content": event["content"]}
+        if event["tool_calls"]:
+            message["tool_calls"] = [
+                {"id": f"replay_{i}", "type": "function", "function": call}
+                for i, call in enumerate(event["tool_calls"])
+            ]
+        return ChatCompletion.model_validate({
+            "id": "replay", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if event["tool_calls"] else "stop"}],
+            "usage": {**event["usage"], "total_tokens": sum(event["usage"].values())} if event.get("usage") else None,
+        })
+
+    async def close(self):
+        pass
+
+
+async def replay(events: list, speed: float, latency_scale: float) -> dict:
+    from agent import DishaAgent
+    from bench.run_bench import percentiles
+    from intent_router import ROUTE_DIRECT, IntentRouter, RouteDecision
+    from proactive_checks import evaluate, fetch_snapshot
+    from tool_catalog import ToolCatalog
+
+    agent = DishaAgent()
+    agent.pool = ReplayPool(events, latency_scale)
+    agent.tool_catalog = ToolCatalog(agent.pool)
+    agent.client = ReplayLLM(events, latency_scale)
+    router = IntentRouter()
+
+    turns = [event for event in events if event["kind"] == "turn"]
+    latencies = defaultdict(list)
+
+    async def run_turn(event: dict):
+        if speed > 0:
+            await asyncio.sleep(event["t"] / speed)
+        started = time.perf_counter()
+        if event["check"]:
+            evaluate(await fetch_snapshot(agent, event["phone"]))
+            latencies["check_s"].append(time.perf_counter() - started)
+        else:
+            decision = None
+            if event.get("source") == "command":
+                decision = RouteDecision(event["intent"], ROUTE_DIRECT, 1.0, source="command")
+            await router.answer(agent, event["phone"], event["message"], decision=decision)
+            latencies["chat_s"].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_turn(event) for event in turns))
+    wall = time.perf_counter() - started
+
+    return {
+        "turns": len(turns),
+        **{kind: percentiles(values) for kind, values in latencies.items()},
+        "turns_per_s": round(len(turns) / wall, 2) if wall else 0.0,
+        "recorded_span_s": turns[-1]["t"] - turns[0]["t"] if turns else 0.0,
+        "mcp_calls": agent.pool.calls,
+        "mcp_misses": agent.pool.misses,
+        "llm_calls": agent.client.calls,
+        "llm_misses": agent.client.misses,
+        "routes": router.stats()["routes"],
+        "load": agent.load_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="arrival speed-up: 1 = as recorded, 10 = ten times faster, 0 = all at once")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier for recorded bank and LLM latencies (0 = instant)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.path.insert(0, REPO_ROOT)
+    # Never re-record while replaying; the client needs a key even though it is replaced
+    os.environ["CASSETTE_RECORD"] = ""
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+
+    from bench.run_bench import print_report, print_stages
+    from cassette import load_cassette
+    from tracing import metrics
+
+    result = asyncio.run(replay(load_cassette(args.cassette), args.speed, args.latency_scale))
+    if args.json:
+        print(json.dumps({"args": vars(args), "results": result, "stages": metrics.stats()}, indent=2, default=str))
+    else:
+        print_report(f"replay of {os.path.basename(args.cassette)}", result)
+        print_stages(metrics.stats())
+
+
+if __name__ == "__main__":
+    main()
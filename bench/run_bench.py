@@ -0,0 +1,304 @@
+"""
+Offline benchmark for Disha: no Render, OpenAI or Telegram needed.
+
+Starts the fake bank MCP server and the fake LLM as subprocesses, points
+the agent at them and drives one of the scenarios with simulated users:
+
+    agent     DishaAgent.process_message directly
+    telegram  telegram_bot.handle_message with fake updates (streamed replies)
+    monitor   the proactive monitor checking every registered user once
+
+    python -m bench.run_bench --scenario telegram --users 50 --messages 5
+    python -m bench.run_bench --scenario all --json > bench.json
+    python -m bench.run_bench --scenario agent --max-p95 3.0   # non-zero exit if slower
+
+Reports p50/p95/p99 latency, messages (or checks) per second, RSS growth per
+user and the per-stage breakdown from tracing.py.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = [
+    "Mera balance kitna hai?",
+    "Is hafte kitna kharch hua?",
+    "Dream11 pe kitna gaya?",
+    "₹200 savings mein daal do",
+    "School fees ke liye kaise save karun? Kuch advice do",
+    "Chai pe bahut kharch ho raha hai kya?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Fake server on port {port} did not start")
+
+
+def start_fakes(args) -> list:
+    """Start the fake bank and LLM servers and point the agent's config at them"""
+    bank_port, llm_port = free_port(), free_port()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "bench.fake_bank_server", "--port", str(bank_port),
+             "--latency", str(args.bank_latency)],
+            cwd=REPO_ROOT, stderr=subprocess.DEVNULL,
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "bench.fake_llm", "--port", str(llm_port),
+             "--latency", str(args.llm_latency), "--token-delay", str(args.token_delay)],
+            cwd=REPO_ROOT, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    wait_for_port(bank_port)
+    wait_for_port(llm_port)
+
+    # Read by the repo's modules at import time, so this runs before they are imported
+    state_dir = tempfile.mkdtemp(prefix="disha-bench-")
+    os.environ.update({
+        "BANK_MCP_URL": f"http://127.0.0.1:{bank_port}/sse",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_KEY": "bench",
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "USER_DB_PATH": os.path.join(state_dir, "users.db"),
+        "LEGACY_USERS_FILE": os.path.join(state_dir, "registered_users.json"),
+        "MONITOR_INTERVAL": str(args.spread),
+        "TRACE_FILE": "",
+    })
+    return processes
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 3)}
+
+
+def phone_of(user: int) -> str:
+    return f"9{800000000 + user:09d}"
+
+
+async def run_users(users: int, messages: int, think: float, send_one):
+    """Every user sends `messages` messages one after another, all users in parallel"""
+    async def user_loop(user: int):
+        rng = random.Random(user)
+        for _ in range(messages):
+            await send_one(user, rng.choice(MESSAGES))
+            if think:
+                await asyncio.sleep(rng.uniform(0, 2 * think))
+
+    await asyncio.gather(*(user_loop(user) for user in range(users)))
+
+
+async def bench_agent(args) -> dict:
+    from agent import DishaAgent
+
+    agent = DishaAgent()
+    await agent.start()
+    latencies = []
+
+    async def send_one(user: int, text: str):
+        started = time.perf_counter()
+        await agent.process_message(phone_of(user), text)
+        latencies.append(time.perf_counter() - started)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await run_users(args.users, args.messages, args.think, send_one)
+    wall = time.perf_counter() - started
+    result = {
+        "latency_s": percentiles(latencies),
+        "messages_per_s": round(len(latencies) / wall, 2),
+        "rss_per_user_kb": round((rss_mb() - rss_before) * 1024 / args.users, 1),
+        "load": agent.load_stats(),
+    }
+    await agent.close()
+    return result
+
+
+async def bench_telegram(args) -> dict:
+    import telegram_bot
+    from bench.fake_telegram import FakeContext, FakeMessage, FakeTelegram, FakeUpdate
+
+    telegram = FakeTelegram(args.telegram_latency)
+    await telegram_bot.disha.start()
+    user_data = {user: {"phone": phone_of(user), "user_name": "Raju"} for user in range(args.users)}
+    latencies, first_text = [], []
+
+    async def send_one(user: int, text: str):
+        message = FakeMessage(telegram, 100000 + user, text)
+        await telegram_bot.handle_message(FakeUpdate(message), FakeContext(user_data[user]))
+        latencies.append(time.perf_counter() - message.received)
+        if message.first_text_at is not None:
+            first_text.append(message.first_text_at - message.received)
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await run_users(args.users, args.messages, args.think, send_one)
+    wall = time.perf_counter() - started
+    result = {
+        "latency_s": percentiles(latencies),
+        "first_text_s": percentiles(first_text),
+        "messages_per_s": round(len(latencies) / wall, 2),
+        "rss_per_user_kb": round((rss_mb() - rss_before) * 1024 / args.users, 1),
+        "telegram_api_calls": telegram.calls,
+        "routes": telegram_bot.router.stats()["routes"],
+        "turns": telegram_bot.turns.stats(),
+        "load": telegram_bot.disha.load_stats(),
+    }
+    await telegram_bot.disha.close()
+    return result
+
+
+async def bench_monitor(args) -> dict:
+    import proactive_agent
+    from bench.fake_telegram import FakeApplication, FakeTelegram
+
+    telegram = FakeTelegram(args.telegram_latency)
+    for user in range(args.users):
+        proactive_agent.users.upsert(phone_of(user), 100000 + user, "Bench")
+    await proactive_agent.disha.start()
+    scheduler = proactive_agent.scheduler
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    monitor = asyncio.create_task(proactive_agent.background_monitoring(FakeApplication(telegram)))
+    try:
+        # First checks are spread over MONITOR_INTERVAL (--spread) seconds
+        while scheduler.checks_run < args.users:
+            if monitor.done():
+                monitor.result()
+            await asyncio.sleep(0.05)
+    finally:
+        monitor.cancel()
+    wall = time.perf_counter() - started
+
+    result = {
+        "check_s": percentiles(list(scheduler._durations)),
+        "lag_s": percentiles(list(scheduler._lags)),
+        "checks_per_s": round(scheduler.checks_run / wall, 2),
+        "checks_failed": scheduler.checks_failed,
+        "alert_messages": telegram.alerts_sent,
+        "rss_per_user_kb": round((rss_mb() - rss_before) * 1024 / args.users, 1),
+    }
+    await proactive_agent.disha.close()
+    return result
+
+
+SCENARIOS = {"agent": bench_agent, "telegram": bench_telegram, "monitor": bench_monitor}
+
+
+def print_report(name: str, result: dict):
+    print(f"\n== {name} ==")
+    for key, value in result.items():
+        if isinstance(value, dict) and {"p50", "p95", "p99"} <= set(value):
+            print(f"  {key:<20} p50={value['p50']:.3f}  p95={value['p95']:.3f}  p99={value['p99']:.3f}  "
+                  f"max={value['max']:.3f}")
+        else:
+            print(f"  {key:<20} {value}")
+
+
+def print_stages(stages: dict):
+    print("\n== stages (from tracing.py histograms, bucket upper bounds) ==")
+    for stage, stats in stages.items():
+        print(f"  {stage:<22} n={stats['count']:<6} p50<={stats['p50_s']}s  p95<={stats['p95_s']}s")
+
+
+def latency_p95(result: dict) -> Optional[float]:
+    for key in ("latency_s", "check_s"):
+        if key in result:
+            return result[key]["p95"]
+    return None
+
+
+async def run(args) -> dict:
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = {}
+    for name in names:
+        results[name] = await SCENARIOS[name](args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="telegram")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5, help="messages per user")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds between a user's messages")
+    parser.add_argument("--spread", type=float, default=2.0, help="seconds over which monitor checks start")
+    parser.add_argument("--bank-latency", type=float, default=0.08, help="mean seconds per bank tool call")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="mean seconds to the first LLM token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed LLM chunks")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per Bot API call")
+    parser.add_argument("--max-p95", type=float, help="exit with status 1 if any scenario's p95 exceeds this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the bots' INFO logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    sys.path.insert(0, REPO_ROOT)
+    processes = start_fakes(args)
+    try:
+        results = asyncio.run(run(args))
+        from tracing import metrics
+        stages = metrics.stats()
+    finally:
+        for process in processes:
+            process.terminate()
+
+    if args.json:
+        print(json.dumps({"args": vars(args), "results": results, "stages": stages}, indent=2, default=str))
+    else:
+        for name, result in results.items():
+            print_report(name, result)
+        print_stages(stages)
+
+    if args.max_p95 is not None:
+        slow = {name: latency_p95(r) for name, r in results.items() if (latency_p95(r) or 0) > args.max_p95}
+        if slow:
+            print(f"\np95 over {args.max_p95}s: {slow}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Startup time of the bot entry points, offline.
+
+For each entry module, `python -X importtime` measures what importing it
+costs and which of its direct imports cost the most. Then a fresh process
+imports it and runs its warm-up (agent imports, MCP sessions, tool
+catalog) against the fake bank server and LLM, reporting the startup
+phases from startup.py:
+
+    python -m bench.startup_time
+    python -m bench.startup_time --module proactive_agent --top 15
+    python -m bench.startup_time --max-ready 3.0   # non-zero exit if slower
+
+Ready time is measured from process start, so it includes interpreter
+start-up and imports as well as the warm-up.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULES = ["telegram_bot", "proactive_agent"]
+HEAVY_PACKAGES = ["openai", "mcp", "telegram", "aiohttp", "numpy"]
+
+WARM_UP_SCRIPT = """
+import asyncio, json, logging, {module}
+from startup import readiness
+logging.disable(logging.INFO)
+readiness.mark_imported()
+async def main():
+    await {module}.warm_up()
+    await {module}.disha.close()
+asyncio.run(main())
+print(json.dumps(readiness.stats()))
+"""
+
+
+def import_times(module: str) -> dict:
+    """Parse `python -X importtime -c 'import module'` into totals and the costliest direct imports"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    total = next((cumulative for _, cumulative, name in rows if name.strip() == module), 0)
+    # The entry module's own imports are indented one level deeper than it
+    direct = [(cumulative, name.strip()) for _, cumulative, name in rows
+              if name.startswith("   ") and not name.startswith("    ")]
+    packages = {name.strip().split(".")[0] for _, _, name in rows}
+    return {
+        "import_s": round(total / 1e6, 3),
+        "direct_imports": sorted(direct, reverse=True),
+        "loaded": [package for package in HEAVY_PACKAGES if package in packages],
+    }
+
+
+def ready_time(module: str) -> dict:
+    """Startup phases of a fresh process that imports `module` and runs its warm-up"""
+    result = subprocess.run([sys.executable, "-c", WARM_UP_SCRIPT.format(module=module)],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} warm-up failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", choices=ENTRY_MODULES, action="append", help="entry module(s) to measure")
+    parser.add_argument("--top", type=int, default=8, help="costliest direct imports to list")
+    parser.add_argument("--bank-latency", type=float, default=0.08, help="mean seconds per fake bank tool call")
+    parser.add_argument("--max-ready", type=float, help="exit with status 1 if any module takes longer to be ready")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from bench.run_bench import start_fakes
+
+    # Fakes as in run_bench; the measured processes inherit their URLs from the environment
+    processes = start_fakes(SimpleNamespace(bank_latency=args.bank_latency, llm_latency=0.0, token_delay=0.0,
+                                            spread=2.0))
+    results = {}
+    try:
+        for module in args.module or ENTRY_MODULES:
+            results[module] = {**import_times(module), "startup": ready_time(module)}
+    finally:
+        for process in processes:
+            process.terminate()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results.items():
+            startup = result["startup"]
+            print(f"\n== {module} ==")
+            print(f"  import              {result['import_s']:.3f}s  "
+                  f"(loaded: {', '.join(result['loaded']) or '-'})")
+            for cumulative, name in result["direct_imports"][:args.top]:
+                print(f"    {name:<24} {cumulative / 1e6:.3f}s")
+            print(f"  ready after         {startup['ready_after_s']}s (budget {startup['budget_s']}s)")
+            for phase, seconds in startup["phases_s"].items():
+                print(f"    {phase:<24} {seconds:.3f}s")
+
+    if args.max_ready is not None:
+        slow = {module: r["startup"]["ready_after_s"] for module, r in results.items()
+                if (r["startup"]["ready_after_s"] or 0) > args.max_ready}
+        if slow:
+            print(f"\nready over {args.max_ready}s: {slow}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CASSETTE_RECORD = os.getenv("CASSETTE_RECORD", "")  # cassette file to record into ("" disables), e.g. traffic.jsonl.gz
+
+CASSETTE_VERSION = 1
+FLUSH_EVERY = 50  # events; a flushed cassette stays readable if the process dies
+
+# Indian mobile numbers, optionally with +91 / 91 in front
+PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?91[\s-]?)?([6-9]\d{9})(?!\d)")
+
+
+class Redactor:
+    """
+    Replaces phone numbers with stable pseudonyms (9000000001, 9000000002,
+    ...), so one user's calls still line up with each other in a cassette
+    but the real number is never written.
+    """
+
+    def __init__(self):
+        self._pseudonyms = {}
+
+    def phone(self, phone: str) -> str:
+        if phone not in self._pseudonyms:
+            self._pseudonyms[phone] = f"9{len(self._pseudonyms) + 1:09d}"
+        return self._pseudonyms[phone]
+
+    def text(self, text: Optional[str]) -> Optional[str]:
+        if not text:
+            return text
+        return PHONE_PATTERN.sub(lambda m: self.phone(m.group(1)), text)
+
+    def value(self, value: Any) -> Any:
+        """Redact every string inside a JSON-like value"""
+        if isinstance(value, str):
+            return self.text(value)
+        if isinstance(value, dict):
+            return {key: self.value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and PHONE_PATTERN.fullmatch(str(value)):
+            return int(self.phone(str(value)))
+        return value
+
+
+def request_signature(messages: list) -> str:
+    """
+    What a completion request is about, stable across prompt changes: the
+    latest user message plus how many assistant steps followed it. Replay
+    answers a request with the response recorded for the same signature.
+    """
+    query, step = "", 0
+    for message in messages:
+        role = message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
+        if role == "user":
+            query = message.get("content") if isinstance(message, dict) else message.content
+            step = 0
+        elif role == "assistant":
+            step += 1
+    return f"{hashlib.sha1((query or '').encode()).hexdigest()[:12]}:{step}"
+
+
+def _tool_calls(message) -> Optional[list]:
+    if not getattr(message, "tool_calls", None):
+        return None
+    return [{"name": tc.function.name, "arguments": tc.function.arguments} for tc in message.tool_calls]
+
+
+class CassetteRecorder:
+    """
+    Records the agent's upstream traffic into a gzipped JSONL cassette.
+
+    Events, each with `t` (seconds since recording started):
+      tools  the bank tool list (once)
+      turn   a user message or proactive check entering the bot
+      mcp    one bank tool call: tool, arguments, result text, latency
+      llm    one completion: request signature, model, the assistant
+             message (text or tool calls), token usage, latency
+
+    Phone numbers are replaced with pseudonyms everywhere. Full LLM
+    prompts are not stored, only their signature. bench/replay.py plays a
+    cassette back against the current code.
+    """
+
+    def __init__(self, path: str = CASSETTE_RECORD):
+        self.path = path
+        self.redact = Redactor()
+        self._file = None
+        self._started = time.monotonic()
+        self._tools_recorded = False
+
+        # Metrics
+        self.events = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _write(self, kind: str, **event):
+        try:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+                self._started = time.monotonic()
+                self._file.write(json.dumps({"cassette": CASSETTE_VERSION, "recorded_at": time.time()}) + "\n")
+                atexit.register(self.close)
+            event = {"t": round(time.monotonic() - self._started, 3), "kind": kind, **event}
+            self._file.write(json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+            self.events += 1
+            if self.events % FLUSH_EVERY == 0:
+                self._file.flush()
+        except OSError as e:
+            logger.warning(f"Cassette recording to {self.path} failed, stopping: {e}")
+            self.path = ""
+
+    def tools(self, tools: list):
+        if not self.enabled or self._tools_recorded:
+            return
+        self._tools_recorded = True
+        self._write("tools", tools=[tool.model_dump(mode="json", exclude_none=True) for tool in tools])
+
+    def turn(self, phone: str, message: Optional[str] = None, intent: Optional[str] = None,
+             source: Optional[str] = None, check: bool = False):
+        if not self.enabled:
+            return
+        self._write("turn", phone=self.redact.phone(phone), check=check,
+                    message=self.redact.text(message), intent=intent, source=source)
+
+    def mcp(self, tool: str, arguments: dict, result: str, is_error: bool, seconds: float):
+        if not self.enabled:
+            return
+        self._write("mcp", tool=tool, args=self.redact.value(arguments), result=self.redact.text(result),
+                    error=is_error, ms=round(seconds * 1000, 1))
+
+    def llm(self, messages: list, model: str, message, usage, seconds: float, stream: bool = False,
+            first_chunk: Optional[float] = None):
+        if not self.enabled:
+            return
+        self._write(
+            "llm",
+            sig=request_signature(self.redact.value([_plain(m) for m in messages])),
+            model=model,
+            stream=stream,
+            content=self.redact.text(message.content),
+            tool_calls=self.redact.value(_tool_calls(message)),
+            usage={"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens} if usage else None,
+            ms=round(seconds * 1000, 1),
+            **({"first_ms": round(first_chunk * 1000, 1)} if first_chunk is not None else {}),
+        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {"recording": self.enabled, "events": self.events}
+
+
+def _plain(message) -> dict:
+    """Role and content of a message dict or SDK message object"""
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {"role": getattr(message, "role", None), "content": getattr(message, "content", None)}
+
+
+def load_cassette(path: str) -> list:
+    """All events of a cassette, in recorded order"""
+    events = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+        except (EOFError, ValueError):
+            # Recorder was killed: keep everything up to its last flush
+            pass
+    return [event for event in events if "kind" in event]
+
+
+recorder = CassetteRecorder()
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from user_store import USER_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CHAT_STATE_FLUSH_INTERVAL = float(os.getenv("CHAT_STATE_FLUSH_INTERVAL", "30"))  # seconds between batched writes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id     INTEGER PRIMARY KEY,
+    data        TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Keeps each Telegram user's `context.user_data` (phone, history, summary,
+    notifications) in SQLite so it survives restarts.
+
+    Nothing is loaded at startup: a user's row is read the first time one
+    of their updates is handled. The Application hands over the users that
+    were touched every CHAT_STATE_FLUSH_INTERVAL; rows whose content didn't
+    actually change are skipped and the rest are written in one transaction.
+    Only user_data is persisted; bot_data, chat_data and callback data are
+    not used by the bots.
+    """
+
+    def __init__(self, path: str = USER_DB_PATH, update_interval: float = CHAT_STATE_FLUSH_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+        self._loaded = set()                  # users whose row has been read
+        self._digests: Dict[int, str] = {}    # user -> digest of the last stored JSON
+        self._pending: Dict[int, str] = {}    # user -> JSON waiting to be written
+        self._write_scheduled = False
+
+    # Loading
+
+    async def get_user_data(self) -> dict:
+        # Loaded lazily in refresh_user_data, so startup cost doesn't grow with users
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded:
+            return
+        self._loaded.add(user_id)
+
+        row = self._db.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return
+        self._digests[user_id] = hashlib.sha1(row[0].encode()).hexdigest()
+        for key, value in json.loads(row[0]).items():
+            user_data.setdefault(key, value)
+
+    # Saving
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        try:
+            encoded = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping unserialisable user_data for {user_id}: {e}")
+            return
+
+        digest = hashlib.sha1(encoded.encode()).hexdigest()
+        if self._digests.get(user_id) == digest:
+            return  # touched but unchanged
+        self._digests[user_id] = digest
+        self._pending[user_id] = encoded
+
+        # The Application hands over all touched users at once; write them together
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            asyncio.get_running_loop().call_soon(self._write_pending)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending.pop(user_id, None)
+        self._digests.pop(user_id, None)
+        self._db.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    def _write_pending(self):
+        self._write_scheduled = False
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        try:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(user_id, data, now) for user_id, data in pending.items()]
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._db.execute("ROLLBACK")
+            logger.error(f"Could not persist user_data for {len(pending)} users: {e}")
+            # Keep them for the next write (newer data for a user wins)
+            self._pending = {**pending, **self._pending}
+            return
+        logger.debug(f"Persisted user_data for {len(pending)} users")
+
+    async def flush(self) -> None:
+        self._write_pending()
+        self._db.close()
+
+    # Unused stores
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> Optional[tuple]:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
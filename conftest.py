@@ -0,0 +1,148 @@
+"""
+Fakes shared by the unit tests, so none of them needs the bank server,
+OpenAI or Telegram.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import NetworkError, RetryAfter
+
+from mcp_pool import MCPSessionPool
+from transaction_store import TransactionLedger
+
+
+class FakeConnection:
+    """A pooled MCP connection that is always up and counts reconnects"""
+
+    def __init__(self):
+        self.session = object()
+        self.alive = True
+        self.last_used = 0.0
+        self.reopened = 0
+
+    async def reopen(self):
+        self.reopened += 1
+
+
+class FakePool:
+    """An MCPSessionPool whose calls answer "ok" (or raise `error`) after `delay` seconds"""
+
+    def __init__(self, error=None, delay: float = 0.0):
+        self.error = error
+        self.delay = delay
+        self.calls = []  # the idempotent flag of every call
+        self.live_connections = 1
+        self.server_version = "fake"
+
+    async def run(self, operation, idempotent=False):
+        self.calls.append(idempotent)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return "ok"
+
+
+class FakeAgent:
+    """The part of DishaAgent that ConversationMemory uses: complete() returns `summary`"""
+
+    cheap_model = "cheap"
+
+    def __init__(self, summary: str = "Raju ₹500 savings mein daalna chahta hai"):
+        self.summary = summary
+        self.prompts = []
+
+    async def complete(self, messages, model=None):
+        self.prompts.append(messages)
+        return SimpleNamespace(content=self.summary)
+
+
+class FakeMessage:
+    """A sent Telegram message; its first `refuse_edits` edits fail with RetryAfter"""
+
+    def __init__(self, text: str, refuse_edits: int = 0, retry_after: float = 0.05):
+        self.text = text
+        self.refuse_edits = refuse_edits
+        self.retry_after = retry_after
+        self.edit_times = []
+
+    async def edit_text(self, text: str, **kwargs):
+        self.edit_times.append(asyncio.get_running_loop().time())
+        if self.refuse_edits:
+            self.refuse_edits -= 1
+            raise RetryAfter(self.retry_after)
+        self.text = text
+
+
+class FakeIncoming:
+    """A message from the user; replies are FakeMessages built with `sent_options`"""
+
+    def __init__(self, **sent_options):
+        self.sent = []
+        self.sent_options = sent_options
+
+    async def reply_text(self, text: str, **kwargs):
+        message = FakeMessage(text, **self.sent_options)
+        self.sent.append(message)
+        return message
+
+
+class FakeBot:
+    """A Telegram bot whose first `failures` sends raise `error`; delivered texts are in `sent`"""
+
+    def __init__(self, failures: int = 0, error: Exception = None):
+        self.failures = failures
+        self.error = error or NetworkError("connection reset")
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.sent.append(text)
+
+
+@pytest.fixture
+def session_pool():
+    """An MCPSessionPool holding one FakeConnection, as if start() had run"""
+    pool = MCPSessionPool("http://bank.invalid/sse", size=1)
+    conn = FakeConnection()
+    pool._connections = [conn]
+    pool._idle.put_nowait(conn)
+    pool._started = True
+    return pool
+
+
+@pytest.fixture
+def fake_pool():
+    return FakePool
+
+
+@pytest.fixture
+def fake_agent():
+    return FakeAgent()
+
+
+@pytest.fixture
+def incoming():
+    return FakeIncoming
+
+
+@pytest.fixture
+def fake_bot():
+    return FakeBot
+
+
+@pytest.fixture
+def make_ledger():
+    """make_ledger(now, (merchant, amount, days_ago[, is_debit]), ...) -> TransactionLedger"""
+    def make(now: datetime, *rows) -> TransactionLedger:
+        ledger = TransactionLedger()
+        ledger.add([
+            {"id": str(i), "merchant": row[0], "amount": row[1], "is_debit": row[3] if len(row) > 3 else True,
+             "category": "", "date": now - timedelta(days=row[2])}
+            for i, row in enumerate(rows)
+        ])
+        return ledger
+    return make
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))  # raw recent turns
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "200"))
+MIN_RECENT_MESSAGES = 4  # always keep the last 2 exchanges verbatim
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a Telegram chat between a user and Disha, their financial advisor.
+Merge the new messages into the existing summary. Keep only what matters later: amounts, goals,
+decisions, promises and open requests. Plain Hinglish, at most 80 words, no greetings.
+"""
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, otherwise a chars/3 estimate"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 3 + 1
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message.get("content") or "") + 4  # role/format overhead
+
+
+class ConversationMemory:
+    """
+    Per-user conversation memory kept inside the chat's `user_data`.
+
+    Recent turns are kept verbatim in `user_data['history']` up to
+    HISTORY_TOKEN_BUDGET tokens. Older turns are folded into a short running
+    summary in `user_data['summary']` by the cheap model, in the background,
+    so replies never wait on it. The static system prompt is left alone by
+    the agent, so it stays a cacheable prefix.
+
+    The fold finishes after the handler has returned, so persistence doesn't
+    see the new summary by itself; add_turn's `on_summary` callback is the
+    place to mark the user's data as changed.
+    """
+
+    def __init__(self, agent, token_budget: int = HISTORY_TOKEN_BUDGET, summary_max_tokens: int = SUMMARY_MAX_TOKENS):
+        self.agent = agent
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self._folds = {}  # id(user_data) -> running summary task
+
+    def history(self, user_data: dict) -> list:
+        """Messages to pass to the agent: running summary (if any) + recent turns"""
+        messages = []
+        summary = user_data.get('summary')
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this chat (summary): {summary}"})
+        messages.extend(user_data.get('history', []))
+        return messages
+
+    def add_turn(self, user_data: dict, user_message: str, response: str,
+                 on_summary: Optional[Callable[[], None]] = None):
+        """Record one exchange and fold the oldest turns if over budget"""
+        history = user_data.setdefault('history', [])
+        history.append({"role": "user", "content": user_message})
+        history.append({"role": "assistant", "content": response})
+
+        folded = []
+        while len(history) > MIN_RECENT_MESSAGES and sum(message_tokens(m) for m in history) > self.token_budget:
+            # Drop a whole exchange at a time so roles stay paired
+            folded.extend(history[:2])
+            del history[:2]
+
+        if folded:
+            self._schedule_fold(user_data, folded, on_summary)
+
+    def _schedule_fold(self, user_data: dict, folded: list, on_summary: Optional[Callable[[], None]]):
+        key = id(user_data)
+        previous = self._folds.get(key)
+        task = asyncio.create_task(self._fold(user_data, folded, previous, on_summary))
+        self._folds[key] = task
+        task.add_done_callback(lambda t: self._folds.pop(key, None) if self._folds.get(key) is t else None)
+
+    async def _fold(self, user_data: dict, folded: list, previous: Optional[asyncio.Task],
+                    on_summary: Optional[Callable[[], None]] = None):
+        if previous:
+            # Folds for one user apply in order
+            await asyncio.gather(previous, return_exceptions=True)
+
+        summary = user_data.get('summary', "")
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in folded)
+
+        try:
+            msg = await self.agent.complete(
+                [
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                ],
+                model=self.agent.cheap_model
+            )
+            new_summary = (msg.content or "").strip()
+        except Exception as e:
+            logger.warning(f"History summarisation failed, keeping extract: {e}")
+            new_summary = ""
+
+        if not new_summary:
+            # Extractive fallback: keep the start of each folded message
+            extract = " | ".join(m['content'][:80] for m in folded)
+            new_summary = f"{summary} | {extract}" if summary else extract
+
+        # Keep the summary itself within budget (newest facts are at the end)
+        while count_tokens(new_summary) > self.summary_max_tokens and len(new_summary) > 40:
+            new_summary = new_summary[len(new_summary) // 4:]
+
+        user_data['summary'] = new_summary
+        if on_summary:
+            on_summary()
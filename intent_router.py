@@ -0,0 +1,242 @@
+import logging
+import os
+import re
+import time
+from typing import AsyncIterator, Optional
+
+from cassette import recorder
+from quick_replies import quick_balance, quick_merchant_spend, quick_spending
+from tracing import span, tag_trace
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.8"))
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH")  # optional scikit-learn pipeline (joblib)
+
+# Routes
+ROUTE_DIRECT = "direct"  # answer from a tool call + template, no LLM
+ROUTE_CHEAP = "cheap"    # agent on the cheaper model tier
+ROUTE_FULL = "full"      # agent on the default model
+
+# Questions that need reasoning, not just a number
+ADVICE_WORDS = re.compile(
+    r"\b(kyu|kyun|kyon|why|kaise|how|should|chahiye|advice|suggest|plan|sakta|sakti|sakte|"
+    r"invest|loan|udhaar|kam\s+kar|bachau|bacha)\b"
+)
+BALANCE = re.compile(r"\b(balance|bal|kitna\s+paisa|kitne\s+paise|paise\s+kitne|paisa\s+kitna)\b")
+SPENDING = re.compile(r"\b(kharch|kharcha|kharche|spend|spent|spending|expense|expenses)\b")
+THIS_WEEK = re.compile(r"\b(hafte|hafta|week|weekly|saptah)\b")
+LAST_WEEK = re.compile(r"\b(pichle|pichhle|pichla|last|previous)\s+(hafte|hafta|week|saptah)\b")
+PERIOD = r"(?:aaj|today|is\s+hafte|is\s+hafta|is\s+week|this\s+week|is\s+mahine|is\s+month|this\s+month)"
+MERCHANT_SPEND = re.compile(
+    r"^(?:mera\s+|maine\s+|meri\s+)?(?:(?P<lead>" + PERIOD + r")\s+)?"
+    r"(?P<merchant>[a-z0-9][a-z0-9 .&'-]{1,30}?)\s+(?:pe|par|pr|mein|me|on)\s+"
+    r"(?:(?P<period>" + PERIOD + r")\s+)?kitn[ae]\s*(?:paisa|paise|rs|rupees|rupaye)?\s*"
+    r"(?:gaya|gaye|gya|gye|kharch|laga|lage|udaya|udaye|spend|spent)"
+)
+TRANSFER = re.compile(
+    r"(?:₹|rs\.?\s*)?(?P<amount>\d[\d,]*)\s*(?:rs|rupees|rupaye|₹)?\s+.*?"
+    r"(?P<pocket>savings?|emergency)\b.*?\b(?:daal|dal|daalo|dalo|transfer|jama|add|bhej|rakh)"
+)
+SMALL_TALK = re.compile(
+    r"^(hi|hii|hello|hey|namaste|namaskar|thanks|thank\s+you|thank\s+u|shukriya|dhanyavad|ok|okay|theek\s+hai|accha|achha|bye)\b"
+)
+
+# Words that look like a merchant to MERCHANT_SPEND but are really "total spend" questions
+NOT_MERCHANTS = {"is hafte", "hafte", "week", "is mahine", "mahine", "month", "aaj", "kal", "total", "sab", "kul"}
+
+
+def _period(text: Optional[str]) -> Optional[str]:
+    """Canonical period ("today", "week", "month") for a PERIOD match"""
+    if not text:
+        return None
+    if "aaj" in text or "today" in text:
+        return "today"
+    if "mahine" in text or "month" in text:
+        return "month"
+    return "week"
+
+
+class RouteDecision:
+    """Outcome of classifying one message"""
+
+    def __init__(self, intent: str, route: str, confidence: float, source: str = "rules", **params):
+        self.intent = intent
+        self.route = route
+        self.confidence = confidence
+        self.source = source
+        self.params = params
+
+    def __repr__(self):
+        return f"RouteDecision({self.intent}, {self.route}, {self.confidence:.2f}, {self.source}, {self.params})"
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().strip()
+    text = re.sub(r"[?!.,]+$", "", text)
+    return re.sub(r"\s+", " ", text)
+
+
+class IntentRouter:
+    """
+    Cheap, local first stage in front of DishaAgent.
+
+    Keyword/regex rules (and, if INTENT_MODEL_PATH points to a scikit-learn
+    pipeline, a small on-CPU classifier for messages the rules can't place)
+    decide whether a message is answered by a direct tool call, by the agent
+    on the cheaper model tier, or by the full agent. Every decision is logged
+    with its confidence, and per-route counts and latencies are kept in
+    `stats()` so the LLM calls saved can be measured.
+    """
+
+    def __init__(self, min_confidence: float = INTENT_MIN_CONFIDENCE, model_path: Optional[str] = INTENT_MODEL_PATH):
+        self.min_confidence = min_confidence
+        self.model_path = model_path
+        self._model = None
+        self._model_loaded = False
+        self.counts = {ROUTE_DIRECT: 0, ROUTE_CHEAP: 0, ROUTE_FULL: 0}
+        self.latency = {ROUTE_DIRECT: 0.0, ROUTE_CHEAP: 0.0, ROUTE_FULL: 0.0}
+        self.fallbacks = 0
+
+    def _load_model(self):
+        """Load the optional classifier on first use; missing deps just disable it"""
+        self._model_loaded = True
+        if not self.model_path:
+            return
+        try:
+            import joblib
+            self._model = joblib.load(self.model_path)
+            logger.info(f"Intent model loaded from {self.model_path}")
+        except Exception as e:
+            logger.warning(f"Intent model disabled ({e})")
+
+    def _classify_with_model(self, text: str) -> Optional[RouteDecision]:
+        if not self._model_loaded:
+            self._load_model()
+        if self._model is None:
+            return None
+
+        probabilities = self._model.predict_proba([text])[0]
+        best = probabilities.argmax()
+        intent = str(self._model.classes_[best])
+        confidence = float(probabilities[best])
+
+        # The model only picks the tier; direct answers need the rules' extracted parameters
+        route = ROUTE_CHEAP if intent in ("balance", "spending_week", "small_talk") else ROUTE_FULL
+        return RouteDecision(intent, route, confidence, source="model")
+
+    def classify(self, message: str, has_history: bool = False) -> RouteDecision:
+        text = _normalize(message)
+        words = len(text.split())
+
+        if ADVICE_WORDS.search(text) or words > 14:
+            return RouteDecision("advice", ROUTE_FULL, 0.9)
+
+        match = TRANSFER.search(text)
+        if match:
+            # Money movement always goes through the full model: a misread amount or pocket costs real money
+            amount = int(match.group("amount").replace(",", ""))
+            return RouteDecision("transfer", ROUTE_FULL, 0.9, amount=amount, pocket=match.group("pocket"))
+
+        match = MERCHANT_SPEND.search(text)
+        if match and match.group("merchant").strip() not in NOT_MERCHANTS:
+            merchant = match.group("merchant").strip()
+            period = _period(match.group("period") or match.group("lead"))
+            return RouteDecision("merchant_spend", ROUTE_DIRECT, 0.9 if words <= 7 else 0.75,
+                                 merchant=merchant, period=period)
+
+        if BALANCE.search(text) and not SPENDING.search(text):
+            return RouteDecision("balance", ROUTE_DIRECT, 0.95 if words <= 6 else 0.8)
+
+        if SPENDING.search(text):
+            # quick_spending only knows this week; "pichle hafte" goes to the agent
+            if THIS_WEEK.search(text) and not LAST_WEEK.search(text):
+                return RouteDecision("spending_week", ROUTE_DIRECT, 0.9 if words <= 7 else 0.75)
+            return RouteDecision("spending", ROUTE_CHEAP, 0.8)
+
+        if SMALL_TALK.search(text) and words <= 4:
+            return RouteDecision("small_talk", ROUTE_CHEAP, 0.9)
+
+        decision = self._classify_with_model(text)
+        if decision is not None:
+            return decision
+
+        # Short follow-ups ("aur kal?") depend on the conversation; keep them on the full model
+        return RouteDecision("unknown", ROUTE_FULL, 0.5 if has_history else 0.6)
+
+    async def _answer_direct(self, agent, phone: str, decision: RouteDecision) -> Optional[str]:
+        if decision.intent == "balance":
+            return await quick_balance(agent, phone)
+        if decision.intent == "spending_week":
+            return await quick_spending(agent, phone)
+        if decision.intent == "merchant_spend":
+            return await quick_merchant_spend(agent, phone, decision.params["merchant"].title(),
+                                              period=decision.params.get("period"))
+        return None
+
+    async def stream_answer(self, agent, phone: str, message: str, conversation_history: Optional[list] = None,
+                            decision: Optional[RouteDecision] = None) -> AsyncIterator[str]:
+        """
+        Classify `message` (unless a decision is given, e.g. by a command) and
+        answer it on the cheapest route that can handle it. Agent answers are
+        streamed as the model produces them; direct answers arrive in one piece.
+        """
+        started = time.perf_counter()
+        source = decision.source if decision else None
+        decision = decision or self.classify(message, has_history=bool(conversation_history))
+        # Commands pass their decision; replay routes everything else afresh
+        recorder.turn(phone, message, intent=decision.intent, source=source)
+
+        route = decision.route
+        if route == ROUTE_DIRECT and decision.confidence < self.min_confidence:
+            route = ROUTE_CHEAP
+
+        tag_trace(intent=decision.intent, route=route)
+
+        response = None
+        if route == ROUTE_DIRECT:
+            with span("router.direct"):
+                response = await self._answer_direct(agent, phone, decision)
+            if response is None:
+                # Tool result unreadable, or not a merchant we know - let the agent answer instead
+                self.fallbacks += 1
+                route = ROUTE_CHEAP
+
+        if response is not None:
+            yield response
+        else:
+            model = agent.cheap_model if route == ROUTE_CHEAP else None
+            # If the agent is overloaded, a direct answer from cached data beats a "busy" reply
+            fallback = lambda: self._answer_direct(agent, phone, decision)
+            async for delta in agent.stream_message(phone, message, conversation_history, model=model,
+                                                    fallback=fallback):
+                yield delta
+
+        elapsed = time.perf_counter() - started
+        self.counts[route] += 1
+        self.latency[route] += elapsed
+        logger.info(
+            f"Intent route: intent={decision.intent} route={route} confidence={decision.confidence:.2f} "
+            f"source={decision.source} params={decision.params} took={elapsed * 1000:.0f}ms"
+        )
+
+    async def answer(self, agent, phone: str, message: str, conversation_history: Optional[list] = None,
+                     decision: Optional[RouteDecision] = None) -> str:
+        """Non-streaming variant of stream_answer"""
+        parts = [text async for text in self.stream_answer(agent, phone, message, conversation_history, decision)]
+        return "".join(parts)
+
+    def stats(self) -> dict:
+        total = sum(self.counts.values())
+        return {
+            "messages": total,
+            "routes": dict(self.counts),
+            "avg_latency_ms": {
+                route: round(self.latency[route] / count * 1000, 1)
+                for route, count in self.counts.items() if count
+            },
+            "direct_fallbacks": self.fallbacks,
+            # Every direct answer skips at least two LLM calls
+            "llm_calls_saved": self.counts[ROUTE_DIRECT] * 2,
+        }
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional
+
+from mcp import ClientSession
+
+from mcp_pool import MCP_POOL_SIZE, MCPSessionPool, is_transport_error
+from tracing import record, span
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MCP_HEDGE = os.getenv("MCP_HEDGE", "1") == "1"  # duplicate slow read-only calls to the next endpoint
+MCP_HEDGE_MIN_DELAY = float(os.getenv("MCP_HEDGE_MIN_DELAY", "0.3"))  # never hedge sooner than this
+MCP_HEDGE_DEFAULT_DELAY = float(os.getenv("MCP_HEDGE_DEFAULT_DELAY", "1.5"))  # until an endpoint has history
+MCP_ENDPOINT_COOLDOWN = float(os.getenv("MCP_ENDPOINT_COOLDOWN", "30"))  # seconds a failed endpoint is avoided
+
+LATENCY_WINDOW = 200  # recent call durations kept per endpoint
+EWMA_WEIGHT = 0.2
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Endpoint:
+    def __init__(self, url: str, index: int, size: int, message_handler: Optional[Callable]):
+        self.url = url
+        self.index = index  # position in the configured list; earlier wins ties
+        self.pool = MCPSessionPool(url, size=size, message_handler=message_handler)
+        self.latency: Optional[float] = None  # EWMA of successful calls, seconds
+        self.durations = deque(maxlen=LATENCY_WINDOW)
+        self.down_until = 0.0
+
+        # Metrics
+        self.calls = 0
+        self.failures = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.pool.live_connections > 0
+
+    @property
+    def down(self) -> bool:
+        return time.monotonic() < self.down_until
+
+    def record_success(self, seconds: float):
+        self.calls += 1
+        self.durations.append(seconds)
+        self.latency = seconds if self.latency is None else (1 - EWMA_WEIGHT) * self.latency + EWMA_WEIGHT * seconds
+        self.down_until = 0.0
+
+    def record_failure(self):
+        self.calls += 1
+        self.failures += 1
+        self.down_until = time.monotonic() + MCP_ENDPOINT_COOLDOWN
+
+    def hedge_delay(self) -> float:
+        """How long to wait for this endpoint before asking another one: its p95"""
+        if len(self.durations) < 20:
+            return MCP_HEDGE_DEFAULT_DELAY
+        return max(MCP_HEDGE_MIN_DELAY, _percentile(self.durations, 0.95))
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "down": self.down,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+class MCPEndpoints:
+    """
+    Bank MCP client over several servers (e.g. a local one and the hosted one).
+
+    Each endpoint has its own session pool, whose health loop pings idle
+    sessions and so also keeps a sleeping host (Render) awake. Calls go to
+    the ready endpoint with the lowest recent latency. An endpoint that
+    times out or drops the connection is avoided for MCP_ENDPOINT_COOLDOWN
+    seconds; an error answer from the server (e.g. an unknown tool) doesn't
+    count against it. Read-only calls then move on to the next endpoint,
+    and if one is still running after the endpoint's p95 latency, the
+    same call is sent to the next endpoint as well, and the first answer
+    wins. State-changing calls are never retried, hedged or failed over,
+    since the server may already have acted on them; they still avoid
+    endpoints that are cooling down.
+
+    Offers the same call_tool / list_tools / url / server_version interface
+    as MCPSessionPool, so the agent and tool catalog use it unchanged.
+    """
+
+    def __init__(self, urls: List[str], size: int = MCP_POOL_SIZE, message_handler: Optional[Callable] = None,
+                 hedge: bool = MCP_HEDGE):
+        if not urls:
+            raise ValueError("At least one bank MCP URL is required")
+        self.endpoints = [Endpoint(url, i, size, message_handler) for i, url in enumerate(urls)]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self._start_tasks: List[asyncio.Task] = []
+
+        # Metrics
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _ranked(self) -> List[Endpoint]:
+        """Ready endpoints fastest first, then ones still connecting, then ones cooling down"""
+        def key(endpoint: Endpoint):
+            group = 2 if endpoint.down else (0 if endpoint.ready else 1)
+            latency = endpoint.latency if endpoint.latency is not None and group == 0 else 0.0
+            return (group, latency, endpoint.index)
+        return sorted(self.endpoints, key=key)
+
+    @property
+    def primary(self) -> Endpoint:
+        return self._ranked()[0]
+
+    @property
+    def url(self) -> str:
+        return self.primary.url
+
+    @property
+    def server_version(self) -> Optional[str]:
+        return self.primary.pool.server_version
+
+    async def start(self):
+        """
+        Open every endpoint's pool concurrently, returning as soon as one is
+        ready; the others (e.g. a host that is cold-starting) keep connecting
+        in the background.
+        """
+        if self._start_tasks:
+            return
+        self._start_tasks = [asyncio.create_task(endpoint.pool.start()) for endpoint in self.endpoints]
+        pending = set(self._start_tasks)
+        while pending and not any(endpoint.ready for endpoint in self.endpoints):
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        ready = [endpoint.url for endpoint in self.endpoints if endpoint.ready]
+        if ready:
+            logger.info(f"Bank MCP ready on {ready[0]} ({len(pending)} endpoint(s) still connecting)")
+        else:
+            logger.warning("No bank MCP endpoint could be connected; will keep retrying")
+
+    async def close(self):
+        for task in self._start_tasks:
+            task.cancel()
+        self._start_tasks = []
+        await asyncio.gather(*(endpoint.pool.close() for endpoint in self.endpoints), return_exceptions=True)
+
+    async def _attempt(self, endpoint: Endpoint, operation: Callable[[ClientSession], Awaitable[Any]],
+                       idempotent: bool = False) -> Any:
+        started = time.monotonic()
+        try:
+            result = await endpoint.pool.run(operation, idempotent=idempotent)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_transport_error(e):
+                endpoint.record_failure()
+            raise
+        endpoint.record_success(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, primary: Endpoint, backup: Endpoint,
+                      operation: Callable[[ClientSession], Awaitable[Any]]) -> Any:
+        """Run on `primary`; if it is slower than its p95, also on `backup`. First success wins."""
+        first = asyncio.create_task(self._attempt(primary, operation, idempotent=True))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=primary.hedge_delay())
+            if first in done and (first.exception() is None or not is_transport_error(first.exception())):
+                return first.result()  # an answer, or an error another endpoint would give too
+
+            hedging = first not in done  # otherwise it already failed: a plain failover
+            if hedging:
+                self.hedged += 1
+            else:
+                self.failovers += 1
+            started = time.monotonic()
+            second = asyncio.create_task(self._attempt(backup, operation, idempotent=True))
+            tasks = {first, second} if hedging else {second}
+            error = None if hedging else first.exception()
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second and hedging:
+                            self.hedge_wins += 1
+                            record("mcp.hedge_win", time.monotonic() - started, endpoint=backup.url)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, operation: Callable[[ClientSession], Awaitable[Any]], idempotent: bool = False) -> Any:
+        """Run `operation(session)` on the best endpoint, failing over (and hedging reads) as described above"""
+        candidates = self._ranked()
+        error: Optional[BaseException] = None
+        i = 0
+        while i < len(candidates):
+            endpoint = candidates[i]
+            try:
+                if idempotent and self.hedge and i + 1 < len(candidates):
+                    # The backup is tried here, so a failure moves on past both
+                    i += 2
+                    return await self._hedged(endpoint, candidates[i - 1], operation)
+                i += 1
+                return await self._attempt(endpoint, operation, idempotent=idempotent)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+                if not idempotent:
+                    raise  # the server may have acted on it; don't send it again elsewhere
+                if not is_transport_error(e):
+                    raise  # the server answered; another one would say the same
+                if i < len(candidates):
+                    self.failovers += 1
+                    logger.warning(f"Bank MCP call failed on {endpoint.url} ({e}), trying {candidates[i].url}")
+        raise error
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, idempotent: bool = False):
+        return await self.run(lambda session: session.call_tool(name, arguments or {}), idempotent=idempotent)
+
+    async def list_tools(self):
+        with span("mcp.list_tools"):
+            return await self.run(lambda session: session.list_tools(), idempotent=True)
+
+    def stats(self) -> dict:
+        return {
+            "primary": self.primary.url,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "endpoints": {endpoint.url: endpoint.stats() for endpoint in self.endpoints},
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import anyio
+import httpx
+from mcp import ClientSession, McpError
+from mcp.client.sse import sse_client
+from mcp.types import CONNECTION_CLOSED
+
+from tracing import span, start_span
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "60"))  # Render cold starts are slow
+MCP_REQUEST_TIMEOUT = float(os.getenv("MCP_REQUEST_TIMEOUT", "30"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "60"))
+
+# Raised when a request could not be written to the session, so the server never saw it
+NOT_SENT_ERRORS = (ConnectionError, anyio.ClosedResourceError, anyio.BrokenResourceError)
+TRANSPORT_ERRORS = NOT_SENT_ERRORS + (asyncio.TimeoutError, OSError, httpx.TransportError)
+TRANSPORT_ERROR_CODES = (httpx.codes.REQUEST_TIMEOUT, CONNECTION_CLOSED)  # McpErrors the session raises itself
+
+
+def is_transport_error(e: BaseException) -> bool:
+    """True for timeouts and lost connections, False when the server answered with an error"""
+    if isinstance(e, McpError):
+        return e.error.code in TRANSPORT_ERROR_CODES
+    return isinstance(e, TRANSPORT_ERRORS)
+
+
+class MCPConnection:
+    """
+    One long-lived SSE connection with an initialized ClientSession.
+
+    The SSE transport uses anyio task groups, which must be entered and
+    exited from the same task, so every connection lives in its own task
+    and is torn down by signalling that task.
+    """
+
+    def __init__(self, url: str, message_handler: Optional[Callable] = None):
+        self.url = url
+        self.message_handler = message_handler
+        self.session: Optional[ClientSession] = None
+        self.server_info = None
+        self.last_used = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def open(self, timeout: float = MCP_CONNECT_TIMEOUT):
+        """Connect, run the MCP handshake and wait until the session is usable."""
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise ConnectionError(f"MCP connect to {self.url} timed out after {timeout:.0f}s")
+
+        if not self.alive:
+            raise ConnectionError(f"MCP connect to {self.url} failed: {self._error}")
+        self.last_used = time.monotonic()
+
+    async def _run(self):
+        connect = start_span("mcp.connect")
+        try:
+            async with sse_client(self.url) as streams:
+                async with ClientSession(
+                    streams[0],
+                    streams[1],
+                    read_timeout_seconds=timedelta(seconds=MCP_REQUEST_TIMEOUT),
+                    message_handler=self.message_handler,
+                ) as session:
+                    connect.finish()
+                    with span("mcp.initialize"):
+                        init_result = await session.initialize()
+                    self.server_info = init_result.serverInfo
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            connect.finish(e)
+            self._error = e
+            logger.warning(f"MCP connection to {self.url} closed: {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        """Stop the connection task and wait for the transport to shut down."""
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), 5)
+        except Exception:
+            self._task.cancel()
+        self._task = None
+        self.session = None
+
+    async def reopen(self):
+        await self.close()
+        await self.open()
+
+
+class MCPSessionPool:
+    """
+    Fixed-size pool of MCP sessions to one bank server.
+
+    Sessions are checked out per operation, so concurrent users and the
+    proactive monitor share the same connections. A connection found dead
+    (e.g. after an SSE drop) is reopened before use. A failed operation is
+    retried once only if it never reached the server or is marked
+    idempotent, so a transfer is never sent twice. Idle connections are
+    pinged every MCP_HEALTH_INTERVAL seconds.
+    """
+
+    def __init__(self, url: str, size: int = MCP_POOL_SIZE, message_handler: Optional[Callable] = None):
+        self.url = url
+        self.size = max(1, size)
+        self.message_handler = message_handler
+        self._connections = [MCPConnection(url, message_handler) for _ in range(self.size)]
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    async def start(self):
+        """Open all connections up front. Failed ones are retried lazily on checkout."""
+        async with self._start_lock:
+            if self._started:
+                return
+
+            results = await asyncio.gather(
+                *(conn.open() for conn in self._connections),
+                return_exceptions=True
+            )
+            failed = [r for r in results if isinstance(r, Exception)]
+            if failed:
+                logger.warning(f"MCP pool: {len(failed)}/{self.size} connections failed to open: {failed[0]}")
+
+            for conn in self._connections:
+                self._idle.put_nowait(conn)
+
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+            logger.info(f"MCP pool ready: {self.size - len(failed)}/{self.size} sessions to {self.url}")
+
+    @property
+    def live_connections(self) -> int:
+        return sum(1 for conn in self._connections if conn.alive)
+
+    @property
+    def server_version(self) -> Optional[str]:
+        """Version reported by the server on the most recent handshake"""
+        for conn in self._connections:
+            if conn.alive and conn.server_info:
+                return conn.server_info.version
+        return None
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(*(conn.close() for conn in self._connections), return_exceptions=True)
+        self._idle = asyncio.Queue()
+        self._started = False
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a live connection; it is returned to the pool afterwards."""
+        if not self._started:
+            await self.start()
+
+        conn = await self._idle.get()
+        try:
+            if not conn.alive:
+                await conn.reopen()
+            yield conn
+        finally:
+            conn.last_used = time.monotonic()
+            self._idle.put_nowait(conn)
+
+    async def run(self, operation: Callable[[ClientSession], Awaitable[Any]], idempotent: bool = False) -> Any:
+        """
+        Run `operation(session)` on a pooled session.
+
+        If the request could not be sent because the session was dead, the
+        connection is reopened and the operation retried once. Transport
+        errors (timeouts, a stream dropping mid-call) are retried the same
+        way only when `idempotent`; for writes the server may already have
+        applied the request, so the error is raised instead. An error the
+        server answered with is always raised: the connection is fine.
+        """
+        async with self.connection() as conn:
+            try:
+                return await operation(conn.session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not (isinstance(e, NOT_SENT_ERRORS) or (idempotent and is_transport_error(e))):
+                    raise
+                logger.warning(f"MCP session failed ({e}), reconnecting...")
+                await conn.reopen()
+                return await operation(conn.session)
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, idempotent: bool = False):
+        return await self.run(lambda session: session.call_tool(name, arguments or {}), idempotent=idempotent)
+
+    async def list_tools(self):
+        with span("mcp.list_tools"):
+            return await self.run(lambda session: session.list_tools(), idempotent=True)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(MCP_HEALTH_INTERVAL)
+            try:
+                await self._check_idle_connections()
+            except Exception as e:
+                logger.error(f"MCP health check error: {e}")
+
+    async def _check_idle_connections(self):
+        # Only idle connections are checked; busy ones prove their health by being used
+        idle = []
+        while not self._idle.empty():
+            idle.append(self._idle.get_nowait())
+
+        async def check(conn: MCPConnection):
+            try:
+                if not conn.alive:
+                    await conn.reopen()
+                elif time.monotonic() - conn.last_used >= MCP_HEALTH_INTERVAL:
+                    await asyncio.wait_for(conn.session.send_ping(), MCP_REQUEST_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"MCP health check failed ({e}), reconnecting...")
+                try:
+                    await conn.reopen()
+                except Exception as e:
+                    logger.error(f"MCP reconnect failed: {e}")
+            finally:
+                self._idle.put_nowait(conn)
+
+        await asyncio.gather(*(check(conn) for conn in idle))
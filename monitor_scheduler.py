@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MONITOR_INTERVAL = float(os.getenv("MONITOR_INTERVAL", "3600"))  # seconds between checks per user
+MONITOR_JITTER = float(os.getenv("MONITOR_JITTER", "0.1"))  # +/- fraction of the interval
+MONITOR_WORKERS = int(os.getenv("MONITOR_WORKERS", "20"))  # users checked concurrently
+MONITOR_CHECK_TIMEOUT = float(os.getenv("MONITOR_CHECK_TIMEOUT", "120"))
+MONITOR_METRICS_INTERVAL = float(os.getenv("MONITOR_METRICS_INTERVAL", "300"))
+MONITOR_SHARD_INDEX = int(os.getenv("MONITOR_SHARD_INDEX", "0"))
+MONITOR_SHARD_COUNT = int(os.getenv("MONITOR_SHARD_COUNT", "1"))
+
+SAMPLE_WINDOW = 1000  # recent checks kept for duration/lag stats
+
+
+def shard_of(phone: str, shard_count: int) -> int:
+    """Stable shard for a phone number (same answer in every process)"""
+    digest = hashlib.sha1(phone.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class MonitorScheduler:
+    """
+    Runs proactive checks per user on their own schedule.
+
+    Every user has a next-run time; after each check it moves forward by
+    MONITOR_INTERVAL with +/- MONITOR_JITTER so users stay spread out instead
+    of all being hit at once. Due users are handed to MONITOR_WORKERS workers,
+    so one slow user never delays the rest. With MONITOR_SHARD_COUNT > 1 each
+    process only schedules the phones whose hash falls in its shard.
+    """
+
+    def __init__(self, interval: float = MONITOR_INTERVAL, jitter: float = MONITOR_JITTER,
+                 workers: int = MONITOR_WORKERS, shard_index: int = MONITOR_SHARD_INDEX,
+                 shard_count: int = MONITOR_SHARD_COUNT):
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = max(1, workers)
+        self.shard_index = shard_index
+        self.shard_count = max(1, shard_count)
+
+        self._users: Dict[str, int] = {}       # phone -> chat_id
+        self._due: Dict[str, float] = {}       # phone -> scheduled time (authoritative)
+        self._heap = []                        # (due time, phone); stale entries skipped
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._running = set()
+
+        # Metrics
+        self.checks_run = 0
+        self.checks_failed = 0
+        self._durations = deque(maxlen=SAMPLE_WINDOW)
+        self._lags = deque(maxlen=SAMPLE_WINDOW)
+        self._cycle_started = time.monotonic()
+        self._cycle_checks = 0
+        self.last_cycle_duration: Optional[float] = None
+        self.extra_metrics: Dict[str, Callable[[], dict]] = {}  # name -> stats() merged into metrics()
+
+    def owns(self, phone: str) -> bool:
+        return shard_of(phone, self.shard_count) == self.shard_index
+
+    def add_user(self, phone: str, chat_id: int, delay: Optional[float] = None):
+        """
+        Start monitoring a user. The first check is spread randomly over one
+        interval unless `delay` is given.
+        """
+        if not self.owns(phone):
+            return
+        self._users[phone] = chat_id
+        if phone not in self._due:
+            first = random.uniform(0, self.interval) if delay is None else delay
+            self._schedule(phone, time.monotonic() + first)
+
+    def remove_user(self, phone: str):
+        self._users.pop(phone, None)
+        self._due.pop(phone, None)
+
+    def _schedule(self, phone: str, when: float):
+        self._due[phone] = when
+        heapq.heappush(self._heap, (when, phone))
+        self._wakeup.set()
+
+    def _next_run(self, scheduled: float) -> float:
+        jitter = random.uniform(-self.jitter, self.jitter) * self.interval
+        # If we fell behind, don't burst to catch up
+        return max(time.monotonic(), scheduled + self.interval) + jitter
+
+    async def run(self, check_user: Callable[[str, int], Awaitable[None]]):
+        """Dispatch due users to workers forever; `check_user(phone, chat_id)` does the work"""
+        logger.info(
+            f"🔄 Monitor scheduler: {len(self._users)} users, shard {self.shard_index}/{self.shard_count}, "
+            f"{self.workers} workers, every {self.interval:.0f}s"
+        )
+        self._tasks = [asyncio.create_task(self._worker(check_user)) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._log_metrics()))
+        try:
+            await self._dispatch()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    async def _dispatch(self):
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                when, phone = heapq.heappop(self._heap)
+                if self._due.get(phone) != when:
+                    continue  # removed or rescheduled
+                # Blocks while all workers are busy; waiting users show up as backlog
+                await self._queue.put((phone, when))
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, check_user: Callable[[str, int], Awaitable[None]]):
+        while True:
+            phone, scheduled = await self._queue.get()
+            chat_id = self._users.get(phone)
+            if chat_id is None:
+                continue
+
+            started = time.monotonic()
+            self._lags.append(started - scheduled)
+            self._running.add(phone)
+            try:
+                await asyncio.wait_for(check_user(phone, chat_id), MONITOR_CHECK_TIMEOUT)
+            except Exception as e:
+                self.checks_failed += 1
+                logger.error(f"Monitoring error for {phone[-4:]}: {e}")
+            finally:
+                self._running.discard(phone)
+                self.checks_run += 1
+                self._durations.append(time.monotonic() - started)
+                self._count_cycle()
+                if self._due.get(phone) == scheduled:
+                    self._schedule(phone, self._next_run(scheduled))
+
+    def _count_cycle(self):
+        # One "cycle" = as many checks as there are users
+        self._cycle_checks += 1
+        if self._cycle_checks >= max(1, len(self._users)):
+            now = time.monotonic()
+            self.last_cycle_duration = now - self._cycle_started
+            self._cycle_started = now
+            self._cycle_checks = 0
+
+    def backlog(self) -> int:
+        """Users that are due but not yet being checked"""
+        now = time.monotonic()
+        overdue = sum(1 for phone, when in self._due.items() if when <= now and phone not in self._running)
+        return overdue
+
+    def metrics(self) -> dict:
+        metrics = {
+            "users": len(self._users),
+            "shard": f"{self.shard_index}/{self.shard_count}",
+            "checks_run": self.checks_run,
+            "checks_failed": self.checks_failed,
+            "backlog": self.backlog(),
+            "lag_avg_s": round(sum(self._lags) / len(self._lags), 2) if self._lags else 0.0,
+            "lag_max_s": round(max(self._lags), 2) if self._lags else 0.0,
+            "check_p50_s": round(_percentile(self._durations, 0.5), 2),
+            "check_p95_s": round(_percentile(self._durations, 0.95), 2),
+            "cycle_duration_s": round(self.last_cycle_duration, 1) if self.last_cycle_duration else None,
+        }
+        for name, stats in self.extra_metrics.items():
+            metrics[name] = stats()
+        return metrics
+
+    async def _log_metrics(self):
+        while True:
+            await asyncio.sleep(MONITOR_METRICS_INTERVAL)
+            logger.info(f"📊 Monitor metrics: {self.metrics()}")
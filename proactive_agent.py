@@ -1,7 +1,6 @@
 import asyncio
 import os
 import logging
-import json
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -11,13 +10,26 @@ from telegram.ext import (
     ContextTypes,
 )
 from dotenv import load_dotenv
-from agent import DishaAgent
-from proactive_agent import ProactiveDishaAgent
+from chat_persistence import SQLitePersistence
+from conversation_memory import ConversationMemory
+from intent_router import IntentRouter, RouteDecision, ROUTE_DIRECT
+from telegram_stream import stream_reply
+from user_turns import UserTurns, committed_on_output
+from telegram_outbox import OutboundLimiter, PRIORITY_REPLY, send_alerts
+from cassette import recorder
+from startup import Lazy, readiness, stop_polling_on_signals
+from tracing import metrics, span, start_metrics_server, trace, user_tag, writer
+from webhook_server import ALLOWED_UPDATES, run_webhook, use_webhook
+from monitor_scheduler import MonitorScheduler
+from user_store import UserStore
+from proactive_checks import AlertTracker, evaluate, fetch_snapshot, run_checks
 
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 DEFAULT_USER_PHONE = "9876543210"
+MONITOR_ONLY = os.getenv("MONITOR_ONLY", "0") == "1"  # run just the monitor (e.g. extra shards)
+USER_RESCAN_INTERVAL = float(os.getenv("USER_RESCAN_INTERVAL", "300"))  # pick up users registered by other processes
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -25,36 +37,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize agents
-disha = DishaAgent()
-proactive_disha = ProactiveDishaAgent(TELEGRAM_BOT_TOKEN)
 
-# User registry file (simple JSON for hackathon)
-USERS_FILE = "registered_users.json"
+def build_agent():
+    from agent import DishaAgent
+    return DishaAgent()
 
 
-def load_registered_users():
-    """Load registered users from file"""
-    try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
+# Initialize agents (Disha itself on first use or by the warm-up, so openai
+# and mcp are not imported before the bot starts taking updates)
+disha = Lazy(build_agent, "agent", imports=("agent",))
+router = IntentRouter()
+memory = ConversationMemory(disha)
+turns = UserTurns()
+
+# On shutdown, running turns get DRAIN_TIMEOUT seconds to finish
+readiness.add_drain(turns.drain)
+
+# Per-user proactive check schedule
+scheduler = MonitorScheduler()
+
+# Paces everything the bot sends; replies go before proactive alerts
+outbound = OutboundLimiter()
+scheduler.extra_metrics["telegram"] = outbound.stats
+scheduler.extra_metrics["turns"] = turns.stats
+scheduler.extra_metrics["load"] = lambda: disha.load_stats()
+scheduler.extra_metrics["stages"] = metrics.stats
+scheduler.extra_metrics["traces"] = writer.stats
+scheduler.extra_metrics["startup"] = readiness.stats
+
+# Registered users (SQLite; imports the old registered_users.json once), opened on first use
+users = Lazy(UserStore, "users")
+
+# Per-user fingerprints and already-sent alerts (kept in the user store), so unchanged users are skipped
+alert_tracker = AlertTracker(store=users)
+scheduler.extra_metrics["alerts"] = alert_tracker.stats
 
 
 def save_registered_user(phone: str, chat_id: int, user_info: dict):
     """Save user registration"""
-    users = load_registered_users()
-    users[phone] = {
-        "chat_id": chat_id,
-        "name": user_info.get("name", "User"),
-        "registered_at": user_info.get("timestamp")
-    }
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+    users.upsert(phone, chat_id, user_info.get("name", "User"), user_info.get("timestamp"))
     
-    # Register with proactive agent
-    proactive_disha.register_user(phone, chat_id)
+    # Start proactive monitoring (first check soon after signup)
+    scheduler.add_user(phone, chat_id, delay=60)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -117,8 +141,16 @@ async def notifications_command(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("Pehle /start dabao!")
         return
     
-    # Toggle setting
-    current = context.user_data.get('notifications', True)
+    # Toggle setting (the monitor reads it from the user store)
+    current = users.notifications_enabled(phone)
+    if not users.set_notifications(phone, not current):
+        # Known in this chat but not in the user store, so there is nothing to toggle
+        context.user_data.pop('phone', None)
+        await update.message.reply_text(
+            "❌ Aapka number registered nahi hai.\n\n"
+            "Pehle apna 10-digit phone number bhejo (ya /skip), phir /notifications dobara try karo."
+        )
+        return
     context.user_data['notifications'] = not current
     
     status = "enabled" if not current else "disabled"
@@ -130,6 +162,13 @@ async def notifications_command(update: Update, context: ContextTypes.DEFAULT_TY
     )
 
 
+async def run_user_checks(phone: str) -> list:
+    """Run every proactive check for one user and return the alert messages"""
+    # One snapshot (account, transactions, bills) feeds every check
+    snapshot = await fetch_snapshot(disha, phone)
+    return run_checks(snapshot)
+
+
 async def test_alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Manually trigger proactive check (for testing)"""
     phone = context.user_data.get('phone')
@@ -139,25 +178,9 @@ async def test_alerts_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     await update.message.reply_text("🔍 Running proactive checks...")
     
-    # Run all checks
-    chat_id = update.effective_chat.id
-    checks = [
-        proactive_disha.check_low_balance(phone),
-        proactive_disha.check_excessive_spending(phone),
-        proactive_disha.check_gambling_pattern(phone),
-        proactive_disha.check_upcoming_bills(phone),
-        proactive_disha.check_no_emergency_fund(phone),
-        proactive_disha.check_good_income_day(phone),
-    ]
-    
-    results = await asyncio.gather(*checks)
-    
-    sent_count = 0
-    for message in results:
-        if message:
-            await update.message.reply_text(message, parse_mode='Markdown')
-            sent_count += 1
-            await asyncio.sleep(1)
+    # Run all checks; alerts go out merged, paced by the bot's rate limiter
+    results = await run_user_checks(phone)
+    sent_count = await send_alerts(context.bot, update.effective_chat.id, results, priority=PRIORITY_REPLY)
     
     if sent_count == 0:
         await update.message.reply_text(
@@ -204,9 +227,15 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Pehle /start dabao!")
         return
     
-    await update.message.reply_text("💭 Checking...")
-    response = await disha.process_message(phone, "Mera current balance kya hai?")
-    await update.message.reply_text(response)
+    # Direct tool call + template; the agent answers only if the result can't be read
+    await stream_reply(
+        update.message,
+        router.stream_answer(
+            disha, phone, "Mera current balance kya hai?",
+            decision=RouteDecision("balance", ROUTE_DIRECT, 1.0, source="command")
+        ),
+        placeholder="💭 Checking..."
+    )
 
 
 async def spending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -216,9 +245,15 @@ async def spending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Pehle /start dabao!")
         return
     
-    await update.message.reply_text("💭 Analyzing...")
-    response = await disha.process_message(phone, "Is hafte kitna kharch hua?")
-    await update.message.reply_text(response)
+    # Direct tool call + template; the agent answers only if the result can't be read
+    await stream_reply(
+        update.message,
+        router.stream_answer(
+            disha, phone, "Is hafte kitna kharch hua?",
+            decision=RouteDecision("spending_week", ROUTE_DIRECT, 1.0, source="command")
+        ),
+        placeholder="💭 Analyzing..."
+    )
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -265,28 +300,35 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Process message with Disha
     phone = context.user_data['phone']
-    await update.message.chat.send_action("typing")
     
-    try:
-        conversation_history = context.user_data.get('history', [])
-        response = await disha.process_message(phone, user_message, conversation_history)
-        
-        # Update history
-        conversation_history.append({"role": "user", "content": user_message})
-        conversation_history.append({"role": "assistant", "content": response})
-        
-        if len(conversation_history) > 10:
-            conversation_history = conversation_history[-10:]
-        
-        context.user_data['history'] = conversation_history
-        
-        await update.message.reply_text(response)
-        
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        await update.message.reply_text(
-            f"😅 Technical problem: {str(e)[:100]}"
-        )
+    async def respond(query: str):
+        with trace("telegram.turn", user=user_tag(update.effective_chat.id)):
+            await update.message.chat.send_action("typing")
+            
+            try:
+                conversation_history = memory.history(context.user_data)
+                response = await stream_reply(
+                    update.message,
+                    committed_on_output(router.stream_answer(disha, phone, query, conversation_history))
+                )
+                
+                # Update history (older turns get summarised after this handler returns,
+                # so persistence is told about the new summary when it lands)
+                memory.add_turn(
+                    context.user_data, query, response,
+                    on_summary=lambda: context.application.mark_data_for_update_persistence(
+                        user_ids=update.effective_user.id
+                    )
+                )
+                
+            except Exception as e:
+                logger.error(f"Error: {e}")
+                await update.message.reply_text(
+                    f"😅 Technical problem: {str(e)[:100]}"
+                )
+    
+    # One turn at a time per user; messages sent while Disha is still thinking are answered together
+    await turns.submit(update.effective_user.id, user_message, respond)
 
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -296,54 +338,143 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("😅 Error! Please try again.")
 
 
+async def warm_up():
+    """Build the agent and open its MCP sessions; until this is done, the first update does it"""
+    try:
+        await disha.build()
+        with readiness.phase("warm-up"):
+            await disha.start()
+    except Exception as e:
+        logger.warning(f"Warm-up failed, connecting on first use instead: {e}")
+    readiness.mark_ready()
+
+
+async def post_init(application: Application):
+    """Start taking updates right away and warm up the agent in the background"""
+    application.bot_data["warm_up"] = asyncio.create_task(warm_up())
+    if not use_webhook():
+        # In webhook mode /metrics and /readyz are served by the webhook server
+        application.bot_data["metrics_runner"] = await start_metrics_server()
+        stop_polling_on_signals(application)
+
+
+async def post_shutdown(application: Application):
+    """Close pooled MCP sessions, the user store, the trace file and any cassette"""
+    if application.bot_data.get("warm_up"):
+        application.bot_data["warm_up"].cancel()
+    if disha.built:
+        await disha.close()
+    if users.built:
+        users.close()
+    if application.bot_data.get("metrics_runner"):
+        await application.bot_data["metrics_runner"].cleanup()
+    writer.close()
+    recorder.close()
+
+
 async def background_monitoring(application: Application):
     """Run proactive monitoring in background"""
     logger.info("🔄 Starting background monitoring...")
     
-    # Load registered users
-    users = load_registered_users()
-    for phone, user_data in users.items():
-        proactive_disha.register_user(phone, user_data['chat_id'])
+    async def load_users():
+        # Stream registered users in (only this process's shard gets scheduled)
+        while True:
+            for user in users.iter_users():
+                scheduler.add_user(user['phone'], user['chat_id'])
+            await asyncio.sleep(USER_RESCAN_INTERVAL)
     
-    # Start monitoring loop (check every 60 minutes)
-    while True:
+    loader = asyncio.create_task(load_users())
+    
+    async def check_user(phone: str, chat_id: int):
+        if not users.notifications_enabled(phone):
+            alert_tracker.forget(phone)  # the sent record stays in the user store
+            return
+        if disha.bank_breaker.is_open:
+            return  # bank server is failing; try again next cycle
+        recorder.turn(phone, check=True)
+        with trace("monitor.check", user=user_tag(chat_id), intent="proactive") as root:
+            with span("proactive.snapshot"):
+                snapshot = await fetch_snapshot(disha, phone)
+            if not alert_tracker.changed(snapshot):
+                root.tag(unchanged=True)
+                return  # nothing happened since the last check
+            with span("proactive.evaluate"):
+                alerts = evaluate(snapshot)
+                due = alert_tracker.due(phone, alerts)
+            # One message per user per cycle, behind any replies waiting to go out
+            with span("proactive.send", alerts=len(due)):
+                await send_alerts(application.bot, chat_id, list(due.values()))
+            # Recorded only once sent: if sending raised, the next cycle sends them again
+            alert_tracker.commit(snapshot, alerts, due)
+    
+    # Each user is checked about every MONITOR_INTERVAL (60 min), with jitter
+    try:
+        await scheduler.run(check_user)
+    finally:
+        loader.cancel()
+
+
+async def run_monitor_only(application: Application):
+    """Monitoring without polling, for extra processes that own other shards"""
+    async with application:
+        await warm_up()
         try:
-            await proactive_disha.run_proactive_checks()
-        except Exception as e:
-            logger.error(f"Monitoring error: {e}")
-        
-        await asyncio.sleep(3600)  # 60 minutes
+            await background_monitoring(application)
+        finally:
+            await disha.close()
 
 
 def main():
     """Start the bot with background monitoring"""
+    readiness.mark_imported()
     if not TELEGRAM_BOT_TOKEN:
         print("❌ TELEGRAM_BOT_TOKEN not found!")
         return
     
     # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .persistence(SQLitePersistence())
+        .concurrent_updates(True)
+        .rate_limiter(outbound)
+        .build()
+    )
     
     # Register handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("skip", skip_phone))
     application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("balance", balance_command))
-    application.add_handler(CommandHandler("spending", spending_command))
-    application.add_handler(CommandHandler("alerts", test_alerts_command))
+    # Commands that call the bank or the LLM are waited for on shutdown, like turns
+    application.add_handler(CommandHandler("balance", turns.tracked(balance_command)))
+    application.add_handler(CommandHandler("spending", turns.tracked(spending_command)))
+    application.add_handler(CommandHandler("alerts", turns.tracked(test_alerts_command)))
     application.add_handler(CommandHandler("notifications", notifications_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     application.add_error_handler(error_handler)
     
-    # Start background monitoring
-    loop = asyncio.get_event_loop()
-    loop.create_task(background_monitoring(application))
+    if MONITOR_ONLY:
+        print(f"📊 Monitor-only mode (shard {scheduler.shard_index}/{scheduler.shard_count})")
+        asyncio.run(run_monitor_only(application))
+        return
     
     print("🤖 Disha Bot with Proactive Features Starting...")
     print("✅ Background monitoring enabled (checks every 60 min)")
     print("📊 Bot is running! Press Ctrl+C to stop.")
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if use_webhook():
+        # Each webhook worker monitors its own shard (MONITOR_SHARD_INDEX/COUNT)
+        asyncio.run(run_webhook(application, background=background_monitoring))
+        return
+    
+    # Start background monitoring
+    loop = asyncio.get_event_loop()
+    loop.create_task(background_monitoring(application))
+    
+    # Signals are handled by stop_polling_on_signals, which drains running turns first
+    application.run_polling(allowed_updates=ALLOWED_UPDATES, stop_signals=None)
 
 
 if __name__ == "__main__":
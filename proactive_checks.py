@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from bank_data import IST, extract_account, extract_bills, format_inr, parse_tool_json
+from quick_replies import MIN_EMERGENCY_FUND
+from transaction_store import TransactionLedger
+from user_store import UserStore
+
+logger = logging.getLogger(__name__)
+
+# Alert thresholds
+LOW_BALANCE_THRESHOLD = 1000
+WEEKLY_SPEND_LIMIT = 4000  # roughly a week of a ~₹18,000/month household budget
+# Spending more than was earned only alerts past both of these, so small weeks stay quiet
+OVERSPEND_MIN = float(os.getenv("OVERSPEND_MIN", "1000"))  # ₹ spent in the week
+OVERSPEND_RATIO = float(os.getenv("OVERSPEND_RATIO", "1.25"))  # spent / earned
+GAMBLING_ALERT_MIN = 100
+BILL_REMINDER_DAYS = 3
+GOOD_INCOME_DAY = 800
+
+# An alert that is still true is repeated at most this often (seconds)
+ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN", str(24 * 3600)))
+
+
+class FinancialSnapshot:
+    """
+    One consolidated view of a user's finances, fetched with a single set of
+    MCP calls and shared by every proactive check. `missing` names the
+    inputs ("account", "transactions", "bills") that couldn't be loaded.
+    """
+
+    def __init__(self, phone: str, account: Optional[dict], ledger: Optional[TransactionLedger], bills: list,
+                 fetched_at: Optional[datetime] = None, missing: Iterable[str] = ()):
+        self.phone = phone
+        self.account = account
+        self.ledger = ledger if ledger is not None else TransactionLedger()
+        self.bills = bills
+        self.fetched_at = fetched_at or datetime.now(timezone.utc)
+        self.missing = set(missing)
+
+    @property
+    def week_ago(self) -> datetime:
+        return self.fetched_at - timedelta(days=7)
+
+    def fingerprint(self) -> str:
+        """
+        Digest of everything the checks look at. The IST date is part of it
+        because bill windows and "today's income" move with the calendar.
+        """
+        parts = [
+            self.fetched_at.astimezone(IST).date().isoformat(),
+            repr(sorted(self.account.items()) if self.account else None),
+            f"{len(self.ledger)}:{self.ledger.last_id}:{self.ledger.cursor}",
+            repr(sorted((b["name"], b["amount"] or 0, str(b["due_date"])) for b in self.bills)),
+        ]
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _bills_tool(catalog) -> Optional[str]:
+    return next((name for name in sorted(catalog.names) if "bill" in name.lower()), None)
+
+
+async def _fetch_json(agent, catalog, tool_name: Optional[str], phone: str):
+    if tool_name is None:
+        return None
+    args = catalog.phone_arguments(tool_name, phone)
+    if args is None:
+        return None
+    try:
+        return parse_tool_json(await agent.call_tool(tool_name, args))
+    except Exception as e:
+        logger.warning(f"Snapshot: {tool_name} failed for {phone[-4:]}: {e}")
+        return None
+
+
+async def fetch_snapshot(agent, phone: str) -> FinancialSnapshot:
+    """Fetch account, transactions and bills for one user, concurrently and once"""
+    catalog = await agent.tool_catalog.get()
+    bills_tool = _bills_tool(catalog)
+    account_data, ledger, bills_data = await asyncio.gather(
+        _fetch_json(agent, catalog, "get_account_details", phone),
+        agent.transaction_store.ledger(phone),
+        _fetch_json(agent, catalog, bills_tool, phone),
+    )
+
+    bills = extract_bills(bills_data) if bills_data is not None else []
+    if not bills and account_data is not None:
+        # Some accounts carry upcoming bills inline
+        bills = extract_bills(account_data)
+
+    account = extract_account(account_data) if account_data is not None else None
+    missing = set()
+    if account is None:
+        missing.add("account")
+    if ledger is None:
+        missing.add("transactions")
+    if bills_tool is not None and catalog.phone_arguments(bills_tool, phone) is not None:
+        if bills_data is None:
+            missing.add("bills")
+    elif account_data is None:
+        missing.add("bills")
+
+    return FinancialSnapshot(
+        phone=phone,
+        account=account,
+        ledger=ledger,
+        bills=bills,
+        missing=missing,
+    )
+
+
+# Checks: pure functions of a snapshot, returning a Markdown alert or None
+
+def check_low_balance(snapshot: FinancialSnapshot) -> Optional[str]:
+    if not snapshot.account or snapshot.account["balance"] >= LOW_BALANCE_THRESHOLD:
+        return None
+    return (
+        f"⚠️ *Low Balance Alert!*\n\n"
+        f"Aapka balance sirf {format_inr(snapshot.account['balance'])} reh gaya hai. "
+        f"Agle kuch din zaroori kharch hi karo. 🙏"
+    )
+
+
+def check_excessive_spending(snapshot: FinancialSnapshot) -> Optional[str]:
+    totals = snapshot.ledger.totals(snapshot.week_ago)
+    spent, earned = totals["spent"], totals["earned"]
+
+    overspent = earned and spent >= OVERSPEND_MIN and spent > earned * OVERSPEND_RATIO
+    if spent <= WEEKLY_SPEND_LIMIT and not overspent:
+        return None
+
+    merchant, amount, _ = snapshot.ledger.top_merchants(snapshot.week_ago, limit=1)[0]
+
+    return (
+        f"📊 *High Spending Alert*\n\n"
+        f"Is hafte {format_inr(spent)} kharch ho gaye"
+        + (f", jabki kamai {format_inr(earned)} thi" if earned else "")
+        + f". Sabse zyada {merchant} pe ({format_inr(amount)}). Thoda control karo! 💪"
+    )
+
+
+def check_gambling_pattern(snapshot: FinancialSnapshot) -> Optional[str]:
+    gambling = snapshot.ledger.gambling(snapshot.week_ago)
+    if gambling["amount"] < GAMBLING_ALERT_MIN:
+        return None
+
+    return (
+        f"🎰 *Gambling Alert!*\n\n"
+        f"Is hafte {', '.join(gambling['merchants'])} pe {format_inr(gambling['amount'])} gaye ({gambling['count']} baar). "
+        f"Ye paise emergency fund mein jaate to family safe rehti. Band karo bhai! 🙏"
+    )
+
+
+def check_upcoming_bills(snapshot: FinancialSnapshot) -> Optional[str]:
+    horizon = snapshot.fetched_at + timedelta(days=BILL_REMINDER_DAYS)
+    due = [
+        b for b in snapshot.bills
+        if b["due_date"] and snapshot.fetched_at <= b["due_date"] <= horizon
+    ]
+    if not due:
+        return None
+
+    lines = []
+    for bill in sorted(due, key=lambda b: b["due_date"]):
+        day = bill["due_date"].astimezone(IST).strftime("%d %b")
+        amount = f" - {format_inr(bill['amount'])}" if bill["amount"] else ""
+        lines.append(f"• {bill['name']}{amount} ({day})")
+
+    total = sum(b["amount"] or 0 for b in due)
+    text = "📅 *Bill Reminder*\n\nAgle kuch dino mein ye bills due hain:\n" + "\n".join(lines)
+    if snapshot.account and total > snapshot.account["balance"]:
+        text += f"\n\nBalance {format_inr(snapshot.account['balance'])} hai - bills ke liye paise kam hain! ⚠️"
+    return text
+
+
+def check_no_emergency_fund(snapshot: FinancialSnapshot) -> Optional[str]:
+    if not snapshot.account or snapshot.account["emergency_fund"] is None:
+        return None
+    fund = snapshot.account["emergency_fund"]
+    if fund >= MIN_EMERGENCY_FUND:
+        return None
+
+    return (
+        f"💰 *Emergency Fund Reminder*\n\n"
+        f"Emergency fund mein sirf {format_inr(fund)} hai, kam se kam {format_inr(MIN_EMERGENCY_FUND)} hona chahiye. "
+        f"Roz ₹50 bhi daaloge to {format_inr(MIN_EMERGENCY_FUND - fund)} jaldi pura ho jayega! 💪"
+    )
+
+
+def check_good_income_day(snapshot: FinancialSnapshot) -> Optional[str]:
+    today_start = snapshot.fetched_at.astimezone(IST).replace(hour=0, minute=0, second=0, microsecond=0)
+    earned = snapshot.ledger.totals(today_start)["earned"]
+    if earned < GOOD_INCOME_DAY:
+        return None
+
+    suggestion = int(round(earned * 0.1, -1)) or 50
+    return (
+        f"🎉 *Aaj Achhi Kamai Hui!*\n\n"
+        f"Aaj {format_inr(earned)} aaye. Isme se {format_inr(suggestion)} savings mein daal do? "
+        f"Bas reply karo: \"{suggestion} savings mein daal do\" 💡"
+    )
+
+
+# Each check with the snapshot inputs it reads
+CHECKS = (
+    (check_low_balance, ("account",)),
+    (check_excessive_spending, ("transactions",)),
+    (check_gambling_pattern, ("transactions",)),
+    (check_upcoming_bills, ("bills",)),
+    (check_no_emergency_fund, ("account",)),
+    (check_good_income_day, ("transactions",)),
+)
+
+
+def evaluate(snapshot: FinancialSnapshot) -> Dict[str, Optional[str]]:
+    """
+    Run every check over one snapshot: check name -> alert message, or None
+    if the check ran and didn't fire. Checks whose inputs failed to load (or
+    that raised) are left out, since their result isn't known.
+    """
+    results = {}
+    for check, inputs in CHECKS:
+        if snapshot.missing.intersection(inputs):
+            continue
+        try:
+            results[check.__name__] = check(snapshot) or None
+        except Exception as e:
+            logger.error(f"{check.__name__} failed for {snapshot.phone[-4:]}: {e}")
+    return results
+
+
+def run_checks(snapshot: FinancialSnapshot) -> list:
+    """Run every check over one snapshot and return the alert messages"""
+    return [message for message in evaluate(snapshot).values() if message]
+
+
+class AlertTracker:
+    """
+    Remembers, per user, the fingerprint of the last delivered check and
+    which alerts were already sent.
+
+    A user whose fingerprint hasn't changed since their last delivered
+    check is not re-evaluated at all. An alert that is still firing is not
+    sent again until ALERT_COOLDOWN has passed; once a check runs on
+    complete data and doesn't fire, its alert is forgotten, so it alerts
+    again the next time it fires. A check that couldn't run (its data
+    failed to load) keeps its record.
+
+    With a `store` (UserStore), the sent alerts are loaded from and saved
+    to it, so a restart doesn't repeat them. Fingerprints stay in memory:
+    after a restart each user is evaluated once more, and the sent record
+    still suppresses repeats.
+    """
+
+    def __init__(self, cooldown: float = ALERT_COOLDOWN, store: Optional[UserStore] = None):
+        self.cooldown = cooldown
+        self.store = store
+        self._fingerprints: Dict[str, str] = {}
+        self._sent: Dict[str, Dict[str, float]] = {}  # phone -> check name -> sent at (wall clock)
+
+        # Metrics
+        self.evaluated = 0
+        self.skipped_unchanged = 0
+        self.suppressed = 0
+
+    def _sent_for(self, phone: str) -> Dict[str, float]:
+        if phone not in self._sent:
+            self._sent[phone] = self.store.sent_alerts(phone) if self.store is not None else {}
+        return self._sent[phone]
+
+    def changed(self, snapshot: FinancialSnapshot) -> bool:
+        """True if the snapshot differs from the last one whose alerts were delivered"""
+        if self._fingerprints.get(snapshot.phone) == snapshot.fingerprint():
+            self.skipped_unchanged += 1
+            return False
+        self.evaluated += 1
+        return True
+
+    def due(self, phone: str, alerts: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """The alerts from `alerts` (as returned by evaluate) to send now, by check name; records nothing"""
+        now = time.time()
+        sent = self._sent_for(phone)
+
+        due = {}
+        for name, message in alerts.items():
+            if message is None:
+                continue
+            if name in sent and now - sent[name] < self.cooldown:
+                self.suppressed += 1
+                continue
+            due[name] = message
+        return due
+
+    def commit(self, snapshot: FinancialSnapshot, alerts: Dict[str, Optional[str]], sent_names: Iterable[str]):
+        """
+        Record a check whose alerts went out: the snapshot's fingerprint,
+        `sent_names` as sent now, and the conditions in `alerts` that
+        cleared. Call it only after sending succeeded, so a failed send is
+        evaluated and sent again next cycle.
+        """
+        now = time.time()
+        self._fingerprints[snapshot.phone] = snapshot.fingerprint()
+        sent = self._sent_for(snapshot.phone)
+        before = dict(sent)
+        for name, message in alerts.items():
+            if message is None:
+                # The condition cleared, so it may alert again later
+                sent.pop(name, None)
+        for name in sent_names:
+            sent[name] = now
+        if self.store is not None and sent != before:
+            self.store.save_sent_alerts(snapshot.phone, sent)
+
+    def forget(self, phone: str):
+        self._fingerprints.pop(phone, None)
+        self._sent.pop(phone, None)
+
+    def stats(self) -> dict:
+        return {
+            "evaluated": self.evaluated,
+            "skipped_unchanged": self.skipped_unchanged,
+            "alerts_suppressed": self.suppressed,
+        }
@@ -0,0 +1,169 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bank_data import IST, extract_account, format_inr, parse_tool_json
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+QUICK_REPLY_LLM_REWRITE = os.getenv("QUICK_REPLY_LLM_REWRITE", "0") == "1"
+MIN_EMERGENCY_FUND = 5000  # same floor as the system prompt
+MERCHANT_SPEND_DAYS = int(os.getenv("MERCHANT_SPEND_DAYS", "30"))  # window when a question names no period
+
+# How replies name the periods the router picks out of a question
+PERIOD_LABELS = {"today": "Aaj", "week": "Is hafte", "month": "Is mahine"}
+
+REWRITE_PROMPT = """
+You are Disha, a friendly financial advisor. Rewrite the message below in natural Hinglish
+for Telegram (2-4 sentences). Keep every number exactly as given. Do not add new facts.
+"""
+
+
+def render_balance(account: dict) -> str:
+    """Hinglish balance reply from extract_account() output"""
+    text = f"Aapka balance {format_inr(account['balance'])} hai."
+
+    pockets = []
+    if account["savings"] is not None:
+        pockets.append(f"Savings pocket mein {format_inr(account['savings'])}")
+    if account["emergency_fund"] is not None:
+        pockets.append(f"emergency fund mein {format_inr(account['emergency_fund'])}")
+    if pockets:
+        text += " " + " aur ".join(pockets) + " hai."
+
+    if account["emergency_fund"] is not None and account["emergency_fund"] < MIN_EMERGENCY_FUND:
+        text += " Thoda aur emergency fund badhana chahiye! 💪"
+    elif account["emergency_fund"] is not None:
+        text += " Emergency fund achha hai, aise hi chalte raho! 🎉"
+    return text
+
+
+def render_spending(ledger, now: Optional[datetime] = None) -> str:
+    """Hinglish summary of the last 7 days of debits from a TransactionLedger"""
+    now = now or datetime.now(timezone.utc)
+    week_ago = now - timedelta(days=7)
+
+    totals = ledger.totals(week_ago)
+    if not totals["debits"]:
+        return "Is hafte koi kharch nahi hua. Bahut badhiya! 🎉"
+
+    top = ledger.top_merchants(week_ago, limit=2)
+    text = f"Is hafte {format_inr(totals['spent'])} kharch hue."
+    text += " " + " aur ".join(f"{merchant} pe {format_inr(amount)}" for merchant, amount, _ in top) + " gaye."
+
+    gambling = ledger.gambling(week_ago)["amount"]
+    if gambling:
+        text += f" Gambling pe {format_inr(gambling)} gaye - bhai, ye band karo! Wo paise save kar sakte ho. 🙏"
+    return text
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> datetime:
+    """Start of "today", "week" (last 7 days, as in render_spending) or "month" on the IST calendar"""
+    now = now or datetime.now(timezone.utc)
+    if period == "week":
+        return now - timedelta(days=7)
+    start = now.astimezone(IST).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        start = start.replace(day=1)
+    return start
+
+
+def render_merchant_spend(ledger, merchant: str, period: Optional[str] = None,
+                          now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Hinglish reply for "<merchant> pe kitna gaya?" over the stored
+    transactions. None if no stored merchant matches, since the word may
+    not be a merchant at all ("chai", "petrol") and the agent knows better.
+    """
+    if ledger.merchant_spend(merchant) is None:
+        return None
+
+    if period:
+        label = PERIOD_LABELS[period]
+        since = period_start(period, now)
+    else:
+        label = f"Pichle {MERCHANT_SPEND_DAYS} din mein"
+        since = (now or datetime.now(timezone.utc)) - timedelta(days=MERCHANT_SPEND_DAYS)
+    spend = ledger.merchant_spend(merchant, since=since)
+
+    if spend is None:
+        return f"{label} {merchant} pe koi kharch nahi hua. 👍"
+
+    text = f"{label} {spend['merchant']} pe {format_inr(spend['amount'])} gaye ({spend['count']} baar)."
+    if spend["gambling"]:
+        text += " Bhai, ye gambling hai - band karo! Wo paise emergency fund mein daal do. 🙏"
+    return text
+
+
+async def _rewrite(agent, text: str) -> str:
+    """Optionally let the LLM polish a templated reply; falls back to the template"""
+    try:
+        msg = await agent.complete([
+            {"role": "system", "content": REWRITE_PROMPT},
+            {"role": "user", "content": text}
+        ])
+        return msg.content or text
+    except Exception as e:
+        logger.warning(f"Quick reply rewrite failed: {e}")
+        return text
+
+
+async def _call_for_user(agent, tool_name: str, phone: str) -> Optional[str]:
+    catalog = await agent.tool_catalog.get()
+    args = catalog.phone_arguments(tool_name, phone)
+    if args is None:
+        return None
+    return await agent.call_tool(tool_name, args)
+
+
+async def quick_balance(agent, phone: str, rewrite: bool = QUICK_REPLY_LLM_REWRITE) -> Optional[str]:
+    """
+    Answer "what's my balance" straight from get_account_details, no LLM.
+    Returns None if the result can't be read, so callers can fall back to
+    the full agent.
+    """
+    try:
+        result = await _call_for_user(agent, "get_account_details", phone)
+    except Exception as e:
+        logger.warning(f"Quick balance failed: {e}")
+        return None
+
+    account = extract_account(parse_tool_json(result)) if result else None
+    if account is None:
+        return None
+
+    text = render_balance(account)
+    return await _rewrite(agent, text) if rewrite else text
+
+
+async def quick_spending(agent, phone: str, rewrite: bool = QUICK_REPLY_LLM_REWRITE) -> Optional[str]:
+    """
+    Answer "how much did I spend this week" from the local transaction
+    store, no LLM. Returns None if no transactions can be read.
+    """
+    ledger = await agent.transaction_store.ledger(phone)
+    if not ledger:
+        # Unreadable or empty - let the full agent handle it
+        return None
+
+    text = render_spending(ledger)
+    return await _rewrite(agent, text) if rewrite else text
+
+
+async def quick_merchant_spend(agent, phone: str, merchant: str, period: Optional[str] = None,
+                               rewrite: bool = QUICK_REPLY_LLM_REWRITE) -> Optional[str]:
+    """
+    Answer "how much went to <merchant> (this week)" from the local
+    transaction store, no LLM. Returns None if no transactions can be read
+    or none of them are from a matching merchant.
+    """
+    ledger = await agent.transaction_store.ledger(phone)
+    if not ledger:
+        return None
+
+    text = render_merchant_spend(ledger, merchant, period)
+    if text is None:
+        return None
+    return await _rewrite(agent, text) if rewrite else text
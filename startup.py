@@ -0,0 +1,162 @@
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "5"))  # seconds from process start until ready
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "20"))  # seconds in-flight turns get to finish on shutdown
+
+
+def _process_start() -> float:
+    """Wall-clock time the interpreter was launched (Linux), else now"""
+    try:
+        with open("/proc/stat") as f:
+            boot = next(float(line.split()[1]) for line in f if line.startswith("btime"))
+        with open("/proc/self/stat") as f:
+            ticks = float(f.read().rsplit(")", 1)[1].split()[19])
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, StopIteration, ValueError, IndexError):
+        return time.time()
+
+
+class Readiness:
+    """
+    Startup timeline and readiness of this process.
+
+    Phases (imports, building the agent, warming MCP sessions, ...) are
+    timed against the process start and reported once the process is
+    ready, with a warning if that took longer than STARTUP_BUDGET.
+    Readiness goes back to false while shutting down, so a load balancer
+    stops sending traffic before in-flight turns are drained.
+    """
+
+    def __init__(self):
+        self.started = _process_start()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.ready_after: Optional[float] = None
+        self.draining = False
+        self._drains: List[Callable[[float], Awaitable[int]]] = []
+
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def mark_imported(self):
+        """Call first thing in main(): everything until now was interpreter start and imports"""
+        self.phases["imports"] = self.elapsed()
+
+    def mark_ready(self):
+        if self.ready:
+            return
+        self.ready = True
+        self.ready_after = self.elapsed()
+        breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        if self.ready_after > STARTUP_BUDGET:
+            logger.warning(f"Ready after {self.ready_after:.2f}s, over the {STARTUP_BUDGET:.0f}s startup budget ({breakdown})")
+        else:
+            logger.info(f"Ready after {self.ready_after:.2f}s ({breakdown})")
+
+    def add_drain(self, drain: Callable[[float], Awaitable[int]]):
+        """Register `drain(timeout)`, which finishes in-flight work and returns how much it had to abandon"""
+        self._drains.append(drain)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT):
+        """Stop reporting ready and give in-flight work up to `timeout` seconds to finish"""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        for drain in self._drains:
+            abandoned = await drain(max(0.0, deadline - time.monotonic()))
+            if abandoned:
+                logger.warning(f"Shutdown: {abandoned} turn(s) still running after {timeout:.0f}s were cancelled")
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready and not self.draining,
+            "draining": self.draining,
+            "ready_after_s": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "budget_s": STARTUP_BUDGET,
+            "phases_s": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+readiness = Readiness()
+
+
+class Lazy:
+    """
+    Stand-in for a module-level client that is built on first use.
+
+    `factory` runs the first time an attribute is looked up, timed as
+    startup phase `name`; after that every attribute comes straight from
+    the built object. `build()` does the same ahead of time, importing
+    `imports` (e.g. the module that pulls in openai and mcp) in a worker
+    thread first so the event loop keeps serving updates meanwhile.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str, imports: Sequence[str] = ()):
+        self._factory = factory
+        self._name = name
+        self._imports = imports
+        self._value = None
+
+    @property
+    def built(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> Any:
+        if self._value is None:
+            with readiness.phase(self._name):
+                self._value = self._factory()
+        return self._value
+
+    async def build(self) -> Any:
+        if self._value is None and self._imports:
+            loop = asyncio.get_running_loop()
+            with readiness.phase(f"{self._name} imports"):
+                for module in self._imports:
+                    await loop.run_in_executor(None, importlib.import_module, module)
+        return self.get()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+async def readiness_handler(request):
+    """aiohttp handler: 200 once ready, 503 while starting or draining"""
+    from aiohttp import web
+
+    stats = readiness.stats()
+    return web.json_response(stats, status=200 if stats["ready"] else 503)
+
+
+def stop_polling_on_signals(application):
+    """
+    Polling mode (run_polling with stop_signals=None): on SIGINT/SIGTERM,
+    stop fetching updates, drain in-flight turns, then stop the bot.
+    """
+    async def stop():
+        readiness.draining = True
+        logger.info("Shutting down: no new updates, draining in-flight turns...")
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        await readiness.drain()
+        application.stop_running()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: readiness.draining or asyncio.ensure_future(stop()))
@@ -10,7 +10,16 @@ from telegram.ext import (
     ContextTypes,
 )
 from dotenv import load_dotenv
-from agent import DishaAgent
+from chat_persistence import SQLitePersistence
+from conversation_memory import ConversationMemory
+from intent_router import IntentRouter, RouteDecision, ROUTE_DIRECT
+from telegram_stream import stream_reply
+from user_turns import UserTurns, committed_on_output
+from telegram_outbox import OutboundLimiter
+from cassette import recorder
+from startup import Lazy, readiness, stop_polling_on_signals
+from tracing import start_metrics_server, trace, user_tag, writer
+from webhook_server import ALLOWED_UPDATES, run_webhook, use_webhook
 
 load_dotenv()
 
@@ -25,8 +34,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Disha Agent
-disha = DishaAgent()
+
+def build_agent():
+    from agent import DishaAgent
+    return DishaAgent()
+
+
+# Disha Agent, built on first use (or by the warm-up) so openai and mcp
+# are not imported before the bot starts taking updates
+disha = Lazy(build_agent, "agent", imports=("agent",))
+
+# Local intent routing in front of the agent
+router = IntentRouter()
+
+# Token-budgeted chat history with a rolling summary
+memory = ConversationMemory(disha)
+turns = UserTurns()
+
+# On shutdown, running turns get DRAIN_TIMEOUT seconds to finish
+readiness.add_drain(turns.drain)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -102,9 +128,15 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    await update.message.reply_text("💭 Checking...")
-    response = await disha.process_message(phone, "Mera current balance kya hai?")
-    await update.message.reply_text(response)
+    # Direct tool call + template; the agent answers only if the result can't be read
+    await stream_reply(
+        update.message,
+        router.stream_answer(
+            disha, phone, "Mera current balance kya hai?",
+            decision=RouteDecision("balance", ROUTE_DIRECT, 1.0, source="command")
+        ),
+        placeholder="💭 Checking..."
+    )
 
 
 async def spending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -116,9 +148,15 @@ async def spending_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    await update.message.reply_text("💭 Analyzing...")
-    response = await disha.process_message(phone, "Is hafte kitna kharch hua?")
-    await update.message.reply_text(response)
+    # Direct tool call + template; the agent answers only if the result can't be read
+    await stream_reply(
+        update.message,
+        router.stream_answer(
+            disha, phone, "Is hafte kitna kharch hua?",
+            decision=RouteDecision("spending_week", ROUTE_DIRECT, 1.0, source="command")
+        ),
+        placeholder="💭 Analyzing..."
+    )
 
 
 async def savings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -130,12 +168,14 @@ async def savings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    await update.message.reply_text("💭 Thinking...")
-    response = await disha.process_message(
-        phone, 
-        "Mujhe savings ke liye kya advice dogi? Aur emergency fund kitna hona chahiye?"
+    await stream_reply(
+        update.message,
+        disha.stream_message(
+            phone, 
+            "Mujhe savings ke liye kya advice dogi? Aur emergency fund kitna hona chahiye?"
+        ),
+        placeholder="💭 Thinking..."
     )
-    await update.message.reply_text(response)
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -176,35 +216,41 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Process message with Disha
     phone = context.user_data['phone']
     
-    # Show typing indicator
-    await update.message.chat.send_action("typing")
+    async def respond(query: str):
+        # One trace per turn; the router tags it with the intent
+        with trace("telegram.turn", user=user_tag(update.effective_chat.id)):
+            # Show typing indicator
+            await update.message.chat.send_action("typing")
+            
+            try:
+                # Get conversation history (summary + recent turns within the token budget)
+                conversation_history = memory.history(context.user_data)
+                
+                # Process with Disha (routed to a direct answer or cheaper model when possible),
+                # streaming the reply into the chat as it is generated
+                response = await stream_reply(
+                    update.message,
+                    committed_on_output(router.stream_answer(disha, phone, query, conversation_history))
+                )
+                
+                # Update conversation history (older turns get summarised after this handler
+                # returns, so persistence is told about the new summary when it lands)
+                memory.add_turn(
+                    context.user_data, query, response,
+                    on_summary=lambda: context.application.mark_data_for_update_persistence(
+                        user_ids=update.effective_user.id
+                    )
+                )
+                
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
+                await update.message.reply_text(
+                    "😅 Sorry, thoda technical problem aa gaya. Please try again!\n\n"
+                    f"Error: {str(e)[:100]}"
+                )
     
-    try:
-        # Get conversation history (last 5 messages for context)
-        conversation_history = context.user_data.get('history', [])
-        
-        # Process with Disha
-        response = await disha.process_message(phone, user_message, conversation_history)
-        
-        # Update conversation history
-        conversation_history.append({"role": "user", "content": user_message})
-        conversation_history.append({"role": "assistant", "content": response})
-        
-        # Keep only last 10 messages (5 pairs)
-        if len(conversation_history) > 10:
-            conversation_history = conversation_history[-10:]
-        
-        context.user_data['history'] = conversation_history
-        
-        # Send response
-        await update.message.reply_text(response)
-        
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
-        await update.message.reply_text(
-            "😅 Sorry, thoda technical problem aa gaya. Please try again!\n\n"
-            f"Error: {str(e)[:100]}"
-        )
+    # One turn at a time per user; messages sent while Disha is still thinking are answered together
+    await turns.submit(update.effective_user.id, user_message, respond)
 
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -217,8 +263,41 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+async def warm_up():
+    """Build the agent and open its MCP sessions; until this is done, the first update does it"""
+    try:
+        await disha.build()
+        with readiness.phase("warm-up"):
+            await disha.start()
+    except Exception as e:
+        logger.warning(f"Warm-up failed, connecting on first use instead: {e}")
+    readiness.mark_ready()
+
+
+async def post_init(application: Application):
+    """Start taking updates right away and warm up the agent in the background"""
+    application.bot_data["warm_up"] = asyncio.create_task(warm_up())
+    if not use_webhook():
+        # In webhook mode /metrics and /readyz are served by the webhook server
+        application.bot_data["metrics_runner"] = await start_metrics_server()
+        stop_polling_on_signals(application)
+
+
+async def post_shutdown(application: Application):
+    """Close pooled MCP sessions, the trace file and any cassette"""
+    if application.bot_data.get("warm_up"):
+        application.bot_data["warm_up"].cancel()
+    if disha.built:
+        await disha.close()
+    if application.bot_data.get("metrics_runner"):
+        await application.bot_data["metrics_runner"].cleanup()
+    writer.close()
+    recorder.close()
+
+
 def main():
     """Start the bot"""
+    readiness.mark_imported()
     if not TELEGRAM_BOT_TOKEN:
         print("❌ Error: TELEGRAM_BOT_TOKEN not found in .env file!")
         print("\nSteps to fix:")
@@ -229,15 +308,25 @@ def main():
         return
     
     # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .persistence(SQLitePersistence())
+        .concurrent_updates(True)
+        .rate_limiter(OutboundLimiter())
+        .build()
+    )
     
     # Register handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("skip", skip_phone))
     application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("balance", balance_command))
-    application.add_handler(CommandHandler("spending", spending_command))
-    application.add_handler(CommandHandler("savings", savings_command))
+    # Commands that call the bank or the LLM are waited for on shutdown, like turns
+    application.add_handler(CommandHandler("balance", turns.tracked(balance_command)))
+    application.add_handler(CommandHandler("spending", turns.tracked(spending_command)))
+    application.add_handler(CommandHandler("savings", turns.tracked(savings_command)))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
     # Register error handler
@@ -246,7 +335,11 @@ def main():
     # Start bot
     print("🤖 Disha Telegram Bot is starting...")
     print("✅ Bot is running! Press Ctrl+C to stop.")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if use_webhook():
+        asyncio.run(run_webhook(application))
+    else:
+        # Signals are handled by stop_polling_on_signals, which drains running turns first
+        application.run_polling(allowed_updates=ALLOWED_UPDATES, stop_signals=None)
 
 
 if __name__ == "__main__":
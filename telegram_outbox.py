@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from telegram import Bot
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Configuration (Telegram allows ~30 messages/s overall and ~1/s per chat)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))  # messages per second, all chats
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))  # messages per second, one chat
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "2"))  # resends after a RetryAfter
+
+# Priority classes; lower goes first
+PRIORITY_REPLY = 0  # answers to something the user just did
+PRIORITY_ALERT = 1  # proactive nudges
+PRIORITIES = (PRIORITY_REPLY, PRIORITY_ALERT)
+
+ALERT_SEPARATOR = "\n\n➖➖➖\n\n"
+MAX_CHAT_BUCKETS = 10000  # idle, full buckets are dropped beyond this
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out tokens by priority, first come first served
+    within a priority. Waiters sleep on a future of their own; one timer,
+    set for when the next token is due (or a pause ends), wakes the bucket
+    to hand tokens to the head of the queues.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._queues = {priority: deque() for priority in PRIORITIES}  # waiting futures
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Hand out nothing for `seconds` (after a RetryAfter from Telegram)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        return not any(self._queues.values()) and self.delay() == 0 and self.tokens >= self.burst
+
+    def _queued(self, up_to: int) -> bool:
+        return any(not waiter.done() for p in PRIORITIES if p <= up_to for waiter in self._queues[p])
+
+    def _grant(self):
+        """Give tokens to waiters in priority order, then sleep until the next one is due"""
+        self._timer = None
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                if queue[0].done():
+                    queue.popleft()  # cancelled while waiting
+                    continue
+                delay = self.delay()
+                if delay > 0:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._grant)
+                    return
+                self.tokens -= 1
+                queue.popleft().set_result(None)
+
+    async def acquire(self, priority: int) -> float:
+        """Wait for a token; returns how long we waited"""
+        if not self._queued(priority) and self.delay() <= 0:
+            self.tokens -= 1
+            return 0.0
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        if self._timer is None:
+            self._grant()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.tokens += 1  # granted just as we were cancelled; give it back
+            raise
+        return time.monotonic() - started
+
+
+class OutboundLimiter(BaseRateLimiter):
+    """
+    Rate limiter for every message the bot sends or edits.
+
+    Each request waits for a token from its chat's bucket and then from the
+    global bucket. Replies to users go ahead of proactive alerts in both.
+    Pass `rate_limit_args={"priority": PRIORITY_ALERT}` for nudges and
+    `{"max_retries": 0}` for requests that handle RetryAfter themselves.
+    A RetryAfter means the bot is over Telegram's global limit, so the whole
+    bot (and the chat, if any) is paused for the requested time and the
+    request is sent again.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 chat_burst: int = TELEGRAM_CHAT_BURST, max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: Dict[Any, TokenBucket] = {}
+
+        # Metrics
+        self.sent = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+        self.retry_afters = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                for idle_chat in [c for c, b in self._chats.items() if b.idle]:
+                    del self._chats[idle_chat]
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    @staticmethod
+    def _is_limited(endpoint: str) -> bool:
+        # Messages and edits count against Telegram's flood limits; lookups and chat actions don't
+        return endpoint.startswith(("send", "edit", "copy", "forward")) and endpoint != "sendChatAction"
+
+    async def process_request(self, callback, args, kwargs, endpoint: str, data: Dict[str, Any],
+                              rate_limit_args: Optional[dict]):
+        if not self._is_limited(endpoint):
+            return await callback(*args, **kwargs)
+
+        options = rate_limit_args or {}
+        priority = options.get("priority", PRIORITY_REPLY)
+        max_retries = options.get("max_retries", self.max_retries)
+        chat_id = data.get("chat_id")
+
+        for attempt in range(max_retries + 1):
+            waited = 0.0
+            if chat_id is not None:
+                waited += await self._chat_bucket(chat_id).acquire(priority)
+            waited += await self.global_bucket.acquire(priority)
+            if waited > 0.01:
+                self.throttled += 1
+                self.wait_time += waited
+
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                self.retry_afters += 1
+                seconds = retry_after_seconds(e)
+                self.global_bucket.pause(seconds)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).pause(seconds)
+                if attempt == max_retries:
+                    raise
+                logger.warning(f"Telegram flood control on {endpoint}, retrying in {seconds:.0f}s")
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "avg_wait_s": round(self.wait_time / self.throttled, 3) if self.throttled else 0.0,
+            "retry_after": self.retry_afters,
+            "chats_tracked": len(self._chats),
+        }
+
+
+def batch_alerts(messages: list) -> list:
+    """Merge alert messages into as few Telegram messages as fit the length limit"""
+    batches = []
+    current = ""
+    for message in messages:
+        candidate = f"{current}{ALERT_SEPARATOR}{message}" if current else message
+        if len(candidate) <= MessageLimit.MAX_TEXT_LENGTH:
+            current = candidate
+        else:
+            if current:
+                batches.append(current)
+            current = message[:MessageLimit.MAX_TEXT_LENGTH]
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def send_alerts(bot: Bot, chat_id: int, messages: list, priority: int = PRIORITY_ALERT) -> int:
+    """Send a user's alerts for this cycle as one (or few) Markdown messages; returns how many were sent"""
+    batches = batch_alerts(messages)
+    for text in batches:
+        await bot.send_message(chat_id, text, parse_mode='Markdown', rate_limit_args={"priority": priority})
+    return len(batches)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from telegram import Message
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest, RetryAfter
+
+from tracing import record, trace, user_tag
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TELEGRAM_STREAMING = os.getenv("TELEGRAM_STREAMING", "1") == "1"
+STREAM_EDIT_INTERVAL = float(os.getenv("TELEGRAM_STREAM_EDIT_INTERVAL", "1.0"))  # seconds between edits
+STREAM_CURSOR = " ▌"
+EMPTY_REPLY = "😅 Sorry, abhi jawab nahi de paayi. Please try again!"
+
+
+class StreamingReply:
+    """
+    Shows a reply in Telegram while it is still being generated.
+
+    The first text (or `placeholder`) is sent as a new message, which is
+    then edited at most once per STREAM_EDIT_INTERVAL. A RetryAfter from
+    Telegram pauses edits for the requested time instead of failing.
+    """
+
+    def __init__(self, reply_to: Message, placeholder: Optional[str] = None,
+                 interval: float = STREAM_EDIT_INTERVAL):
+        self.reply_to = reply_to
+        self.placeholder = placeholder
+        self.interval = interval
+        self.text = ""
+        self._sent: Optional[Message] = None
+        self._shown = ""
+        self._next_edit_at = 0.0
+        self._started = time.perf_counter()
+        self.first_text_after: Optional[float] = None  # seconds until the user saw real text
+
+    async def start(self):
+        if self.placeholder:
+            self._sent = await self.reply_to.reply_text(self.placeholder)
+            self._shown = self.placeholder
+            self._next_edit_at = time.monotonic() + self.interval
+
+    async def add(self, delta: str):
+        self.text += delta
+        if not self.text.strip():
+            return
+
+        if self._sent is None:
+            # First visible text goes out immediately
+            self._sent = await self.reply_to.reply_text(self.text[:MessageLimit.MAX_TEXT_LENGTH])
+            self._shown = self.text
+            self._next_edit_at = time.monotonic() + self.interval
+            self._text_shown()
+        elif time.monotonic() >= self._next_edit_at:
+            if await self._edit(self.text + STREAM_CURSOR):
+                self._text_shown()
+
+    def _text_shown(self):
+        if self.first_text_after is None:
+            self.first_text_after = time.perf_counter() - self._started
+            record("telegram.first_text", self.first_text_after)
+
+    async def finish(self) -> str:
+        """Show the complete text and return it"""
+        if not self.text.strip():
+            self.text = EMPTY_REPLY
+
+        chunks = [
+            self.text[i:i + MessageLimit.MAX_TEXT_LENGTH]
+            for i in range(0, len(self.text), MessageLimit.MAX_TEXT_LENGTH)
+        ]
+
+        if self._sent is None:
+            self._sent = await self.reply_to.reply_text(chunks[0])
+        elif self._shown != chunks[0]:
+            # The final edit must land, so wait out flood control if needed
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not await self._edit(chunks[0]):
+                # Flood control: wait until Telegram accepts edits again, then try once more
+                await asyncio.sleep(max(0.0, self._next_edit_at - time.monotonic()))
+                if not await self._edit(chunks[0]):
+                    # Still rejected: send the full text anew rather than leave it cut off
+                    self._sent = await self.reply_to.reply_text(chunks[0])
+                    self._shown = chunks[0]
+
+        self._text_shown()
+
+        # Anything over Telegram's length limit goes out as follow-up messages
+        for chunk in chunks[1:]:
+            await self.reply_to.reply_text(chunk)
+        return self.text
+
+    async def _edit(self, text: str) -> bool:
+        text = text[:MessageLimit.MAX_TEXT_LENGTH]
+        try:
+            # RetryAfter is handled here, so the rate limiter shouldn't resend
+            await self._sent.edit_text(text, rate_limit_args={"max_retries": 0})
+            self._shown = text
+            self._next_edit_at = time.monotonic() + self.interval
+            return True
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            logger.warning(f"Telegram flood control, pausing edits for {retry_after}s")
+            self._next_edit_at = time.monotonic() + retry_after
+            return False
+        except BadRequest as e:
+            # "Message is not modified" and similar are harmless here
+            logger.debug(f"Edit skipped: {e}")
+            self._shown = text
+            return True
+
+
+async def stream_reply(reply_to: Message, chunks: AsyncIterator[str], placeholder: Optional[str] = None) -> str:
+    """
+    Send the text produced by `chunks` as a reply to `reply_to`, updating
+    it progressively when TELEGRAM_STREAMING is on. Returns the full text.
+    """
+    # A trace of its own for commands; part of the turn's trace for chat messages
+    with trace("telegram.reply", user=user_tag(reply_to.chat_id)):
+        reply = StreamingReply(reply_to, placeholder)
+        await reply.start()
+
+        if TELEGRAM_STREAMING:
+            async for delta in chunks:
+                await reply.add(delta)
+        else:
+            reply.text = "".join([delta async for delta in chunks])
+
+        return await reply.finish()
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from mcp import McpError
+from mcp.types import INVALID_PARAMS, ErrorData
+
+from admission import AdmissionController, CircuitBreaker, CircuitOpen, Overloaded
+from mcp_pool import is_transport_error
+
+
+async def call(breaker: CircuitBreaker, error=None, is_failure=lambda e: True):
+    async with breaker.guard(is_failure):
+        await asyncio.sleep(0)
+        if error is not None:
+            raise error
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            asyncio.run(call(breaker, ConnectionError("down")))
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker("bank", failure_threshold=3, reset_timeout=60)
+    trip(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    with pytest.raises(CircuitOpen):
+        asyncio.run(call(breaker))
+
+
+def test_half_open_trial_closes_on_success():
+    breaker = CircuitBreaker("bank", failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    asyncio.run(call(breaker))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("bank", failure_threshold=2, reset_timeout=0)
+    trip(breaker)
+    assert breaker.check() is True
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_errors_the_filter_ignores_do_not_count():
+    breaker = CircuitBreaker("llm", failure_threshold=2, reset_timeout=60)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(call(breaker, ValueError("bad request"), lambda e: isinstance(e, TimeoutError)))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bank_breaker_counts_only_outages():
+    breaker = CircuitBreaker("bank", failure_threshold=2, reset_timeout=60)
+    rejected = McpError(ErrorData(code=INVALID_PARAMS, message="Unknown tool: foo"))
+    for _ in range(3):
+        with pytest.raises(McpError):
+            asyncio.run(call(breaker, rejected, is_transport_error))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(call(breaker, asyncio.TimeoutError(), is_transport_error))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_cancelled_non_trial_call_keeps_the_trial_slot():
+    async def main():
+        breaker = CircuitBreaker("bank", failure_threshold=2, reset_timeout=60)
+        started = asyncio.Event()
+
+        async def slow():
+            async with breaker.guard():
+                started.set()
+                await asyncio.sleep(10)
+
+        # Admitted while closed, still running when the breaker goes half-open
+        earlier = asyncio.create_task(slow())
+        await started.wait()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.reset_timeout = 0
+        assert breaker.check() is True  # the trial
+
+        earlier.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await earlier
+        with pytest.raises(CircuitOpen):
+            breaker.check()
+
+    asyncio.run(main())
+
+
+def test_cancelled_trial_frees_the_slot():
+    async def main():
+        breaker = CircuitBreaker("bank", failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        trial = asyncio.create_task(call(breaker, is_failure=lambda e: True))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert breaker.check() is True
+
+    asyncio.run(main())
+
+
+def test_admission_sheds_when_queue_is_full():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+        async with admission.slot():
+            with pytest.raises(Overloaded) as shed:
+                async with admission.slot():
+                    pass
+        return admission, shed.value
+
+    admission, error = asyncio.run(main())
+    assert error.reason == "queue_full"
+    assert admission.stats()["shed"]["queue_full"] == 1
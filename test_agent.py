@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+import agent
+from agent import DishaAgent
+
+
+def tool_call(name: str) -> SimpleNamespace:
+    return SimpleNamespace(id="call_1", function=SimpleNamespace(name=name, arguments='{"phone": "9876543210"}'))
+
+
+def run_slow_tool(monkeypatch, name: str) -> str:
+    monkeypatch.setattr(agent, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(agent, "TOOL_TIMEOUT", 0.01)
+    disha = DishaAgent(bank_urls=["http://bank.invalid/sse"])
+
+    async def slow(name, arguments):
+        await asyncio.sleep(1)
+
+    disha.call_tool = slow
+    [result] = asyncio.run(disha._execute_tool_calls([tool_call(name)]))
+    return result["content"]
+
+
+def test_read_timeout_is_an_error(monkeypatch):
+    assert run_slow_tool(monkeypatch, "get_account_details").startswith("Error: get_account_details timed out")
+
+
+def test_write_timeout_has_an_unknown_outcome(monkeypatch):
+    content = run_slow_tool(monkeypatch, "transfer_money")
+    assert content.startswith("Outcome unknown: transfer_money")
+    assert "transaction history" in content
@@ -0,0 +1,87 @@
+import gzip
+from types import SimpleNamespace
+
+from mcp.types import Tool
+
+from cassette import CassetteRecorder, Redactor, load_cassette, request_signature
+
+PHONE = "9876543210"
+
+
+def assistant(content=None, tool_calls=None):
+    return SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+
+
+def tool_call(name: str, arguments: str):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def record(path: str) -> list:
+    recorder = CassetteRecorder(str(path))
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=8)
+    user = {"role": "user", "content": f"mera number {PHONE}, balance kitna hai?"}
+
+    recorder.tools([Tool(name="get_account_details", inputSchema={"type": "object"})])
+    recorder.turn(PHONE, message=user["content"], intent="balance")
+    recorder.llm([user], "gpt-4o-mini", assistant(tool_calls=[
+        tool_call("get_account_details", f'{{"phone": "{PHONE}"}}')
+    ]), usage, 0.4)
+    recorder.mcp("get_account_details", {"phone": PHONE}, f'{{"phone": "{PHONE}", "balance": 5200}}', False, 0.12)
+    recorder.llm([user, assistant(), {"role": "tool", "content": "..."}], "gpt-4o-mini",
+                 assistant("Balance ₹5,200 hai"), usage, 0.3, stream=True, first_chunk=0.05)
+    recorder.close()
+    return [user]
+
+
+def test_round_trip_keeps_every_event_in_order(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    record(path)
+
+    events = load_cassette(str(path))
+    assert [event["kind"] for event in events] == ["tools", "turn", "llm", "mcp", "llm"]
+    tools, turn, call, mcp, answer = events
+    assert tools["tools"][0]["name"] == "get_account_details"
+    assert turn["intent"] == "balance"
+    assert call["tool_calls"][0]["name"] == "get_account_details"
+    assert mcp["ms"] == 120.0 and mcp["error"] is False
+    assert answer["content"] == "Balance ₹5,200 hai"
+    assert answer["stream"] is True and answer["first_ms"] == 50.0
+    assert answer["usage"] == {"prompt_tokens": 120, "completion_tokens": 8}
+    assert all(event["t"] >= 0 for event in events)
+
+
+def test_phone_numbers_never_reach_the_file(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    record(path)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert PHONE not in f.read()
+    turn, mcp = [event for event in load_cassette(str(path)) if event["kind"] in ("turn", "mcp")]
+    assert turn["phone"] == mcp["args"]["phone"] == "9000000001"
+
+
+def test_replayed_request_matches_recorded_signature(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    record(path)
+
+    events = load_cassette(str(path))
+    turn = events[1]
+    # Replay feeds the recorded (redacted) message back through the agent
+    replayed = [{"role": "system", "content": "prompt"}, {"role": "user", "content": turn["message"]}]
+    assert request_signature(replayed) == events[2]["sig"]
+    assert request_signature(replayed + [{"role": "assistant"}, {"role": "tool"}]) == events[4]["sig"]
+
+
+def test_truncated_cassette_keeps_flushed_events(tmp_path):
+    path = tmp_path / "traffic.jsonl.gz"
+    record(path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 10])
+
+    assert [event["kind"] for event in load_cassette(str(path))][:1] == ["tools"]
+
+
+def test_redactor_is_stable_and_handles_prefixes():
+    redact = Redactor()
+    assert redact.text(f"+91 {PHONE} aur {PHONE}") == "9000000001 aur 9000000001"
+    assert redact.value({"to": int(PHONE), "amount": 500}) == {"to": 9000000001, "amount": 500}
@@ -0,0 +1,33 @@
+import asyncio
+
+from conversation_memory import ConversationMemory
+
+
+def test_history_stays_within_budget_and_summary_is_reported(fake_agent):
+    async def main():
+        memory = ConversationMemory(fake_agent, token_budget=60)
+        user_data = {}
+        changed = []
+        for i in range(6):
+            memory.add_turn(user_data, f"sawaal {i} " * 10, f"jawab {i} " * 10, on_summary=lambda: changed.append(1))
+        await asyncio.gather(*memory._folds.values())
+        return memory, user_data, changed
+
+    memory, user_data, changed = asyncio.run(main())
+    assert len(user_data["history"]) == 4
+    assert user_data["summary"] == fake_agent.summary
+    assert changed  # persistence is told about every new summary
+    assert memory.history(user_data)[0]["role"] == "system"
+
+
+def test_no_fold_under_budget(fake_agent):
+    async def main():
+        memory = ConversationMemory(fake_agent, token_budget=10_000)
+        user_data = {}
+        memory.add_turn(user_data, "balance?", "₹5,200", on_summary=lambda: 1 / 0)
+        return memory, user_data
+
+    memory, user_data = asyncio.run(main())
+    assert "summary" not in user_data
+    assert memory.history(user_data) == user_data["history"]
+    assert fake_agent.prompts == []
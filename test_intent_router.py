@@ -0,0 +1,46 @@
+import pytest
+
+from intent_router import ROUTE_CHEAP, ROUTE_DIRECT, ROUTE_FULL, IntentRouter
+
+router = IntentRouter(model_path=None)
+
+
+@pytest.mark.parametrize("message, merchant, period", [
+    ("Dream11 pe kitna gaya?", "dream11", None),
+    ("Dream11 pe is hafte kitna gaya?", "dream11", "week"),
+    ("is hafte dream11 pe kitna gaya", "dream11", "week"),
+    ("Sharma Tea Stall pe is mahine kitne paise gaye", "sharma tea stall", "month"),
+    ("aaj chai pe kitna gaya", "chai", "today"),
+    ("maine petrol pe kitna kharch kiya", "petrol", None),
+])
+def test_merchant_spend_captures_merchant_and_period(message, merchant, period):
+    decision = router.classify(message)
+    assert decision.intent == "merchant_spend"
+    assert decision.route == ROUTE_DIRECT
+    assert decision.params == {"merchant": merchant, "period": period}
+
+
+def test_unknown_period_is_not_routed_direct():
+    # "is saal" isn't a period the quick reply knows, so the agent answers
+    assert router.classify("Dream11 pe is saal kitna gaya").intent != "merchant_spend"
+
+
+@pytest.mark.parametrize("message, intent, route", [
+    ("Mera balance kitna hai?", "balance", ROUTE_DIRECT),
+    ("Is hafte kitna kharch hua?", "spending_week", ROUTE_DIRECT),
+    ("kitna kharch hua", "spending", ROUTE_CHEAP),
+    ("pichle hafte kitna kharch hua?", "spending", ROUTE_CHEAP),
+    ("last week ka spending kitna tha", "spending", ROUTE_CHEAP),
+    ("₹500 savings mein daal do", "transfer", ROUTE_FULL),
+    ("namaste", "small_talk", ROUTE_CHEAP),
+    ("Mujhe Dream11 kaise band karna chahiye?", "advice", ROUTE_FULL),
+    ("aur kal?", "unknown", ROUTE_FULL),
+])
+def test_routes(message, intent, route):
+    decision = router.classify(message)
+    assert (decision.intent, decision.route) == (intent, route)
+
+
+def test_transfer_extracts_amount_and_pocket():
+    decision = router.classify("1,500 rs emergency fund mein daal do")
+    assert decision.params == {"amount": 1500, "pocket": "emergency"}
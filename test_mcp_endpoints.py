@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from mcp import McpError
+from mcp.types import INVALID_PARAMS, ErrorData
+
+from mcp_endpoints import MCPEndpoints
+
+
+def make_endpoints(*pools, hedge=False):
+    endpoints = MCPEndpoints([f"http://bank{i}.invalid/sse" for i in range(len(pools))], size=1, hedge=hedge)
+    for endpoint, pool in zip(endpoints.endpoints, pools):
+        endpoint.pool = pool
+    return endpoints
+
+
+def unknown_tool():
+    return McpError(ErrorData(code=INVALID_PARAMS, message="Unknown tool: foo"))
+
+
+def test_idempotent_flag_reaches_the_pool(fake_pool):
+    pool = fake_pool()
+    endpoints = make_endpoints(pool)
+    asyncio.run(endpoints.call_tool("transfer_money", {"phone": "1"}))
+    asyncio.run(endpoints.call_tool("get_account_details", {"phone": "1"}, idempotent=True))
+    assert pool.calls == [False, True]
+
+
+def test_write_does_not_fail_over(fake_pool):
+    primary, backup = fake_pool(TimeoutError("read timed out")), fake_pool()
+    endpoints = make_endpoints(primary, backup)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(endpoints.call_tool("transfer_money", {"phone": "1"}))
+    assert backup.calls == []
+    assert endpoints.failovers == 0
+    assert endpoints.endpoints[0].down
+
+
+def test_read_fails_over_on_transport_error(fake_pool):
+    primary, backup = fake_pool(ConnectionError("refused")), fake_pool()
+    endpoints = make_endpoints(primary, backup)
+
+    assert asyncio.run(endpoints.call_tool("get_account_details", {"phone": "1"}, idempotent=True)) == "ok"
+    assert backup.calls == [True]
+    assert endpoints.failovers == 1
+
+
+def test_error_answer_does_not_mark_endpoint_down(fake_pool):
+    primary, backup = fake_pool(unknown_tool()), fake_pool()
+    endpoints = make_endpoints(primary, backup)
+
+    with pytest.raises(McpError):
+        asyncio.run(endpoints.call_tool("foo", {}, idempotent=True))
+    assert not endpoints.endpoints[0].down
+    assert backup.calls == []
+
+
+def test_hedged_read_takes_the_first_answer(fake_pool):
+    slow, fast = fake_pool(delay=0.5), fake_pool()
+    endpoints = make_endpoints(slow, fast, hedge=True)
+    endpoints.endpoints[0].hedge_delay = lambda: 0.01
+
+    assert asyncio.run(endpoints.call_tool("get_account_details", {"phone": "1"}, idempotent=True)) == "ok"
+    assert endpoints.hedged == 1
+    assert endpoints.hedge_wins == 1
+
+
+def test_hedged_read_does_not_fail_over_on_error_answer(fake_pool):
+    primary, backup = fake_pool(unknown_tool()), fake_pool()
+    endpoints = make_endpoints(primary, backup, hedge=True)
+
+    with pytest.raises(McpError):
+        asyncio.run(endpoints.call_tool("foo", {}, idempotent=True))
+    assert backup.calls == []
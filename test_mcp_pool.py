@@ -0,0 +1,61 @@
+import asyncio
+
+import anyio
+import pytest
+from mcp import McpError
+from mcp.types import INTERNAL_ERROR, ErrorData
+
+
+def failing(error, times: int = 1):
+    calls = []
+
+    async def operation(session):
+        calls.append(session)
+        if len(calls) <= times:
+            raise error
+        return "ok"
+
+    return operation, calls
+
+
+def test_write_is_not_retried_after_it_was_sent(session_pool):
+    operation, calls = failing(TimeoutError("read timed out"))
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(session_pool.run(operation))
+    assert len(calls) == 1
+    assert session_pool._connections[0].reopened == 0
+
+
+def test_write_is_retried_when_it_never_reached_the_server(session_pool):
+    operation, calls = failing(anyio.ClosedResourceError())
+
+    assert asyncio.run(session_pool.run(operation)) == "ok"
+    assert len(calls) == 2
+    assert session_pool._connections[0].reopened == 1
+
+
+def test_idempotent_call_is_retried_after_a_transport_error(session_pool):
+    operation, calls = failing(TimeoutError("read timed out"))
+
+    assert asyncio.run(session_pool.run(operation, idempotent=True)) == "ok"
+    assert len(calls) == 2
+    assert session_pool._connections[0].reopened == 1
+
+
+def test_error_answer_is_raised_without_reconnecting(session_pool):
+    operation, calls = failing(McpError(ErrorData(code=INTERNAL_ERROR, message="ledger unavailable")))
+
+    with pytest.raises(McpError):
+        asyncio.run(session_pool.run(operation, idempotent=True))
+    assert len(calls) == 1
+    assert session_pool._connections[0].reopened == 0
+
+
+def test_retry_gives_up_after_one_reconnect(session_pool):
+    operation, calls = failing(anyio.ClosedResourceError(), times=2)
+
+    with pytest.raises(anyio.ClosedResourceError):
+        asyncio.run(session_pool.run(operation))
+    assert len(calls) == 2
+    assert session_pool._connections[0].reopened == 1
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from telegram.error import NetworkError
+
+from proactive_checks import (
+    OVERSPEND_MIN,
+    OVERSPEND_RATIO,
+    AlertTracker,
+    FinancialSnapshot,
+    check_excessive_spending,
+    check_low_balance,
+    evaluate,
+)
+from telegram_outbox import send_alerts
+from user_store import UserStore
+
+NOW = datetime(2026, 10, 15, 12, 0, tzinfo=timezone.utc)
+PHONE = "9876543210"
+
+
+def snapshot(balance=None, missing=()):
+    account = None if balance is None else {"balance": balance, "savings": 0, "emergency_fund": 10000}
+    return FinancialSnapshot(PHONE, account, None, [], fetched_at=NOW, missing=missing)
+
+
+@pytest.fixture
+def week(make_ledger):
+    def build(spent: float, earned: float) -> FinancialSnapshot:
+        ledger = make_ledger(NOW, ("Dream11", spent, 1), ("Ride Earnings", earned, 1, False))
+        return FinancialSnapshot(PHONE, None, ledger, [], fetched_at=NOW)
+    return build
+
+
+def test_low_balance_alert():
+    assert "Low Balance" in check_low_balance(snapshot(balance=500))
+    assert check_low_balance(snapshot(balance=5000)) is None
+    assert check_low_balance(snapshot()) is None
+
+
+def test_weekly_limit_alerts_regardless_of_earnings(week):
+    assert check_excessive_spending(week(4500, 10000)) is not None
+
+
+def test_small_overspend_is_not_an_alert(week):
+    assert check_excessive_spending(week(50, 20)) is None
+    assert check_excessive_spending(week(OVERSPEND_MIN - 1, 100)) is None
+    assert check_excessive_spending(week(OVERSPEND_MIN, OVERSPEND_MIN)) is None
+
+
+def test_clear_overspend_alerts(week):
+    earned = OVERSPEND_MIN
+    message = check_excessive_spending(week(earned * OVERSPEND_RATIO + 100, earned))
+    assert message and "High Spending" in message
+
+
+def deliver(tracker: AlertTracker, snap: FinancialSnapshot) -> list:
+    """One monitoring cycle whose send succeeds; returns the alerts sent"""
+    alerts = evaluate(snap)
+    due = tracker.due(PHONE, alerts)
+    tracker.commit(snap, alerts, due)
+    return list(due.values())
+
+
+def test_alert_is_sent_once_while_it_keeps_firing():
+    tracker = AlertTracker(cooldown=3600)
+    first = deliver(tracker, snapshot(balance=500))
+    again = deliver(tracker, snapshot(balance=400))
+    assert len(first) == 1 and "Low Balance" in first[0]
+    assert again == []
+    assert tracker.suppressed == 1
+
+
+def test_alert_fires_again_after_its_condition_cleared():
+    tracker = AlertTracker(cooldown=3600)
+    deliver(tracker, snapshot(balance=500))
+    assert deliver(tracker, snapshot(balance=5000)) == []
+    assert len(deliver(tracker, snapshot(balance=500))) == 1
+
+
+def test_incomplete_snapshot_keeps_the_sent_record():
+    tracker = AlertTracker(cooldown=3600)
+    deliver(tracker, snapshot(balance=500))
+
+    # get_account_details failed: the balance checks can't run and must not reset anything
+    failed = snapshot(missing={"account"})
+    assert "check_low_balance" not in evaluate(failed)
+    assert deliver(tracker, failed) == []
+
+    assert deliver(tracker, snapshot(balance=500)) == []
+
+
+def test_failed_send_is_retried_next_cycle(fake_bot):
+    tracker, bot = AlertTracker(cooldown=3600), fake_bot(failures=1)
+
+    async def cycle(snap):
+        # The order check_user uses: nothing is recorded until send_alerts returned
+        if not tracker.changed(snap):
+            return
+        alerts = evaluate(snap)
+        due = tracker.due(PHONE, alerts)
+        await send_alerts(bot, 1, list(due.values()))
+        tracker.commit(snap, alerts, due)
+
+    with pytest.raises(NetworkError):
+        asyncio.run(cycle(snapshot(balance=500)))
+    assert bot.sent == []
+
+    asyncio.run(cycle(snapshot(balance=500)))
+    assert len(bot.sent) == 1 and "Low Balance" in bot.sent[0]
+
+    asyncio.run(cycle(snapshot(balance=500)))
+    assert len(bot.sent) == 1
+
+
+def test_unchanged_snapshot_is_skipped():
+    tracker = AlertTracker()
+    assert tracker.changed(snapshot(balance=500))
+    # Not delivered yet, so the same snapshot is still worth checking
+    assert tracker.changed(snapshot(balance=500))
+    deliver(tracker, snapshot(balance=500))
+    assert not tracker.changed(snapshot(balance=500))
+    assert tracker.changed(snapshot(balance=600))
+
+
+def test_sent_alerts_survive_a_restart(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), legacy_file=None)
+    assert len(deliver(AlertTracker(cooldown=3600, store=store), snapshot(balance=500))) == 1
+
+    restarted = AlertTracker(cooldown=3600, store=store)
+    assert restarted.changed(snapshot(balance=500))  # fingerprints are not kept
+    assert deliver(restarted, snapshot(balance=500)) == []
+    assert deliver(restarted, snapshot(balance=5000)) == []
+    assert store.sent_alerts(PHONE) == {}
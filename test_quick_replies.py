@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from quick_replies import MERCHANT_SPEND_DAYS, render_merchant_spend
+
+NOW = datetime(2026, 10, 15, 12, 0, tzinfo=timezone.utc)
+
+
+def test_period_limits_the_sum(make_ledger):
+    ledger = make_ledger(NOW, ("Dream11", 200, 60), ("Dream11", 50, 2))
+    text = render_merchant_spend(ledger, "Dream11", period="week", now=NOW)
+    assert text.startswith("Is hafte Dream11 pe ₹50 gaye (1 baar).")
+
+
+def test_known_merchant_without_spend_in_period(make_ledger):
+    ledger = make_ledger(NOW, ("Dream11", 200, 60))
+    assert render_merchant_spend(ledger, "Dream11", period="week", now=NOW) == \
+        "Is hafte Dream11 pe koi kharch nahi hua. 👍"
+
+
+def test_unknown_merchant_falls_through(make_ledger):
+    ledger = make_ledger(NOW, ("Sharma Tea Stall", 30, 1))
+    assert render_merchant_spend(ledger, "Chai", period="week", now=NOW) is None
+
+
+def test_gambling_merchant_gets_a_warning(make_ledger):
+    ledger = make_ledger(NOW, ("Dream11", 200, 2), ("Dream11", 500, 1, False))
+    text = render_merchant_spend(ledger, "dream11", period="week", now=NOW)
+    assert text.startswith("Is hafte Dream11 pe ₹200 gaye (1 baar).")
+    assert "gambling" in text
+
+
+def test_no_period_uses_the_default_window_and_says_so(make_ledger):
+    ledger = make_ledger(NOW, ("Dream11", 200, MERCHANT_SPEND_DAYS + 30), ("Dream11", 50, 2))
+    text = render_merchant_spend(ledger, "Dream11", now=NOW)
+    assert text.startswith(f"Pichle {MERCHANT_SPEND_DAYS} din mein Dream11 pe ₹50 gaye (1 baar).")
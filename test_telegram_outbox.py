@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from telegram_outbox import (
+    ALERT_SEPARATOR,
+    PRIORITY_ALERT,
+    PRIORITY_REPLY,
+    OutboundLimiter,
+    TokenBucket,
+    batch_alerts,
+)
+
+
+def test_bucket_paces_waiters_in_arrival_order():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=1)
+        order = []
+
+        async def send(i):
+            await bucket.acquire(PRIORITY_ALERT)
+            order.append(i)
+
+        started = time.monotonic()
+        await asyncio.gather(*(send(i) for i in range(6)))
+        return order, time.monotonic() - started
+
+    order, elapsed = asyncio.run(main())
+    assert order == list(range(6))
+    assert 0.09 <= elapsed < 0.5  # 5 refills at 50/s
+
+
+def test_replies_go_ahead_of_queued_alerts():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=1)
+        await bucket.acquire(PRIORITY_ALERT)  # empty the bucket
+        order = []
+
+        async def send(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        alerts = [asyncio.create_task(send(f"alert{i}", PRIORITY_ALERT)) for i in range(3)]
+        await asyncio.sleep(0)
+        reply = asyncio.create_task(send("reply", PRIORITY_REPLY))
+        await asyncio.gather(reply, *alerts)
+        return order
+
+    assert asyncio.run(main())[0] == "reply"
+
+
+def test_waiters_sleep_through_a_pause():
+    async def main():
+        bucket = TokenBucket(rate=1000, burst=1)
+        bucket.pause(0.2)
+        wakeups = 0
+        grant = bucket._grant
+
+        def counting_grant():
+            nonlocal wakeups
+            wakeups += 1
+            grant()
+
+        bucket._grant = counting_grant
+        await asyncio.gather(*(bucket.acquire(PRIORITY_ALERT) for _ in range(100)))
+        return wakeups
+
+    # One wake-up per token due, not one every few milliseconds per waiter
+    assert asyncio.run(main()) <= 110
+
+
+def test_cancelled_waiter_does_not_stall_the_queue():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=1)
+        await bucket.acquire(PRIORITY_REPLY)
+        first = asyncio.create_task(bucket.acquire(PRIORITY_REPLY))
+        second = asyncio.create_task(bucket.acquire(PRIORITY_REPLY))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await asyncio.wait_for(second, 1)
+
+    assert asyncio.run(main()) < 0.5
+
+
+def test_retry_after_pauses_the_whole_bot():
+    async def main():
+        limiter = OutboundLimiter(global_rate=100, chat_rate=100, chat_burst=1)
+
+        async def flooded(*args, **kwargs):
+            raise RetryAfter(5)
+
+        with pytest.raises(RetryAfter):
+            await limiter.process_request(flooded, (), {}, "sendMessage", {"chat_id": 42}, {"max_retries": 0})
+        return limiter
+
+    limiter = asyncio.run(main())
+    assert limiter.global_bucket.delay() > 4
+    assert limiter._chats[42].delay() > 4
+    assert limiter.retry_afters == 1
+
+
+def test_batch_alerts_merges_within_the_length_limit():
+    assert batch_alerts(["a", "b"]) == [f"a{ALERT_SEPARATOR}b"]
+    long = "x" * 3000
+    assert batch_alerts([long, long]) == [long, long]
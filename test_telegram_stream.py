@@ -0,0 +1,39 @@
+import asyncio
+
+from telegram_stream import STREAM_CURSOR, StreamingReply
+
+
+def stream(incoming, deltas: list) -> str:
+    async def main():
+        reply = StreamingReply(incoming, interval=0.0)
+        for delta in deltas:
+            await reply.add(delta)
+        return await reply.finish()
+    return asyncio.run(main())
+
+
+def test_final_text_replaces_the_streamed_one(incoming):
+    message = incoming()
+    assert stream(message, ["Aapka ", "balance ", "₹5,200 hai."]) == "Aapka balance ₹5,200 hai."
+    assert len(message.sent) == 1
+    assert message.sent[0].text == "Aapka balance ₹5,200 hai."
+
+
+def test_final_edit_waits_out_flood_control(incoming):
+    # The last progressive edit and the first final edit are refused
+    message = incoming(refuse_edits=2, retry_after=0.05)
+    stream(message, ["Aapka ", "balance ", "₹5,200 hai."])
+
+    reply = message.sent[0]
+    assert reply.text == "Aapka balance ₹5,200 hai."
+    assert reply.edit_times[-1] - reply.edit_times[-2] >= 0.045
+    assert len(message.sent) == 1
+
+
+def test_falls_back_to_a_new_message_when_edits_keep_failing(incoming):
+    message = incoming(refuse_edits=10, retry_after=0.01)
+    stream(message, ["Aapka ", "balance ", "₹5,200 hai."])
+
+    assert message.sent[0].text == "Aapka "
+    assert message.sent[-1].text == "Aapka balance ₹5,200 hai."
+    assert not message.sent[-1].text.endswith(STREAM_CURSOR)
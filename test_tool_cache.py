@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from tool_cache import ToolResultCache
+
+ARGS = {"phone": "9876543210"}
+
+
+def slow_fetch(calls: list, delay: float = 0.05, result=("balance 5200", False)):
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def main():
+        cache = ToolResultCache()
+        calls = []
+        results = await asyncio.gather(*(
+            cache.get_or_fetch("get_account_details", ARGS, slow_fetch(calls)) for _ in range(5)
+        ))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(main())
+    assert results == ["balance 5200"] * 5
+    assert len(calls) == 1
+    assert cache.get("get_account_details", ARGS) == "balance 5200"
+
+
+def test_cancelled_owner_does_not_cancel_waiters():
+    async def main():
+        cache = ToolResultCache()
+        calls = []
+        owner = asyncio.create_task(cache.get_or_fetch("get_account_details", ARGS, slow_fetch(calls, 0.1)))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_fetch("get_account_details", ARGS, slow_fetch(calls, 0.1)))
+        await asyncio.sleep(0.02)
+
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await asyncio.wait_for(waiter, 1), calls
+
+    value, calls = asyncio.run(main())
+    assert value == "balance 5200"
+    assert len(calls) == 1
+
+
+def test_owner_timeout_does_not_cancel_waiters():
+    async def main():
+        cache = ToolResultCache()
+        calls = []
+        owner = asyncio.wait_for(cache.get_or_fetch("get_account_details", ARGS, slow_fetch(calls, 0.1)), 0.02)
+        waiter = cache.get_or_fetch("get_account_details", ARGS, slow_fetch(calls, 0.1))
+        return await asyncio.gather(owner, waiter, return_exceptions=True)
+
+    owner_result, waiter_result = asyncio.run(main())
+    assert isinstance(owner_result, asyncio.TimeoutError)
+    assert waiter_result == "balance 5200"
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def main():
+        cache = ToolResultCache()
+        calls = []
+        fetch = slow_fetch(calls, result=ConnectionError("bank down"))
+        results = await asyncio.gather(
+            cache.get_or_fetch("get_account_details", ARGS, fetch),
+            cache.get_or_fetch("get_account_details", ARGS, fetch),
+            return_exceptions=True,
+        )
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert len(calls) == 1
+    assert cache.get("get_account_details", ARGS) is None
+
+
+def test_error_results_are_not_cached():
+    async def main():
+        cache = ToolResultCache()
+        return cache, await cache.get_or_fetch("get_account_details", ARGS, slow_fetch([], result=("Error: x", True)))
+
+    cache, value = asyncio.run(main())
+    assert value == "Error: x"
+    assert cache.get("get_account_details", ARGS) is None
+
+
+def test_invalidation_during_fetch_skips_caching():
+    async def main():
+        cache = ToolResultCache()
+        fetching = asyncio.create_task(cache.get_or_fetch("get_account_details", ARGS, slow_fetch([])))
+        await asyncio.sleep(0.01)
+        cache.invalidate_user(ARGS["phone"])
+        return cache, await fetching
+
+    cache, value = asyncio.run(main())
+    assert value == "balance 5200"
+    assert cache.get("get_account_details", ARGS) is None
+
+
+def test_lru_eviction():
+    cache = ToolResultCache(max_entries=2)
+    for phone in ("1", "2", "3"):
+        cache.put("get_account_details", {"phone": phone}, phone)
+    assert cache.get("get_account_details", {"phone": "1"}) is None
+    assert cache.get("get_account_details", {"phone": "3"}) == "3"
+    assert cache.evictions == 1
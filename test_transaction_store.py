@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from transaction_store import TransactionLedger, TransactionStore
+
+NOW = datetime.now(timezone.utc)
+
+
+def txn(id: str, days_ago: int) -> dict:
+    return {"id": id, "merchant": "Zomato", "amount": 200, "is_debit": True, "category": "food",
+            "date": NOW - timedelta(days=days_ago)}
+
+
+def test_trim_forgets_old_ids_and_skips_old_rows():
+    ledger = TransactionLedger()
+    ledger.add([txn("old", 200), txn("new", 1)])
+    ledger.trim(keep_days=120)
+    assert set(ledger.ids) == {"new"}
+    assert len(ledger) == 1
+
+    # A server that ignores the sync cursor sends the old row again
+    assert ledger.add([txn("old", 200), txn("new", 1)]) == 0
+    assert len(ledger) == 1
+
+
+def test_least_recently_read_ledger_is_dropped():
+    # Syncs fail (no tool catalog); the ledgers are kept all the same
+    store = TransactionStore(SimpleNamespace(), max_users=2)
+
+    async def read(*phones):
+        for phone in phones:
+            await store.ledger(phone)
+
+    asyncio.run(read("a", "b", "a", "c"))
+    assert store.peek("b") is None
+    assert store.peek("a") is not None and store.peek("c") is not None
+    assert store.evictions == 1
@@ -0,0 +1,25 @@
+import json
+
+from user_store import UserStore
+
+
+def test_legacy_file_is_imported_once(tmp_path):
+    legacy = tmp_path / "registered_users.json"
+    legacy.write_text(json.dumps({"9876543210": {"chat_id": 42, "name": "Raju", "registered_at": "1"}}))
+
+    store = UserStore(str(tmp_path / "users.db"), legacy_file=str(legacy))
+    assert store.get("9876543210")["chat_id"] == 42
+
+    legacy.write_text(json.dumps({"9000000001": {"chat_id": 7}}))
+    again = UserStore(str(tmp_path / "users.db"), legacy_file=str(legacy))
+    assert again.get("9000000001") is None
+
+
+def test_notifications_toggle_needs_a_registered_user(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), legacy_file=None)
+    assert store.set_notifications("9876543210", False) is False
+
+    store.upsert("9876543210", 42, "Raju")
+    assert store.notifications_enabled("9876543210")
+    assert store.set_notifications("9876543210", False) is True
+    assert not store.notifications_enabled("9876543210")
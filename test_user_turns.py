@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from user_turns import UserTurns, committed_on_output, mark_turn_committed
+
+
+class Responder:
+    """Records the queries it was asked to answer"""
+
+    def __init__(self, delay: float = 0.05, commit: bool = False):
+        self.delay = delay
+        self.commit = commit
+        self.started = []
+        self.answered = []
+
+    async def __call__(self, query: str):
+        self.started.append(query)
+        if self.commit:
+            mark_turn_committed()
+        await asyncio.sleep(self.delay)
+        self.answered.append(query)
+
+
+def test_messages_during_a_turn_are_answered_together():
+    async def main():
+        turns, respond = UserTurns(), Responder(commit=True)
+        first = asyncio.create_task(turns.submit("u1", "balance?", respond))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(
+            first,
+            turns.submit("u1", "aur kharcha?", respond),
+            turns.submit("u1", "bills?", respond),
+        )
+        return turns, respond
+
+    turns, respond = asyncio.run(main())
+    assert respond.answered == ["balance?", "aur kharcha?\nbills?"]
+    assert turns.stats()["turns"] == 2
+    assert turns.stats()["coalesced_messages"] == 1
+    assert turns.stats()["active_users"] == 0
+
+
+def test_uncommitted_turn_is_restarted_with_the_follow_up():
+    async def main():
+        turns, respond = UserTurns(), Responder()
+        first = asyncio.create_task(turns.submit("u1", "balance?", respond))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, turns.submit("u1", "aur kharcha?", respond))
+        return turns, respond
+
+    turns, respond = asyncio.run(main())
+    assert respond.started == ["balance?", "balance?\naur kharcha?"]
+    assert respond.answered == ["balance?\naur kharcha?"]
+    assert turns.superseded == 1
+
+
+def test_committed_turn_is_not_restarted():
+    async def stream(text):
+        yield text
+
+    async def main():
+        turns = UserTurns()
+        answered = []
+
+        async def respond(query):
+            async for _ in committed_on_output(stream("Balance ₹5,200")):
+                pass
+            await asyncio.sleep(0.05)
+            answered.append(query)
+
+        first = asyncio.create_task(turns.submit("u1", "balance?", respond))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, turns.submit("u1", "thanks", respond))
+        return turns, answered
+
+    turns, answered = asyncio.run(main())
+    assert answered == ["balance?", "thanks"]
+    assert turns.superseded == 0
+
+
+def test_users_run_in_parallel():
+    async def main():
+        turns, respond = UserTurns(), Responder(delay=0.1)
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(turns.submit(f"u{i}", "hi", respond) for i in range(5)))
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(main()) < 0.3
+
+
+def test_errors_reach_every_coalesced_sender():
+    async def main():
+        turns = UserTurns()
+
+        async def respond(query):
+            mark_turn_committed()
+            await asyncio.sleep(0.02)
+            if "\n" in query:
+                raise ValueError(query)
+
+        first = asyncio.create_task(turns.submit("u1", "a", respond))
+        await asyncio.sleep(0.005)
+        return await asyncio.gather(
+            first, turns.submit("u1", "b", respond), turns.submit("u1", "c", respond),
+            return_exceptions=True,
+        )
+
+    first, second, third = asyncio.run(main())
+    assert first is None
+    assert isinstance(second, ValueError) and isinstance(third, ValueError)
+
+
+def test_drain_cancels_turns_that_overrun():
+    async def main():
+        turns, respond = UserTurns(), Responder(delay=10, commit=True)
+        waiting = asyncio.create_task(turns.submit("u1", "hi", respond))
+        await asyncio.sleep(0.01)
+        cancelled = await turns.drain(0.05)
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return cancelled
+
+    assert asyncio.run(main()) == 1
+
+
+def test_drain_waits_for_tracked_handlers():
+    async def main():
+        turns, answered = UserTurns(), []
+
+        @turns.tracked
+        async def balance_command(update, context):
+            await asyncio.sleep(0.05)
+            answered.append(update)
+
+        @turns.tracked
+        async def stuck_command(update, context):
+            await asyncio.sleep(10)
+
+        running = [asyncio.create_task(balance_command("u1", None)), asyncio.create_task(stuck_command("u2", None))]
+        await asyncio.sleep(0.01)
+        cancelled = await turns.drain(0.2)
+        await asyncio.gather(*running, return_exceptions=True)
+        return cancelled, answered
+
+    assert asyncio.run(main()) == (1, ["u1"])
@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook_server import SECRET_HEADER, WebhookServer
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"},
+                                       "from": {"id": 7, "is_bot": False, "first_name": "Raju"}, "text": "balance?"}}
+
+
+def post(headers: dict) -> tuple:
+    async def main():
+        application = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+        server = WebhookServer(application, secret="s3cret", peers=[])
+        async with TestClient(TestServer(server.app)) as client:
+            response = await client.post(server.path, json=UPDATE, headers=headers)
+        return response.status, application.update_queue.qsize()
+    return asyncio.run(main())
+
+
+def test_update_with_the_secret_is_queued():
+    assert post({SECRET_HEADER: "s3cret"}) == (200, 1)
+
+
+def test_update_without_the_secret_is_rejected():
+    assert post({}) == (403, 0)
+    assert post({SECRET_HEADER: "guess"}) == (403, 0)
+
+
+def test_refuses_to_start_without_a_secret():
+    with pytest.raises(RuntimeError):
+        WebhookServer(SimpleNamespace(), secret="")
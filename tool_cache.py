@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_ttls(spec: str) -> Dict[str, float]:
+    """Parse "tool=seconds,tool=seconds" into a dict"""
+    ttls = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+# Configuration
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "30"))  # default seconds per result
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "5000"))
+TOOL_CACHE_TTLS = {
+    "get_account_details": 30,
+    "get_recent_transactions": 60,
+    "analyze_spending_pattern": 300,
+    **_parse_ttls(os.getenv("TOOL_CACHE_TTLS", "")),
+}
+
+
+def user_of(arguments: dict) -> Optional[str]:
+    """The phone number a tool call is about, if any"""
+    for name, value in arguments.items():
+        if "phone" in name.lower():
+            return str(value)
+    return None
+
+
+class ToolResultCache:
+    """
+    LRU cache of read-only bank tool results, keyed by (user, tool, arguments).
+
+    Each tool has its own TTL (TOOL_CACHE_TTLS, falling back to TOOL_CACHE_TTL;
+    a TTL of 0 disables caching for that tool). Concurrent misses for the same
+    key share one upstream call, run as its own task so a caller that gives
+    up (timeout, superseded turn) doesn't cancel it for the others. Error
+    results are never cached.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, default_ttl: float = TOOL_CACHE_TTL,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = TOOL_CACHE_TTLS if ttls is None else ttls
+        self._entries: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        self._in_flight: Dict[Tuple, asyncio.Task] = {}
+        self._generations: Dict[str, int] = {}  # bumped per user on invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(name: str, arguments: dict) -> Tuple:
+        return (user_of(arguments), name, json.dumps(arguments, sort_keys=True, default=str))
+
+    def ttl_for(self, name: str) -> float:
+        return self.ttls.get(name, self.default_ttl)
+
+    def get(self, name: str, arguments: dict) -> Optional[str]:
+        key = self._key(name, arguments)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, name: str, arguments: dict, value: str):
+        ttl = self.ttl_for(name)
+        if ttl <= 0:
+            return
+
+        key = self._key(name, arguments)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, name: str, arguments: dict,
+                           fetch: Callable[[], Awaitable[Tuple[str, bool]]]) -> str:
+        """
+        Return the cached result or call `fetch()`, which returns
+        (result_text, is_error).
+        """
+        value = self.get(name, arguments)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        key = self._key(name, arguments)
+        task = self._in_flight.get(key)
+        if task is not None:
+            # Someone is already fetching this exact call
+            self.hits += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._fetch(name, arguments, fetch, self._generations.get(key[0], 0)))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done: self._fetch_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, name: str, arguments: dict, fetch: Callable[[], Awaitable[Tuple[str, bool]]],
+                     generation: int) -> str:
+        value, is_error = await fetch()
+        # Don't cache a result that raced with a write for the same user
+        if not is_error and self._generations.get(user_of(arguments), 0) == generation:
+            self.put(name, arguments, value)
+        return value
+
+    def _fetch_done(self, key: Tuple, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody waited for isn't logged as never retrieved
+            task.exception()
+
+    def invalidate_user(self, phone: Optional[str]):
+        """Drop every cached result for one user, e.g. after a transfer"""
+        if phone is None:
+            return
+        self._generations[phone] = self._generations.get(phone, 0) + 1
+        for store in (self._entries, self._in_flight):
+            for key in [key for key in store if key[0] == phone]:
+                del store[key]
+        self.invalidations += 1
+        logger.debug(f"Tool cache invalidated for {phone}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
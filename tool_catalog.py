@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from mcp import types
+
+from cassette import recorder
+from mcp_endpoints import MCPEndpoints
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TOOL_CATALOG_TTL = float(os.getenv("TOOL_CATALOG_TTL", "3600"))  # seconds
+
+
+class CatalogEntry:
+    """One fetched tool list plus its prebuilt OpenAI function specs"""
+
+    def __init__(self, tools: list):
+        self.tools = tools
+        self.names = {tool.name for tool in tools}
+        self.fetched_at = time.monotonic()
+        self.stale = False
+
+        # Convert to OpenAI format once, reused by every message
+        self.openai_tools = []
+        for tool in tools:
+            self.openai_tools.append({
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": tool.inputSchema
+                }
+            })
+
+    def phone_arguments(self, tool_name: str, phone: str) -> Optional[dict]:
+        """
+        Build arguments for calling `tool_name` directly for a user, or None if
+        the tool doesn't exist or has required parameters besides the phone.
+        """
+        tool = next((t for t in self.tools if t.name == tool_name), None)
+        if tool is None:
+            return None
+
+        properties = tool.inputSchema.get("properties", {})
+        phone_param = next((name for name in properties if "phone" in name.lower()), None)
+        if phone_param is None:
+            return None
+
+        required = set(tool.inputSchema.get("required", []))
+        if required - {phone_param}:
+            return None
+        return {phone_param: phone}
+
+    def parameter(self, tool_name: str, candidates) -> Optional[str]:
+        """Name of the first input parameter of `tool_name` matching one of `candidates` (case and punctuation ignored)"""
+        tool = next((t for t in self.tools if t.name == tool_name), None)
+        if tool is None:
+            return None
+        for name in tool.inputSchema.get("properties", {}):
+            if re.sub(r"[^a-z0-9]", "", name.lower()) in candidates:
+                return name
+        return None
+
+    def expired(self, ttl: float) -> bool:
+        return self.stale or time.monotonic() - self.fetched_at >= ttl
+
+
+class ToolCatalog:
+    """
+    Cache of the bank server's tool catalog, keyed by (server url, server version).
+
+    Only the very first lookup waits on `list_tools()`. After that the cached
+    entry is served immediately and, once it is older than the TTL or the
+    server sent `notifications/tools/list_changed`, refreshed in the background.
+    """
+
+    def __init__(self, pool: MCPEndpoints, ttl: float = TOOL_CATALOG_TTL):
+        self.pool = pool
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, Optional[str]], CatalogEntry] = {}
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def key(self) -> Tuple[str, Optional[str]]:
+        return (self.pool.url, self.pool.server_version)
+
+    async def get(self) -> CatalogEntry:
+        url, version = self.key
+        entry = self._entries.get((url, version))
+        if entry is None and version is None:
+            # No live session to ask for a version right now; serve the newest catalog we have
+            entry = max(
+                (e for (u, _), e in self._entries.items() if u == url),
+                key=lambda e: e.fetched_at,
+                default=None
+            )
+        if entry is None:
+            return await self.refresh()
+
+        if entry.expired(self.ttl):
+            self._schedule_refresh()
+        return entry
+
+    async def openai_tools(self) -> list:
+        return (await self.get()).openai_tools
+
+    async def refresh(self) -> CatalogEntry:
+        """Fetch the tool list now. Concurrent callers share a single fetch."""
+        async with self._refresh_lock:
+            entry = self._entries.get(self.key)
+            if entry is not None and not entry.expired(self.ttl):
+                return entry
+
+            mcp_tools_list = await self.pool.list_tools()
+            recorder.tools(mcp_tools_list.tools)
+            entry = CatalogEntry(mcp_tools_list.tools)
+
+            # Keyed after the fetch so a reconnect to a new server version lands in its own slot
+            self._entries[self.key] = entry
+            logger.info(f"Tool catalog loaded: {len(entry.tools)} tools from {self.key[0]} (v{self.key[1]})")
+            return entry
+
+    def invalidate(self):
+        """Mark every cached catalog stale; the next lookup triggers a refresh."""
+        for entry in self._entries.values():
+            entry.stale = True
+
+    async def handle_mcp_message(self, message):
+        """MCP message handler hook: refresh when the server's tool list changes"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info("Bank server tool list changed, refreshing catalog")
+            self.invalidate()
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Keep serving the old catalog; the next lookup will try again
+            logger.warning(f"Tool catalog refresh failed: {e}")
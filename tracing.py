@@ -0,0 +1,324 @@
+import bisect
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from startup import readiness_handler
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TRACE_FILE = os.getenv("TRACE_FILE", "")  # JSONL file for sampled traces ("" disables)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))  # fraction of traces written
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "10"))  # slower traces are always written
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # standalone /metrics server in polling mode (0 = off)
+
+# Seconds; covers a cache hit up to a Render cold start
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+MAX_SPANS_PER_TRACE = 200
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def user_tag(user) -> str:
+    """Short stable hash of a phone number or Telegram id, so traces carry no PII"""
+    return hashlib.sha1(str(user).encode()).hexdigest()[:10] if user else ""
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, one per (stage, intent)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given quantile"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Stage latency histograms, error counts and LLM token counters"""
+
+    def __init__(self):
+        self.latency: Dict[tuple, Histogram] = defaultdict(Histogram)  # (stage, intent) -> histogram
+        self.errors: Dict[tuple, int] = defaultdict(int)               # (stage, intent) -> count
+        self.tokens: Dict[tuple, int] = defaultdict(int)               # (model, kind) -> count
+
+    def observe(self, stage: str, intent: str, seconds: float, error: bool = False):
+        self.latency[(stage, intent)].observe(seconds)
+        if error:
+            self.errors[(stage, intent)] += 1
+
+    def add_tokens(self, model: str, prompt: int, completion: int):
+        self.tokens[(model, "prompt")] += prompt
+        self.tokens[(model, "completion")] += completion
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = ["# TYPE disha_stage_seconds histogram"]
+        for (stage, intent), histogram in sorted(self.latency.items()):
+            labels = f'stage="{stage}",intent="{intent}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'disha_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'disha_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"disha_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"disha_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# TYPE disha_stage_errors_total counter")
+        for (stage, intent), count in sorted(self.errors.items()):
+            lines.append(f'disha_stage_errors_total{{stage="{stage}",intent="{intent}"}} {count}')
+
+        lines.append("# TYPE disha_llm_tokens_total counter")
+        for (model, kind), count in sorted(self.tokens.items()):
+            lines.append(f'disha_llm_tokens_total{{model="{model}",kind="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> dict:
+        """p50/p95 per stage (all intents together), for the metrics log"""
+        merged: Dict[str, Histogram] = defaultdict(Histogram)
+        for (stage, _), histogram in self.latency.items():
+            total = merged[stage]
+            total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+            total.count += histogram.count
+            total.sum += histogram.sum
+        return {
+            stage: {"count": h.count, "p50_s": h.quantile(0.5), "p95_s": h.quantile(0.95)}
+            for stage, h in sorted(merged.items())
+        }
+
+
+metrics = Metrics()
+
+
+class Span:
+    def __init__(self, trace: Optional["Trace"], name: str, tags: dict):
+        self.trace = trace
+        self.name = name
+        self.tags = tags
+        self.started = time.perf_counter()
+        self.done = False
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def finish(self, error: Optional[BaseException] = None, duration: Optional[float] = None):
+        if self.done:
+            return
+        self.done = True
+        if duration is None:
+            duration = time.perf_counter() - self.started
+        intent = self.trace.tags.get("intent", "") if self.trace else ""
+        metrics.observe(self.name, intent, duration, error is not None)
+        if self.trace is not None:
+            self.trace.add(self, duration, error)
+
+
+class Trace:
+    """
+    Spans of one unit of work (a chat turn, a proactive check).
+
+    Spans are recorded flat, with their offset from the start of the trace,
+    so they can be opened in async generators and child tasks without
+    touching context variables. Every span feeds the histograms; the span
+    list is only written out for sampled or slow traces.
+    """
+
+    def __init__(self, name: str, tags: dict):
+        self.name = name
+        self.tags = tags
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def add(self, span: Span, duration: float, error: Optional[BaseException]):
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            return
+        record = {
+            "name": span.name,
+            "start_ms": round((span.started - self.started) * 1000, 1),
+            "ms": round(duration * 1000, 1),
+        }
+        if span.tags:
+            record["tags"] = span.tags
+        if error is not None:
+            record["error"] = type(error).__name__
+        self.spans.append(record)
+
+
+class TraceWriter:
+    """Appends sampled traces to TRACE_FILE, one JSON object per line"""
+
+    def __init__(self, path: str = TRACE_FILE, sample_rate: float = TRACE_SAMPLE_RATE,
+                 slow_seconds: float = TRACE_SLOW_SECONDS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._file = None
+
+        # Metrics
+        self.traces = 0
+        self.written = 0
+
+    def write(self, trace: Trace, duration: float, error: Optional[BaseException]):
+        self.traces += 1
+        if not self.path:
+            return
+        if duration < self.slow_seconds and random.random() >= self.sample_rate:
+            return
+
+        record = {
+            "trace_id": trace.trace_id,
+            "name": trace.name,
+            "ts": round(trace.wall_start, 3),
+            "ms": round(duration * 1000, 1),
+            **({"error": type(error).__name__} if error is not None else {}),
+            "tags": trace.tags,
+            "spans": trace.spans,
+        }
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self.written += 1
+        except OSError as e:
+            logger.warning(f"Could not write trace to {self.path}: {e}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {"traces": self.traces, "written": self.written}
+
+
+writer = TraceWriter()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def tag_trace(**tags):
+    """Add tags (e.g. the routed intent) to the running trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tag(**tags)
+
+
+@contextmanager
+def trace(name: str, **tags):
+    """
+    Run the block as the root of a new trace, also recorded as span `name`.
+    Must be entered from a coroutine, not an async generator. Inside an
+    existing trace this is just a span.
+    """
+    if _current_trace.get() is not None:
+        with span(name, **tags) as s:
+            yield s
+        return
+
+    root = Trace(name, tags)
+    token = _current_trace.set(root)
+    root_span = Span(root, name, {})
+    error = None
+    try:
+        yield root_span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_trace.reset(token)
+        root_span.finish(error)
+        writer.write(root, time.perf_counter() - root.started, error)
+
+
+def start_span(name: str, **tags) -> Span:
+    """Span for a stage that doesn't fit a with-block; call finish() on it"""
+    return Span(_current_trace.get(), name, tags)
+
+
+@contextmanager
+def span(name: str, **tags):
+    """Time the block as stage `name` of the running trace (histograms only if there is none)"""
+    s = start_span(name, **tags)
+    try:
+        yield s
+    except GeneratorExit:
+        # The consumer of a streaming stage stopped early; not a failure
+        s.finish()
+        raise
+    except BaseException as e:
+        s.finish(e)
+        raise
+    else:
+        s.finish()
+
+
+def record(name: str, seconds: float, **tags):
+    """Record stage `name` that took `seconds` and has just ended"""
+    s = start_span(name, **tags)
+    s.started -= seconds
+    s.finish(duration=seconds)
+
+
+def record_tokens(s: Span, model: str, usage):
+    """Tag an LLM span with its token counts and add them to the counters"""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    s.tag(prompt_tokens=prompt, completion_tokens=completion)
+    metrics.add_tokens(model, prompt, completion)
+
+
+async def metrics_handler(request):
+    """aiohttp handler serving the Prometheus text format"""
+    return web.Response(text=metrics.prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(port: int = METRICS_PORT):
+    """Serve /metrics and /readyz on `port` (polling mode); returns the runner to clean up, or None if disabled"""
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/readyz", readiness_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logger.info(f"Metrics on :{port}/metrics")
+    return runner
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from bank_data import IST, extract_transactions, is_gambling, parse_tool_json
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TXN_SYNC_INTERVAL = float(os.getenv("TXN_SYNC_INTERVAL", "60"))  # min seconds between syncs per user
+TXN_STORE_DAYS = int(os.getenv("TXN_STORE_DAYS", "120"))  # history kept per user
+TXN_STORE_MAX_USERS = int(os.getenv("TXN_STORE_MAX_USERS", "5000"))  # ledgers kept; least recently used go first
+TXN_SYNC_OVERLAP = timedelta(days=1)  # re-read a little before the cursor to catch late postings
+
+TRANSACTIONS_TOOL = "get_recent_transactions"
+SINCE_PARAMETERS = ("since", "from", "fromdate", "startdate", "after", "sincedate", "cursor")
+
+DAY = 86400
+IST_OFFSET = int(IST.utcoffset(None).total_seconds())
+
+
+def _epoch(moment: datetime) -> int:
+    return int(moment.timestamp())
+
+
+def _ist_day(ts: np.ndarray) -> np.ndarray:
+    """Day number (days since epoch, IST calendar) for each timestamp"""
+    return (ts + IST_OFFSET) // DAY
+
+
+class TransactionLedger:
+    """
+    Column store of one user's transactions, with the analytics the bot needs.
+
+    New rows are buffered and appended to the NumPy columns on the next query,
+    so a sync only touches what is new. Merchant and category names are
+    interned to integer codes, which lets per-merchant and per-category totals
+    be computed with a single bincount.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}  # id -> timestamp of every stored row
+        self.horizon = 0  # rows older than this were trimmed and are not added again
+        self.cursor: Optional[datetime] = None  # newest transaction time seen
+        self.last_id = ""
+        self.synced_at = 0.0  # monotonic
+        self.stale = True
+
+        self._merchants = []
+        self._merchant_codes: Dict[str, int] = {}
+        self._categories = []
+        self._category_codes: Dict[str, int] = {}
+        self._pending = []
+
+        self.ts = np.empty(0, dtype=np.int64)
+        self.amount = np.empty(0, dtype=np.float64)
+        self.debit = np.empty(0, dtype=bool)
+        self.gambling_flag = np.empty(0, dtype=bool)
+        self.merchant = np.empty(0, dtype=np.int32)
+        self.category = np.empty(0, dtype=np.int32)
+
+    def _intern(self, value: str, names: list, codes: Dict[str, int]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def add(self, transactions: list, seen_at: Optional[datetime] = None) -> int:
+        """Add normalized transactions not seen before; returns how many were new"""
+        seen_at = seen_at or datetime.now(timezone.utc)
+        added = 0
+        for txn in transactions:
+            # Ids are what make re-reads idempotent; fall back to the row's content
+            key = txn["id"] or f"{txn['date']}|{txn['amount']}|{txn['merchant']}|{txn['is_debit']}"
+            # Undated rows count from when we first saw them
+            when = txn["date"] or seen_at
+            ts = _epoch(when)
+            if key in self.ids or ts < self.horizon:
+                continue
+            self.ids[key] = ts
+
+            self._pending.append((
+                ts,
+                txn["amount"],
+                txn["is_debit"],
+                is_gambling(txn),
+                self._intern(txn["merchant"], self._merchants, self._merchant_codes),
+                self._intern(txn["category"], self._categories, self._category_codes),
+            ))
+            if self.cursor is None or when >= self.cursor:
+                self.cursor = when
+                self.last_id = key
+            added += 1
+        return added
+
+    def _flush(self):
+        if not self._pending:
+            return
+        ts, amount, debit, gambling, merchant, category = zip(*self._pending)
+        self._pending = []
+        self.ts = np.concatenate([self.ts, np.array(ts, dtype=np.int64)])
+        self.amount = np.concatenate([self.amount, np.array(amount, dtype=np.float64)])
+        self.debit = np.concatenate([self.debit, np.array(debit, dtype=bool)])
+        self.gambling_flag = np.concatenate([self.gambling_flag, np.array(gambling, dtype=bool)])
+        self.merchant = np.concatenate([self.merchant, np.array(merchant, dtype=np.int32)])
+        self.category = np.concatenate([self.category, np.array(category, dtype=np.int32)])
+
+    def trim(self, keep_days: int = TXN_STORE_DAYS):
+        """Drop rows older than `keep_days`, and their ids; add() skips rows that old from now on"""
+        self._flush()
+        self.horizon = _epoch(datetime.now(timezone.utc) - timedelta(days=keep_days))
+        keep = self.ts >= self.horizon
+        if not keep.all():
+            for column in ("ts", "amount", "debit", "gambling_flag", "merchant", "category"):
+                setattr(self, column, getattr(self, column)[keep])
+            self.ids = {key: ts for key, ts in self.ids.items() if ts >= self.horizon}
+
+    def __len__(self) -> int:
+        return len(self.ts) + len(self._pending)
+
+    # Analytics
+
+    def _mask(self, since: Optional[datetime] = None, debit: Optional[bool] = None) -> np.ndarray:
+        self._flush()
+        mask = np.ones(len(self.ts), dtype=bool)
+        if since is not None:
+            mask &= self.ts >= _epoch(since)
+        if debit is not None:
+            mask &= self.debit == debit
+        return mask
+
+    def totals(self, since: Optional[datetime] = None) -> dict:
+        """Money out and in (and how many transactions) since `since`"""
+        mask = self._mask(since)
+        debits = mask & self.debit
+        credits = mask & ~self.debit
+        return {
+            "spent": float(self.amount[debits].sum()),
+            "earned": float(self.amount[credits].sum()),
+            "debits": int(debits.sum()),
+            "credits": int(credits.sum()),
+        }
+
+    def _grouped(self, codes: np.ndarray, names: list, mask: np.ndarray, limit: Optional[int]) -> list:
+        amounts = np.bincount(codes[mask], weights=self.amount[mask], minlength=len(names))
+        counts = np.bincount(codes[mask], minlength=len(names))
+        order = np.argsort(-amounts, kind="stable")
+        order = order[amounts[order] > 0][:limit]
+        return [(names[i], float(amounts[i]), int(counts[i])) for i in order]
+
+    def top_merchants(self, since: Optional[datetime] = None, limit: Optional[int] = None) -> list:
+        """[(merchant, amount spent, count)] biggest first"""
+        return self._grouped(self.merchant, self._merchants, self._mask(since, debit=True), limit)
+
+    def by_category(self, since: Optional[datetime] = None, limit: Optional[int] = None) -> list:
+        """[(category, amount spent, count)] biggest first; uncategorised spend is ''"""
+        return self._grouped(self.category, self._categories, self._mask(since, debit=True), limit)
+
+    def merchant_spend(self, needle: str, since: Optional[datetime] = None) -> Optional[dict]:
+        """Spend at merchants whose name contains `needle`; None if there is none"""
+        mask = self._mask(since, debit=True)
+        if not self._merchants:
+            return None
+        needle = needle.lower()
+        matching = np.array([needle in name.lower() for name in self._merchants], dtype=bool)
+        mask &= matching[self.merchant]
+        if not mask.any():
+            return None
+        return {
+            "merchant": self._merchants[int(self.merchant[mask][0])],
+            "amount": float(self.amount[mask].sum()),
+            "count": int(mask.sum()),
+            "gambling": bool(self.gambling_flag[mask].any()),
+        }
+
+    def gambling(self, since: Optional[datetime] = None) -> dict:
+        """Gambling spend, its share of all spend, and the merchants involved"""
+        spend = self._mask(since, debit=True)
+        mask = spend & self.gambling_flag
+        total = float(self.amount[mask].sum())
+        spent = float(self.amount[spend].sum())
+        return {
+            "amount": total,
+            "count": int(mask.sum()),
+            "share": total / spent if spent else 0.0,
+            "merchants": sorted({self._merchants[i] for i in np.unique(self.merchant[mask])}),
+        }
+
+    def daily(self, days: int, debit: bool, now: Optional[datetime] = None) -> np.ndarray:
+        """Per-IST-day totals for the last `days` days, oldest first (today last)"""
+        now = now or datetime.now(timezone.utc)
+        today = int(_ist_day(np.array([_epoch(now)]))[0])
+        mask = self._mask(debit=debit)
+        offset = _ist_day(self.ts[mask]) - (today - days + 1)
+        inside = (offset >= 0) & (offset < days)
+        return np.bincount(offset[inside], weights=self.amount[mask][inside], minlength=days)[:days]
+
+    def rolling_daily_spend(self, days: int = 30, window: int = 7, now: Optional[datetime] = None) -> np.ndarray:
+        """Trailing `window`-day average of daily spend, for each of the last `days` days"""
+        daily = self.daily(days + window - 1, debit=True, now=now)
+        return np.convolve(daily, np.ones(window) / window, mode="valid")
+
+    def income_days(self, min_amount: float, days: int = 30, now: Optional[datetime] = None) -> list:
+        """[(IST date, amount earned)] for days in the last `days` with income >= min_amount"""
+        now = now or datetime.now(timezone.utc)
+        earned = self.daily(days, debit=False, now=now)
+        first = now.astimezone(IST).date() - timedelta(days=days - 1)
+        return [
+            (first + timedelta(days=int(i)), float(earned[i]))
+            for i in np.flatnonzero(earned >= min_amount)
+        ]
+
+    def summary(self, days: int = 7, now: Optional[datetime] = None) -> dict:
+        """Exact spending figures for the last `days` days, ready to hand to the LLM"""
+        now = now or datetime.now(timezone.utc)
+        since = now - timedelta(days=days)
+        totals = self.totals(since)
+        gambling = self.gambling(since)
+        return {
+            "period_days": days,
+            "total_spent": round(totals["spent"], 2),
+            "total_earned": round(totals["earned"], 2),
+            "transactions": totals["debits"] + totals["credits"],
+            "top_merchants": [
+                {"merchant": name, "amount": round(amount, 2), "count": count}
+                for name, amount, count in self.top_merchants(since, limit=5)
+            ],
+            "by_category": [
+                {"category": name or "uncategorised", "amount": round(amount, 2)}
+                for name, amount, _ in self.by_category(since)
+            ],
+            "gambling_spent": round(gambling["amount"], 2),
+            "gambling_share": round(gambling["share"], 3),
+            "avg_daily_spend": round(float(self.daily(days, debit=True, now=now).mean()), 2) if days else 0.0,
+        }
+
+
+class TransactionStore:
+    """
+    Local, incrementally synced copy of every user's recent transactions.
+
+    A sync asks get_recent_transactions only for what is newer than the
+    user's cursor (when the tool takes a since/from parameter) and merges
+    the rows by id, so repeated syncs are cheap even if the server ignores
+    the cursor. Syncs are throttled to one per TXN_SYNC_INTERVAL per user
+    unless the user made a transfer in between. At most `max_users` ledgers
+    are kept; the least recently read one is dropped and rebuilt from the
+    bank on its next read.
+    """
+
+    def __init__(self, agent, sync_interval: float = TXN_SYNC_INTERVAL, max_users: int = TXN_STORE_MAX_USERS):
+        self.agent = agent
+        self.sync_interval = sync_interval
+        self.max_users = max(1, max_users)
+        self._ledgers: "OrderedDict[str, TransactionLedger]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.evictions = 0
+
+    def mark_stale(self, phone: Optional[str]):
+        """Force a sync on the next read, e.g. after a transfer"""
+        if phone in self._ledgers:
+            self._ledgers[phone].stale = True
+
+    def peek(self, phone: str) -> Optional[TransactionLedger]:
+        """The ledger as it is now, without syncing"""
+        return self._ledgers.get(phone)
+
+    async def ledger(self, phone: str) -> Optional[TransactionLedger]:
+        """
+        The user's ledger, synced if due. If a sync fails the last known
+        ledger is returned; None if nothing could ever be read.
+        """
+        ledger = self._ledgers.get(phone)
+        if ledger is None:
+            ledger = self._ledgers[phone] = TransactionLedger()
+            while len(self._ledgers) > self.max_users:
+                evicted, _ = self._ledgers.popitem(last=False)
+                self._locks.pop(evicted, None)
+                self.evictions += 1
+        self._ledgers.move_to_end(phone)
+
+        if not ledger.stale and time.monotonic() - ledger.synced_at < self.sync_interval:
+            return ledger
+
+        lock = self._locks.setdefault(phone, asyncio.Lock())
+        async with lock:
+            # Someone else may have synced while we waited
+            if ledger.stale or time.monotonic() - ledger.synced_at >= self.sync_interval:
+                try:
+                    await self._sync(phone, ledger)
+                except Exception as e:
+                    logger.warning(f"Transaction sync failed for {phone[-4:]}: {e}")
+
+        return ledger if ledger.synced_at else None
+
+    async def _sync(self, phone: str, ledger: TransactionLedger):
+        catalog = await self.agent.tool_catalog.get()
+        args = catalog.phone_arguments(TRANSACTIONS_TOOL, phone)
+        if args is None:
+            raise RuntimeError(f"{TRANSACTIONS_TOOL} is not available")
+
+        since_param = catalog.parameter(TRANSACTIONS_TOOL, SINCE_PARAMETERS)
+        if since_param and ledger.cursor is not None:
+            args[since_param] = (ledger.cursor - TXN_SYNC_OVERLAP).date().isoformat()
+
+        with span("txn.sync", incremental=bool(since_param and ledger.cursor is not None)) as s:
+            data = parse_tool_json(await self.agent.call_tool(TRANSACTIONS_TOOL, args, use_cache=not ledger.stale))
+            if data is None:
+                raise RuntimeError(f"{TRANSACTIONS_TOOL} returned no JSON")
+
+            added = ledger.add(extract_transactions(data))
+            if added:
+                ledger.trim()
+            s.tag(added=added)
+        ledger.synced_at = time.monotonic()
+        ledger.stale = False
+        logger.debug(f"Synced {added} new transactions for {phone[-4:]} ({len(ledger)} stored)")
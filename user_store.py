@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+USER_DB_PATH = os.getenv("USER_DB_PATH", "disha_users.db")
+LEGACY_USERS_FILE = os.getenv("LEGACY_USERS_FILE", "registered_users.json")  # imported once, then left alone
+ITER_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    phone          TEXT PRIMARY KEY,
+    chat_id        INTEGER NOT NULL,
+    name           TEXT,
+    registered_at  TEXT,
+    notifications  INTEGER NOT NULL DEFAULT 1,
+    updated_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_chat_id ON users (chat_id);
+CREATE TABLE IF NOT EXISTS sent_alerts (
+    phone       TEXT NOT NULL,
+    check_name  TEXT NOT NULL,
+    sent_at     REAL NOT NULL,
+    PRIMARY KEY (phone, check_name)
+);
+"""
+
+
+class UserStore:
+    """
+    Registered users in SQLite, keyed by phone and indexed by chat_id.
+
+    WAL mode lets the monitor read while handlers write, and every
+    registration is a single atomic upsert instead of rewriting a JSON file.
+    One connection is shared behind a lock; each statement takes well under
+    a millisecond, so it is called directly from the event loop.
+    """
+
+    def __init__(self, path: str = USER_DB_PATH, legacy_file: Optional[str] = LEGACY_USERS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+        if legacy_file:
+            self._import_legacy(legacy_file)
+
+    def _import_legacy(self, legacy_file: str):
+        """One-time import of the old registered_users.json"""
+        if self.count() or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file) as f:
+                users = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not import {legacy_file}: {e}")
+            return
+
+        for phone, info in users.items():
+            self.upsert(phone, info["chat_id"], info.get("name"), info.get("registered_at"))
+        logger.info(f"Imported {len(users)} users from {legacy_file}")
+
+    def upsert(self, phone: str, chat_id: int, name: Optional[str] = None, registered_at: Optional[str] = None):
+        """Register a user or update their chat and name; notification preference is kept"""
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO users (phone, chat_id, name, registered_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (phone) DO UPDATE SET
+                    chat_id = excluded.chat_id,
+                    name = COALESCE(excluded.name, users.name),
+                    updated_at = excluded.updated_at
+                """,
+                (phone, chat_id, name, registered_at, time.time())
+            )
+
+    def get(self, phone: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM users WHERE phone = ?", (phone,)).fetchone()
+        return dict(row) if row else None
+
+    def by_chat(self, chat_id: int) -> list:
+        """Users registered from a chat (usually one)"""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM users WHERE chat_id = ?", (chat_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_notifications(self, phone: str, enabled: bool) -> bool:
+        """Turn proactive alerts on or off; False if the user isn't registered"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE users SET notifications = ?, updated_at = ? WHERE phone = ?",
+                (int(enabled), time.time(), phone)
+            )
+        return cursor.rowcount > 0
+
+    def notifications_enabled(self, phone: str) -> bool:
+        user = self.get(phone)
+        return bool(user and user["notifications"])
+
+    def sent_alerts(self, phone: str) -> Dict[str, float]:
+        """When each proactive alert was last sent to the user, by check name"""
+        with self._lock:
+            rows = self._db.execute("SELECT check_name, sent_at FROM sent_alerts WHERE phone = ?", (phone,)).fetchall()
+        return {row["check_name"]: row["sent_at"] for row in rows}
+
+    def save_sent_alerts(self, phone: str, sent: Dict[str, float]):
+        """Replace the user's sent-alert record, so restarts don't repeat alerts"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM sent_alerts WHERE phone = ?", (phone,))
+                self._db.executemany(
+                    "INSERT INTO sent_alerts (phone, check_name, sent_at) VALUES (?, ?, ?)",
+                    [(phone, name, sent_at) for name, sent_at in sent.items()]
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove(self, phone: str):
+        with self._lock:
+            self._db.execute("DELETE FROM users WHERE phone = ?", (phone,))
+            self._db.execute("DELETE FROM sent_alerts WHERE phone = ?", (phone,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def iter_users(self, batch_size: int = ITER_BATCH_SIZE) -> Iterator[dict]:
+        """
+        Every user, in phone order, read in batches by keyset pagination so
+        the whole table is never loaded at once and writers are never blocked.
+        """
+        last_phone = ""
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT * FROM users WHERE phone > ? ORDER BY phone LIMIT ?",
+                    (last_phone, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_phone = rows[-1]["phone"]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,168 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_current_turn: contextvars.ContextVar[Optional["Turn"]] = contextvars.ContextVar("current_turn", default=None)
+
+
+def mark_turn_committed():
+    """
+    Called when the running turn does something that must not be redone
+    (shows text to the user, makes a transfer). A committed turn is never
+    cancelled in favour of a newer message.
+    """
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.committed = True
+
+
+async def committed_on_output(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Pass `chunks` through, committing the current turn at the first text"""
+    async for delta in chunks:
+        if delta:
+            mark_turn_committed()
+        yield delta
+
+
+class Turn:
+    def __init__(self):
+        self.committed = False
+        self.superseded = False
+        self.task: Optional[asyncio.Task] = None
+
+
+class _UserState:
+    def __init__(self):
+        self.waiting = []  # (message, respond, future) not yet answered, oldest first
+        self.turn: Optional[Turn] = None
+        self.worker: Optional[asyncio.Task] = None
+
+
+class UserTurns:
+    """
+    One conversation turn at a time per user, users in parallel.
+
+    Messages that arrive while a user's turn is running are answered
+    together in the next turn, as one combined query. If the running turn
+    hasn't shown anything yet (and hasn't made a transfer), it is cancelled
+    and restarted with the newer messages included, instead of answering
+    a question the user has already followed up on.
+    """
+
+    def __init__(self):
+        self._users: Dict[Hashable, _UserState] = {}
+        self._handlers: Set[asyncio.Task] = set()  # running tracked() handlers
+
+        # Metrics
+        self.turns = 0
+        self.coalesced = 0
+        self.superseded = 0
+
+    async def submit(self, key: Hashable, message: str,
+                     respond: Callable[[str], Awaitable[None]]) -> None:
+        """
+        Queue `message` for user `key`; returns once a turn that includes it
+        has finished. `respond(query)` runs the turn; when messages are
+        combined, the newest message's `respond` is used.
+        """
+        state = self._users.setdefault(key, _UserState())
+        done = asyncio.get_running_loop().create_future()
+        state.waiting.append((message, respond, done))
+
+        if state.turn is not None and not state.turn.committed and not state.turn.task.done():
+            # Restart the turn with this message included
+            self.superseded += 1
+            state.turn.superseded = True
+            state.turn.task.cancel()
+
+        if state.worker is None or state.worker.done():
+            state.worker = asyncio.create_task(self._work(key, state))
+
+        await asyncio.shield(done)
+
+    async def _work(self, key: Hashable, state: _UserState):
+        try:
+            while state.waiting:
+                batch = list(state.waiting)
+                query = "\n".join(message for message, _, _ in batch)
+                respond = batch[-1][1]
+
+                turn = state.turn = Turn()
+                token = _current_turn.set(turn)
+                try:
+                    turn.task = asyncio.create_task(respond(query))
+                finally:
+                    _current_turn.reset(token)
+
+                try:
+                    await turn.task
+                    error = None
+                except asyncio.CancelledError:
+                    if turn.superseded and turn.task.cancelled():
+                        continue  # nothing was shown yet: run again with everything waiting
+                    raise
+                except Exception as e:
+                    error = e
+
+                self.turns += 1
+                self.coalesced += len(batch) - 1
+                del state.waiting[:len(batch)]
+                for _, _, done in batch:
+                    if not done.done():
+                        if error is None:
+                            done.set_result(None)
+                        else:
+                            done.set_exception(error)
+        finally:
+            state.turn = None
+            if self._users.get(key) is state:
+                del self._users[key]
+            # Only left over if the worker itself was cancelled (shutdown)
+            for _, _, done in state.waiting:
+                if not done.done():
+                    done.cancel()
+
+    def tracked(self, handler: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """
+        Wrap a handler that answers outside submit(), such as a command,
+        so drain() waits for it like a turn.
+        """
+        @functools.wraps(handler)
+        async def run(*args, **kwargs):
+            task = asyncio.current_task()
+            self._handlers.add(task)
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                self._handlers.discard(task)
+        return run
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Wait up to `timeout` seconds for running turns and tracked handlers,
+        including ones started meanwhile, then cancel the rest. Returns how
+        many were cancelled.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            workers = [state.worker for state in self._users.values() if state.worker and not state.worker.done()]
+            workers += [task for task in self._handlers if not task.done()]
+            if not workers:
+                return 0
+            _, pending = await asyncio.wait(workers, timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+            if pending:
+                for worker in pending:
+                    worker.cancel()
+                return len(pending)
+
+    def stats(self) -> dict:
+        return {
+            "active_users": len(self._users),
+            "turns": self.turns,
+            "coalesced_messages": self.coalesced,
+            "superseded_turns": self.superseded,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+from telegram import Update
+from telegram.ext import Application
+
+from monitor_scheduler import shard_of
+from startup import readiness, readiness_handler
+from tracing import metrics_handler
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling")  # "polling" or "webhook"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # public https base URL Telegram posts to
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # required in webhook mode
+WEBHOOK_SET = os.getenv("WEBHOOK_SET", "1") == "1"  # register the webhook with Telegram on start (one worker is enough)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Several workers behind a load balancer: every worker lists all workers' internal
+# base URLs in the same order and knows its own index. Each user is owned by one
+# worker, so their turns and chat state stay in one process.
+WEBHOOK_PEERS = [url.strip().rstrip("/") for url in os.getenv("WEBHOOK_PEERS", "").split(",") if url.strip()]
+WEBHOOK_WORKER_INDEX = int(os.getenv("WEBHOOK_WORKER_INDEX", "0"))
+
+# Only what the handlers use; commands arrive as messages
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def use_webhook() -> bool:
+    return TELEGRAM_MODE == "webhook"
+
+
+def _user_id(data: dict) -> Optional[int]:
+    for key in ("message", "edited_message", "callback_query"):
+        sender = (data.get(key) or {}).get("from") or {}
+        if "id" in sender:
+            return sender["id"]
+    return None
+
+
+class WebhookServer:
+    """
+    aiohttp endpoint that feeds Telegram updates into an Application.
+
+    Requests without the right secret token are rejected, and the server
+    refuses to start without one: the endpoint is public. With
+    WEBHOOK_PEERS set, an update for a user owned by another worker is
+    forwarded there instead of being handled here.
+    """
+
+    def __init__(self, application: Application, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 peers: Optional[list] = None, worker_index: int = WEBHOOK_WORKER_INDEX):
+        if not secret:
+            raise RuntimeError("WEBHOOK_SECRET is required in webhook mode")
+        self.application = application
+        self.path = path
+        self.secret = secret
+        self.peers = WEBHOOK_PEERS if peers is None else peers
+        self.worker_index = worker_index
+        self._session: Optional[ClientSession] = None
+
+        # Metrics
+        self.received = 0
+        self.forwarded = 0
+        self.rejected = 0
+
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self.handle_update)
+        self.app.router.add_get("/healthz", self.health)
+        self.app.router.add_get("/readyz", readiness_handler)
+        self.app.router.add_get("/metrics", metrics_handler)
+        self.app.on_cleanup.append(self._close_session)
+
+    def _owner(self, data: dict) -> Optional[str]:
+        """Peer URL that owns this update's user, or None if it is ours"""
+        user_id = _user_id(data)
+        if len(self.peers) < 2 or user_id is None:
+            return None
+        index = shard_of(str(user_id), len(self.peers))
+        return None if index == self.worker_index else self.peers[index]
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.rejected += 1
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        owner = self._owner(data)
+        if owner:
+            self.forwarded += 1
+            # A failed hand-off is reported so Telegram delivers the update again
+            return web.Response(status=200 if await self._forward(owner, data) else 502)
+
+        # Acknowledged as soon as it is queued; handlers run in the Application
+        self.received += 1
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        return web.Response()
+
+    async def _forward(self, peer: str, data: dict) -> bool:
+        if self._session is None:
+            self._session = ClientSession(timeout=ClientTimeout(total=5))
+        try:
+            async with self._session.post(f"{peer}{self.path}", json=data,
+                                          headers={SECRET_HEADER: self.secret}) as response:
+                if response.status != 200:
+                    logger.warning(f"Peer {peer} answered {response.status} to a forwarded update")
+                return response.status == 200
+        except Exception as e:
+            logger.error(f"Could not forward update to {peer}: {e}")
+            return False
+
+    async def _close_session(self, app: web.Application):
+        if self._session is not None:
+            await self._session.close()
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", **self.stats()})
+
+    def stats(self) -> dict:
+        return {"received": self.received, "forwarded": self.forwarded, "rejected": self.rejected}
+
+
+async def run_webhook(application: Application, background: Optional[Callable[[Application], Awaitable]] = None,
+                      listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT):
+    """
+    Serve `application` from an aiohttp webhook until SIGINT/SIGTERM, with
+    the same lifecycle hooks as run_polling. `background(application)` is
+    run alongside, e.g. proactive monitoring. On shutdown the server stops
+    taking updates (Telegram redelivers them) and running turns are drained.
+    """
+    server = WebhookServer(application)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await _serve(application, server, stop, background, listen, port)
+    finally:
+        # Same order as run_polling: after the Application has shut down
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+async def _serve(application: Application, server: WebhookServer, stop: asyncio.Event,
+                 background: Optional[Callable[[Application], Awaitable]], listen: str, port: int):
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+
+        if WEBHOOK_SET:
+            if not WEBHOOK_URL:
+                raise RuntimeError("WEBHOOK_URL is required to register the webhook")
+            await application.bot.set_webhook(
+                url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=ALLOWED_UPDATES,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+
+        runner = web.AppRunner(server.app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, listen, port).start()
+        logger.info(f"Webhook listening on {listen}:{port}{WEBHOOK_PATH} (worker {WEBHOOK_WORKER_INDEX})")
+
+        task = asyncio.create_task(background(application)) if background else None
+        try:
+            await stop.wait()
+        finally:
+            readiness.draining = True
+            if task:
+                task.cancel()
+            await runner.cleanup()
+            await readiness.drain()
+            await application.stop()